@@ -0,0 +1,159 @@
+# cache_warmer.py (백그라운드 데이터 갱신기)
+#
+# 서버 프로세스당 하나의 백그라운드 스레드가 등록된 Drive 파일들의 버전을 주기적으로 확인합니다.
+# 파일이 바뀌면 새 버전을 내려받고, 등록된 데우기 작업(로그 적재, 집계 큐브, 재고 이력 등)을 모두 끝낸 뒤에
+# 새 버전을 게시(publish_drive_file_version)합니다. 대화형 rerun은 게시된 버전을 사용하므로
+# 사용자는 다운로드/파싱을 기다리지 않고 항상 준비된 데이터를 읽으며, 새 데이터로의 전환은 한 번에 일어납니다.
+# 사이드바의 데이터 신선도 표시(render_data_freshness_sidebar)는 이 갱신기의 상태를 보여 줍니다.
+#
+# 페이지 스크립트는 import할 수 없으므로, 메인 페이지와 각 페이지는 실행될 때 attach_page_to_cache_warmer로
+# 자기 기본 화면의 로더를 데우기 작업으로 등록합니다. st.cache_resource 키는 함수의 모듈/이름/소스로 정해지므로
+# 갱신기가 부른 결과를 페이지의 다음 rerun이 그대로 사용합니다. 한 번 방문한 페이지는 이후 모든 새 버전이 미리 준비됩니다.
+
+import datetime
+import threading
+import traceback
+import streamlit as st
+
+from common_utils import (
+    PREFETCH_DRIVE_FILES,
+    ensure_drive_file_downloaded,
+    get_excel_sheet_index,
+    get_published_drive_file_version,
+    get_thread_drive_service,
+    pinned_drive_file_versions,
+    publish_drive_file_version,
+    read_drive_file_version,
+)
+
+CACHE_WARMER_POLL_SECONDS = 60
+
+
+class CacheWarmer:
+    """
+    등록된 파일들의 버전을 주기적으로 확인하고, 바뀐 파일의 데이터셋을 미리 만든 뒤 버전을 게시합니다.
+    데우기 작업은 (파일 ID, 작업 이름)으로 등록하며, 같은 이름으로 다시 등록하면 교체됩니다.
+    """
+    def __init__(self, drive_service, files, poll_seconds=CACHE_WARMER_POLL_SECONDS):
+        self._drive_service = drive_service
+        self._files = dict(files) # 파일 ID -> 표시 이름
+        self._poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._tasks = {} # (파일 ID, 작업 이름) -> callable(drive_service)
+        self._status = {
+            file_id: {'name': name, 'version': None, 'checked_at': None, 'refreshed_at': None, 'state': '대기', 'error': None}
+            for file_id, name in self._files.items()
+        }
+        self._wake_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def register_task(self, file_id, task_name, task_fn):
+        """file_id 파일이 새 버전이 될 때마다 실행할 데우기 작업을 등록합니다 (task_fn(drive_service))."""
+        with self._lock:
+            is_new = (file_id, task_name) not in self._tasks
+            self._tasks[(file_id, task_name)] = task_fn
+            if file_id not in self._status:
+                self._files[file_id] = file_id
+                self._status[file_id] = {'name': file_id, 'version': None, 'checked_at': None, 'refreshed_at': None, 'state': '대기', 'error': None}
+        if is_new:
+            # 새 작업은 이미 게시된 버전에 대해서도 한 번 실행되도록 다음 확인을 앞당깁니다.
+            with self._lock:
+                self._status[file_id]['version'] = None
+            self._wake_event.set()
+
+    def status_snapshot(self):
+        """파일별 상태(이름, 버전, 마지막 확인/갱신 시각, 상태, 오류)의 복사본을 반환합니다."""
+        with self._lock:
+            return {file_id: dict(status) for file_id, status in self._status.items()}
+
+    def _set_status(self, file_id, **changes):
+        with self._lock:
+            self._status[file_id].update(changes)
+
+    def _run(self):
+        while True:
+            for file_id in list(self._files):
+                try:
+                    self._refresh_file(file_id)
+                except Exception as e:
+                    self._set_status(file_id, state='오류', error=str(e))
+                    traceback.print_exc()
+            self._wake_event.wait(self._poll_seconds)
+            self._wake_event.clear()
+
+    def _refresh_file(self, file_id):
+        drive_service = get_thread_drive_service(self._drive_service)
+        latest_version = read_drive_file_version(drive_service, file_id)
+        now = datetime.datetime.now()
+        with self._lock:
+            known_version = self._status[file_id]['version']
+            tasks = [(name, fn) for (task_file_id, name), fn in self._tasks.items() if task_file_id == file_id]
+
+        if latest_version == known_version:
+            publish_drive_file_version(file_id, latest_version) # 게시 시각만 갱신
+            self._set_status(file_id, checked_at=now, state='최신', error=None)
+            return
+
+        self._set_status(file_id, checked_at=now, state='갱신 중', error=None)
+        ensure_drive_file_downloaded(drive_service, file_id, latest_version)
+        task_errors = []
+        with pinned_drive_file_versions({file_id: latest_version}):
+            get_excel_sheet_index(drive_service, file_id, self._files[file_id])
+            for task_name, task_fn in tasks:
+                try:
+                    task_fn(drive_service)
+                except Exception as e:
+                    task_errors.append(f"{task_name}: {e}")
+        publish_drive_file_version(file_id, latest_version)
+        self._set_status(
+            file_id, version=latest_version, refreshed_at=datetime.datetime.now(),
+            state='최신' if not task_errors else '일부 오류', error='; '.join(task_errors) or None
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def start_cache_warmer(_drive_service, files_key):
+    """서버 프로세스당 한 번 갱신기를 시작합니다. files_key는 감시할 (파일 ID, 이름) 튜플입니다."""
+    return CacheWarmer(_drive_service, dict(files_key))
+
+
+def render_data_freshness_sidebar(warmer):
+    """사이드바에 파일별 데이터 신선도(마지막 확인/갱신 시각, 상태)를 표시합니다."""
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔄 데이터 신선도")
+    if warmer is None or not warmer.is_alive:
+        st.sidebar.caption("백그라운드 갱신이 실행 중이 아닙니다. 데이터는 조회 시점에 확인합니다.")
+        return
+    now = datetime.datetime.now()
+    for file_id, status in warmer.status_snapshot().items():
+        if status['refreshed_at'] is None:
+            st.sidebar.caption(f"⏳ {status['name']}: {status['state']}")
+            continue
+        age_minutes = int((now - status['refreshed_at']).total_seconds() // 60)
+        checked_str = status['checked_at'].strftime('%H:%M:%S') if status['checked_at'] else '-'
+        icon = "✅" if status['state'] == '최신' and get_published_drive_file_version(file_id) else "⚠️"
+        line = f"{icon} {status['name']}: {status['refreshed_at'].strftime('%m/%d %H:%M')} 갱신 ({age_minutes}분 전), 확인 {checked_str}"
+        if status['error']:
+            line += f" - {status['error']}"
+        st.sidebar.caption(line)
+
+
+def attach_page_to_cache_warmer(drive_service, page_name, warm_tasks):
+    """
+    갱신기를 (없으면) 시작하고, 페이지의 데우기 작업을 등록한 뒤 사이드바에 데이터 신선도를 표시합니다.
+    모든 페이지가 페이지 상단에서 호출합니다. warm_tasks는 [(파일 ID, callable(drive_service))]로 파일마다 작업 하나이며,
+    작업 이름은 page_name이므로 rerun마다 다시 등록해도 같은 작업이 교체될 뿐입니다.
+    한 작업이 여러 파일을 읽으면 각 파일마다 등록합니다 (어느 파일이 바뀌어도 다시 데움).
+    """
+    warmer = None
+    if drive_service is not None:
+        warmer = start_cache_warmer(drive_service, tuple(PREFETCH_DRIVE_FILES.items()))
+        for file_id, task_fn in warm_tasks:
+            warmer.register_task(file_id, page_name, task_fn)
+    render_data_freshness_sidebar(warmer)
+    return warmer
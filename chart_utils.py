@@ -0,0 +1,106 @@
+# chart_utils.py (긴 시계열 그래프의 표시 점 수 줄이기)
+#
+# 그래프 폭보다 많은 점은 화면에서 구분되지 않고 전송/그리기만 느려지므로, 그래프의 표시 점 수를 제한합니다.
+# - downsample_frame: LTTB(Largest-Triangle-Three-Buckets) 또는 구간별 최소/최대값으로 모양을 유지하며 점을 고릅니다.
+# - choose_rollup_freq: 기간이 길면 일별 대신 주별/월별 합계(SalesCube.period_totals 등 미리 집계된 값)를 쓰도록 단위를 고릅니다.
+
+import numpy as np
+import pandas as pd
+
+CHART_WIDTH_PX = 800          # 일반적인 그래프 폭 (use_container_width 기준 대략값)
+CHART_PX_PER_POINT = 2        # 점 하나에 필요한 최소 픽셀
+ROLLUP_FREQ_LABELS = {'D': '일별', 'W': '주별', 'M': '월별'}
+
+
+def max_chart_points(width_px=CHART_WIDTH_PX):
+    """그래프 폭에 맞는 계열당 최대 점 수를 반환합니다."""
+    return max(3, int(width_px) // CHART_PX_PER_POINT)
+
+
+def choose_rollup_freq(start_date, end_date, max_points=None):
+    """기간의 일수가 max_points를 넘으면 주별('W'), 주 수도 넘으면 월별('M'), 아니면 일별('D')을 반환합니다."""
+    max_points = max_points or max_chart_points()
+    num_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    if num_days <= max_points:
+        return 'D'
+    if num_days / 7 <= max_points:
+        return 'W'
+    return 'M'
+
+
+def lttb_indices(x_values, y_values, threshold):
+    """LTTB로 고른 점의 위치 배열을 반환합니다 (처음/마지막 점 포함, 오름차순)."""
+    num_points = len(y_values)
+    if threshold >= num_points or threshold < 3:
+        return np.arange(num_points)
+    x_values = np.asarray(x_values, dtype='float64')
+    y_values = np.asarray(y_values, dtype='float64')
+    bucket_size = (num_points - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    anchor = 0
+    for bucket in range(threshold - 2):
+        # 다음 구간의 평균 점과, 직전에 고른 점(anchor)으로 만드는 삼각형이 가장 큰 점을 이번 구간에서 고릅니다.
+        next_start = int(np.floor((bucket + 1) * bucket_size)) + 1
+        next_end = min(int(np.floor((bucket + 2) * bucket_size)) + 1, num_points)
+        avg_x = x_values[next_start:next_end].mean()
+        avg_y = y_values[next_start:next_end].mean()
+
+        range_start = int(np.floor(bucket * bucket_size)) + 1
+        range_end = int(np.floor((bucket + 1) * bucket_size)) + 1
+        areas = np.abs(
+            (x_values[anchor] - avg_x) * (y_values[range_start:range_end] - y_values[anchor])
+            - (x_values[anchor] - x_values[range_start:range_end]) * (avg_y - y_values[anchor])
+        )
+        anchor = range_start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    selected[-1] = num_points - 1
+    return selected
+
+
+def minmax_indices(y_values, threshold):
+    """구간마다 최소/최대값 점을 고른 위치 배열을 반환합니다 (처음/마지막 점 포함, 오름차순). 급등락을 놓치지 않습니다."""
+    num_points = len(y_values)
+    if threshold >= num_points or threshold < 4:
+        return np.arange(num_points)
+    y_values = np.asarray(y_values, dtype='float64')
+    selected = [0, num_points - 1]
+    for bucket in np.array_split(np.arange(1, num_points - 1), (threshold - 2) // 2):
+        if len(bucket):
+            selected.append(bucket[np.argmin(y_values[bucket])])
+            selected.append(bucket[np.argmax(y_values[bucket])])
+    return np.unique(selected)
+
+
+def _index_to_x(index):
+    """그래프 가로축 값을 숫자로 바꿉니다 (날짜면 나노초, 변환할 수 없으면 위치)."""
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(index)).asi8.astype('float64')
+    except (TypeError, ValueError):
+        return np.arange(len(index), dtype='float64')
+
+
+def downsample_frame(df, max_points=None, method='lttb'):
+    """
+    index를 가로축으로 하는 계열 표(st.line_chart용 형태)에서 max_points개 이내의 행(가로축 값)만 남깁니다.
+    모든 계열이 같은 가로축 값을 공유하므로, 계열이 여러 개면 점 예산을 계열 수로 나누어 계열마다 고른 뒤 합칩니다
+    (합친 행 수도 max_points를 넘지 않으므로 표를 나누어 계열별 그래프로 그려도 계열당 max_points개 이내입니다).
+    계열당 예산이 너무 작으면 같은 간격으로 고릅니다. 점이 적으면 그대로 반환합니다.
+    method: 'lttb' (모양 보존) 또는 'minmax' (구간별 최소/최대)
+    """
+    max_points = max_points or max_chart_points()
+    if df is None or len(df) <= max_points:
+        return df
+    num_series = max(1, df.shape[1])
+    points_per_series = max_points // num_series
+    if points_per_series < (4 if method == 'minmax' else 3):
+        return df.iloc[np.unique(np.linspace(0, len(df) - 1, max_points).round().astype(np.int64))]
+    x_values = _index_to_x(df.index)
+    selected = []
+    for col in df.columns:
+        y_values = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype='float64')
+        if method == 'minmax':
+            selected.append(minmax_indices(y_values, points_per_series))
+        else:
+            selected.append(lttb_indices(x_values, y_values, points_per_series))
+    return df.iloc[np.unique(np.concatenate(selected))] if selected else df
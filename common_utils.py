@@ -4,9 +4,19 @@ import streamlit as st
 import pandas as pd
 import datetime
 import io 
+import threading
+import zipfile
+import time
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
 from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 from googleapiclient.discovery import Resource # Resource 타입을 명시적으로 임포트
+from googleapiclient.discovery import build
+
+from sheet_store import load_stored_sheet, save_stored_sheet
+from sheet_schemas import SM_SNAPSHOT_SCHEMA, get_sheet_schema
 
 # --- 1. 공통 Google Drive 파일 ID 정의 (예시) ---
 # 실제 파일 ID는 메인 앱이나 각 페이지에서 불러와서 함수에 전달하는 것이 더 유연할 수 있습니다.
@@ -14,6 +24,17 @@ from googleapiclient.discovery import Resource # Resource 타입을 명시적으
 # 예시: SM_FILE_ID = "YOUR_ACTUAL_SM_FILE_ID_HERE"
 # 예시: ERP_FILE_ID = "YOUR_ACTUAL_ERP_FILE_ID_HERE"
 
+# 앱 시작 시 prefetch_drive_files()로 동시에 미리 받아 두는 파일 목록 (파일 ID: 오류 메시지용 이름).
+# 메인 페이지와 각 페이지가 사용하는 파일을 모두 등록하면 첫 화면/첫 페이지 방문 시 다운로드를 기다리지 않습니다.
+PREFETCH_DRIVE_FILES = {
+    "1tRljdvOpp4fITaVEXvoL9mNveNg2qt4p": "SM재고현황.xlsx",
+    "1AgKl29yQ80sTDszLql6oBnd9FnLWf8oR": "입고내역.xlsx",
+    "1h-V7kIoInXgGLll7YBW5V_uZdF3Q1PdY": "출고내역.xlsx",
+    "1Lbtwenw8LcDaj94_J4kKTjoWQY7PEAZs": "ERP 재고현황",
+    "1t1ORfuuHfW3VZ0yXTiIaaBgHzYF8MDwd": "거래처주소데이터",
+}
+DRIVE_PREFETCH_MAX_WORKERS = 4
+
 # --- 2. "창고별 재고 추이" 페이지 (inventory_app.py) 특화 설정 ---
 REPORT_LOCATION_MAP_TREND = {
     "신갈냉동": "냉동",
@@ -41,72 +62,576 @@ def hash_google_api_resource(resource_obj: Resource):
     # 함수 호출 시 다른 인자들(file_id 등)이 동일하면 캐시된 결과를 사용합니다.
     return None
 
-@st.cache_data(ttl=300, hash_funcs={Resource: hash_google_api_resource})
-def download_excel_from_drive_as_bytes(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file") -> io.BytesIO | None:
+# --- Google Drive 파일 버전 기반 캐싱 ---
+# 파일 내용이 바뀌었는지는 가벼운 메타데이터 조회(files().get)로 먼저 확인하고,
+# 실제 다운로드(get_media)는 버전이 바뀐 경우에만 수행합니다.
+# 메타데이터 조회 결과는 짧게 캐시하여 한 번의 rerun 중 여러 로더가 같은 파일을 요청해도
+# 조회 요청이 반복되지 않도록 합니다.
+DRIVE_VERSION_FIELDS = "md5Checksum,modifiedTime,size"
+DRIVE_VERSION_PROBE_TTL_SECONDS = 30
+DRIVE_DOWNLOAD_CACHE_MAX_ENTRIES = 16 # 파일 수 x (현재 버전 + 직전 버전) 정도면 충분
+
+# 파일 버전을 키로 쓰는 읽기 전용 데이터셋 캐시(st.cache_resource)의 기본 항목 수.
+# st.cache_data는 적중할 때마다 결과를 역직렬화(복사)하지만, st.cache_resource는 같은 객체를 그대로 돌려주므로
+# 여러 세션이 동시에 대시보드를 열어도 rerun마다 복사 비용이 들지 않습니다.
+# 대신 반환된 DataFrame은 모든 세션이 공유하므로 호출하는 쪽에서 절대 수정하지 않아야 합니다.
+# 파일이 바뀌면 새 버전 키로 다시 만들어지고, 이전 버전 항목은 max_entries에 따라 밀려납니다.
+DATASET_CACHE_MAX_ENTRIES = 32
+
+class TransientLoadError(Exception):
+    """
+    버전별 캐시 로더가 다운로드 실패처럼 다시 시도하면 나아질 수 있는 실패를 알릴 때 올리는 예외입니다.
+    캐시 함수가 None이나 빈 DataFrame을 반환하면 그 실패가 파일 버전이 바뀔 때까지 캐시되므로,
+    캐시 함수는 이 예외를 올려 보내고 캐시 밖의 래퍼가 받아 처리합니다 (오류 메시지는 이미 표시된 상태).
+    """
+
+def read_drive_file_version(drive_service: Resource, file_id: str) -> str:
+    """
+    Drive 파일의 메타데이터만 조회하여 버전 문자열을 반환합니다 (캐시 없음).
+    md5Checksum이 있으면 그대로 사용하고, 없으면 modifiedTime과 size를 조합합니다.
+    조회 실패 시 예외를 그대로 올려 보냅니다.
+    """
+    metadata = drive_service.files().get(fileId=file_id, fields=DRIVE_VERSION_FIELDS).execute()
+    if metadata.get("md5Checksum"):
+        return metadata["md5Checksum"]
+    return f"{metadata.get('modifiedTime', '')}:{metadata.get('size', '')}"
+
+@st.cache_data(ttl=DRIVE_VERSION_PROBE_TTL_SECONDS, show_spinner=False)
+def _probe_drive_file_version(_drive_service: Resource, file_id: str) -> str:
+    """read_drive_file_version의 짧은 TTL 캐시판입니다. 실패 시 예외를 올려 보내 실패 결과가 캐시되지 않도록 합니다."""
+    return read_drive_file_version(_drive_service, file_id)
+
+# --- 백그라운드 갱신기(cache_warmer)가 게시한 파일 버전 ---
+# 갱신기는 새 버전의 데이터셋을 모두 만든 뒤에만 버전을 게시하므로, 대화형 rerun은 게시된 버전을 사용하여
+# 항상 미리 데워진 데이터를 읽습니다. 게시가 오래 갱신되지 않으면(갱신기 중단 등) 다시 직접 조회합니다.
+PUBLISHED_VERSION_MAX_AGE_SECONDS = 600
+_published_versions = {} # 파일 ID -> (버전, 게시 시각 monotonic)
+_published_versions_lock = threading.Lock()
+_version_pins = threading.local()
+
+def publish_drive_file_version(file_id: str, file_version: str):
+    """파일 버전을 게시합니다 (갱신기 전용). 이후 get_drive_file_version은 이 버전을 돌려줍니다."""
+    with _published_versions_lock:
+        _published_versions[file_id] = (file_version, time.monotonic())
+
+def get_published_drive_file_version(file_id: str) -> str | None:
+    """게시된 지 오래되지 않은 파일 버전을 반환합니다. 없으면 None."""
+    with _published_versions_lock:
+        published = _published_versions.get(file_id)
+    if published is None or time.monotonic() - published[1] > PUBLISHED_VERSION_MAX_AGE_SECONDS:
+        return None
+    return published[0]
+
+@contextlib.contextmanager
+def pinned_drive_file_versions(versions: dict):
+    """
+    with 블록 안에서 현재 스레드의 get_drive_file_version이 지정한 버전을 돌려주도록 고정합니다.
+    갱신기가 아직 게시하지 않은 새 버전의 데이터셋을 미리 만들 때 사용합니다.
+    """
+    previous = getattr(_version_pins, 'versions', None)
+    _version_pins.versions = {**(previous or {}), **versions}
+    try:
+        yield
+    finally:
+        _version_pins.versions = previous
+
+def get_drive_file_version(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file") -> str | None:
+    """
+    Google Drive 파일의 현재 버전 문자열을 반환합니다.
+    캐시 키로 사용하기 위한 값이며, 조회 실패 시 None을 반환하고 UI에 오류를 표시합니다.
+    백그라운드 갱신기가 게시한 버전이 있으면 Drive에 묻지 않고 그 버전(데이터가 이미 준비된 버전)을 사용합니다.
+    """
+    if drive_service is None:
+        st.error(f"오류: Google Drive 서비스가 초기화되지 않았습니다. ({file_name_for_error_msg} 버전 확인 시도)")
+        return None
+    pinned_versions = getattr(_version_pins, 'versions', None)
+    if pinned_versions and file_id in pinned_versions:
+        return pinned_versions[file_id]
+    published_version = get_published_drive_file_version(file_id)
+    if published_version is not None:
+        return published_version
+    try:
+        return _probe_drive_file_version(drive_service, file_id)
+    except HttpError as error:
+        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 정보 조회 실패: {error.resp.status} - {error._get_reason()}. 파일 공유 설정을 확인하세요.")
+        return None
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 정보 조회 중 예외 발생: {e}")
+        return None
+
+# --- 동시 요청 합치기 (single-flight) ---
+class SingleFlight:
+    """
+    같은 키의 작업이 이미 진행 중이면 새로 시작하지 않고 그 결과를 기다려 함께 받습니다.
+    작업이 실패하면 기다리던 모든 호출자에게 같은 예외가 전달되며, 결과는 보관하지 않으므로
+    다음 호출은 처음부터 다시 시도합니다 (실패가 캐시에 남지 않음).
+    """
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """fn()을 키당 한 번만 실행합니다. (결과, 다른 호출의 결과를 함께 받았는지) 를 반환합니다."""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = SingleFlight._Call()
+        if is_leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, not is_leader
+
+_drive_download_flight = SingleFlight()
+_sheet_parse_flight = SingleFlight()
+
+def _download_drive_file_coalesced(drive_service: Resource, file_id: str, file_version: str) -> bytes:
+    """
+    (file_id, file_version)당 동시에 하나의 다운로드만 진행되도록 합니다.
+    여러 세션이 동시에 캐시를 놓쳐도 Drive 요청과 메모리 사용은 한 번분만 발생합니다.
+    실제 다운로드는 현재 스레드 전용 Drive 클라이언트로 수행합니다 (httplib2는 스레드 안전하지 않음).
+    """
+    file_bytes, _shared = _drive_download_flight.do(
+        (file_id, file_version),
+        lambda: _download_drive_file_for_version(get_thread_drive_service(drive_service), file_id, file_version)
+    )
+    return file_bytes
+
+@st.cache_resource(max_entries=DRIVE_DOWNLOAD_CACHE_MAX_ENTRIES, show_spinner=False)
+def _download_drive_file_for_version(_drive_service: Resource, file_id: str, file_version: str) -> bytes:
+    """
+    (file_id, file_version) 조합으로 캐시되는 실제 다운로드 함수입니다.
+    같은 버전이면 Drive에 다시 요청하지 않습니다. 실패 시 예외를 올려 보내 캐시에 남지 않게 합니다.
+    변경 불가능한 bytes로 보관하므로 모든 세션이 복사 없이 공유합니다.
+    """
+    request = _drive_service.files().get_media(fileId=file_id)
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+        # st.write(f"다운로드 진행률: {int(status.progress() * 100)}%") # 필요시 진행률 표시
+    return fh.getvalue()
+
+def _fetch_drive_file_for_version(drive_service: Resource, file_id: str, file_version: str, file_name_for_error_msg: str) -> io.BytesIO | None:
+    """
+    버전이 정해진 파일을 (캐시를 거쳐) 가져오고, 오류는 UI에 표시한 뒤 None을 반환합니다.
+    반환되는 BytesIO는 캐시된 bytes를 감싸기만 하므로 (쓰기 전까지) 내용을 복사하지 않습니다.
+    """
+    try:
+        return io.BytesIO(_download_drive_file_coalesced(drive_service, file_id, file_version))
+    except HttpError as error:
+        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 다운로드 실패: {error.resp.status} - {error._get_reason()}. 파일 공유 설정을 확인하세요.")
+        return None
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 처리 중 예외 발생: {e}")
+        return None
+
+def download_excel_from_drive_as_bytes(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file", file_version: str | None = None) -> io.BytesIO | None:
     """
     Google Drive에서 특정 파일 ID의 엑셀 파일을 다운로드하여
     io.BytesIO 객체로 반환합니다.
+    파일 버전(md5Checksum/modifiedTime)이 바뀌지 않았다면 캐시된 내용을 그대로 사용합니다.
+    file_version을 주면 버전을 다시 조회하지 않고 정확히 그 버전을 가져옵니다 (버전으로 결과를 보관하는 호출자용).
     오류 발생 시 None을 반환하고 Streamlit UI에 오류 메시지를 표시합니다.
     """
     if drive_service is None:
         st.error(f"오류: Google Drive 서비스가 초기화되지 않았습니다. ({file_name_for_error_msg} 다운로드 시도)")
         return None
+    if file_version is None:
+        file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+    if file_version is None:
+        return None # 오류 메시지는 get_drive_file_version에서 이미 표시됨
+    return _fetch_drive_file_for_version(drive_service, file_id, file_version, file_name_for_error_msg)
+
+# --- 여러 파일 동시 미리 받기 ---
+# googleapiclient의 Resource(httplib2)는 스레드 안전하지 않으므로, 작업 스레드마다 같은 인증 정보로
+# 별도의 Drive 클라이언트를 만들어 사용합니다. 받은 내용은 위의 버전별 캐시에 그대로 들어가므로
+# 이후 페이지의 로더들은 다운로드 없이 캐시를 사용합니다.
+_thread_local = threading.local()
+
+def _drive_credentials(drive_service: Resource):
+    return getattr(getattr(drive_service, '_http', None), 'credentials', None)
+
+def get_thread_drive_service(drive_service: Resource) -> Resource:
+    """
+    현재 스레드 전용 Drive 클라이언트를 반환합니다 (drive_service와 같은 인증 정보 사용).
+    인증 정보를 꺼낼 수 없으면 drive_service를 그대로 반환합니다.
+    """
+    credentials = _drive_credentials(drive_service)
+    if credentials is None:
+        return drive_service
+    services = getattr(_thread_local, 'drive_services', None)
+    if services is None:
+        services = _thread_local.drive_services = {}
+    service = services.get(id(credentials))
+    if service is None:
+        service = build('drive', 'v3', credentials=credentials, cache_discovery=False)
+        services[id(credentials)] = service
+    return service
+
+def ensure_drive_file_downloaded(drive_service: Resource, file_id: str, file_version: str) -> None:
+    """지정한 버전의 파일이 다운로드 캐시에 있도록 합니다 (없으면 받음). 실패 시 예외를 올려 보냅니다."""
+    _download_drive_file_coalesced(drive_service, file_id, file_version)
+
+def _prefetch_drive_file(drive_service: Resource, file_id: str) -> str:
+    thread_service = get_thread_drive_service(drive_service)
+    file_version = get_published_drive_file_version(file_id) or _probe_drive_file_version(thread_service, file_id)
+    ensure_drive_file_downloaded(thread_service, file_id, file_version)
+    return file_version
+
+def prefetch_drive_files(drive_service: Resource, file_ids, max_workers: int = DRIVE_PREFETCH_MAX_WORKERS) -> dict:
+    """
+    여러 Drive 파일의 버전 확인과 다운로드를 제한된 스레드 풀에서 동시에 수행하여 캐시를 채웁니다.
+    모든 파일이 끝날 때까지 기다리므로 전체 소요 시간은 가장 느린 파일 하나 정도입니다.
+    반환값: {파일 ID: 파일 버전 또는 None(실패)}. 실패한 파일은 각 로더가 평소처럼 다시 시도하고 오류를 표시합니다.
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    if drive_service is None or not file_ids:
+        return {}
+    if _drive_credentials(drive_service) is None:
+        max_workers = 1 # 스레드별 클라이언트를 만들 수 없으면 공유 클라이언트로 차례대로 받습니다.
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_ids))), thread_name_prefix="drive-prefetch") as executor:
+        futures = {file_id: executor.submit(_prefetch_drive_file, drive_service, file_id) for file_id in file_ids}
+        for file_id, future in futures.items():
+            try:
+                results[file_id] = future.result()
+            except Exception:
+                results[file_id] = None
+    return results
+
+# --- 파일 버전별 엑셀 통합문서 레지스트리 ---
+# 같은 파일 버전에 대해 pd.ExcelFile은 프로세스 전체에서 한 번만 열고,
+# 파싱한 시트 DataFrame도 한 번만 만들어 모든 페이지/세션이 함께 사용합니다.
+WORKBOOK_REGISTRY_MAX_ENTRIES = 10
+
+# 시트 이름 목록(과 시트별 지문)은 sheet_store에 이 이름/변형으로 함께 저장하여, 재시작 후에도 다운로드 없이 날짜 목록을 만들 수 있게 합니다.
+SHEET_INDEX_STORE_KEY = "__sheet_index__"
+SHEET_INDEX_STORE_VARIANT = "index_v2"
+_XLSX_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL_ID_ATTR = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_XLSX_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def read_xlsx_sheet_index(file_bytes: io.BytesIO) -> list:
+    """
+    xlsx 파일(zip)의 xl/workbook.xml만 읽어 (시트 이름, 시트 지문) 목록을 통합문서 순서대로 반환합니다.
+    시트 지문은 zip 목록에 기록된 해당 워크시트 XML의 CRC와 크기이므로, 시트 내용을 읽지 않고도
+    파일이 새 버전으로 바뀌었을 때 실제로 바뀐 시트만 골라낼 수 있습니다.
+    시트 내용은 전혀 읽지 않으므로 수백 개의 일자별 시트가 있어도 수 밀리초면 끝납니다.
+    xlsx 형식이 아니면(예: .xls) pd.ExcelFile로 대체하며, 이때 지문은 None입니다.
+    """
+    file_bytes.seek(0)
     try:
-        request = drive_service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            # st.write(f"다운로드 진행률: {int(status.progress() * 100)}%") # 필요시 진행률 표시
-        fh.seek(0)
-        return fh
-    except HttpError as error:
-        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 다운로드 실패: {error.resp.status} - {error._get_reason()}. 파일 공유 설정을 확인하세요.")
+        with zipfile.ZipFile(file_bytes) as zf:
+            root = ET.fromstring(zf.read("xl/workbook.xml"))
+            try:
+                rels_root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+                rel_targets = {rel.get("Id"): rel.get("Target", "") for rel in rels_root.iter(f"{_XLSX_PKG_REL_NS}Relationship")}
+            except KeyError:
+                rel_targets = {}
+            zip_infos = {info.filename: info for info in zf.infolist()}
+        sheets_elem = root.find(f"{_XLSX_MAIN_NS}sheets")
+        if sheets_elem is None:
+            return []
+        sheet_index = []
+        for sheet in sheets_elem.iter(f"{_XLSX_MAIN_NS}sheet"):
+            target = rel_targets.get(sheet.get(_XLSX_REL_ID_ATTR), "")
+            member = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            info = zip_infos.get(member)
+            fingerprint = f"{info.CRC:08x}:{info.file_size}" if info is not None else None
+            sheet_index.append((sheet.get("name"), fingerprint))
+        return sheet_index
+    except (zipfile.BadZipFile, KeyError):
+        file_bytes.seek(0)
+        with pd.ExcelFile(file_bytes) as xls:
+            return [(name, None) for name in xls.sheet_names]
+    finally:
+        file_bytes.seek(0)
+
+def read_xlsx_sheet_names(file_bytes: io.BytesIO) -> list:
+    """xlsx 파일의 시트 이름 목록을 통합문서 순서대로 반환합니다 (read_xlsx_sheet_index 참고)."""
+    return [name for name, _fingerprint in read_xlsx_sheet_index(file_bytes)]
+
+class ExcelWorkbook:
+    """
+    한 Drive 파일 버전의 엑셀 통합문서입니다.
+    pd.ExcelFile은 처음 필요할 때 한 번만 열고, 파싱된 시트는 메모리에 보관합니다.
+    openpyxl 파싱은 스레드 안전하지 않으므로 잠금 안에서만 수행합니다.
+    """
+    def __init__(self, file_id: str, file_version: str):
+        self.file_id = file_id
+        self.file_version = file_version
+        self._lock = threading.RLock()
+        self._excel_file = None
+        self._sheets = {} # (시트 이름, 스키마 이름) -> DataFrame
+        self._sheet_index = None
+        self._sheet_dates = None
+
+    def _open(self, file_bytes: io.BytesIO) -> pd.ExcelFile:
+        if self._excel_file is None:
+            # 캐시에서 받은 BytesIO를 통합문서가 계속 보관하므로 위치만 처음으로 돌립니다.
+            file_bytes.seek(0)
+            self._excel_file = pd.ExcelFile(file_bytes)
+        return self._excel_file
+
+    def get_cached_sheet_index(self) -> list | None:
+        """메모리 또는 sheet_store에 있는 (시트 이름, 시트 지문) 목록을 반환합니다. 없으면 None (파일을 열지 않음)."""
+        with self._lock:
+            if self._sheet_index is None:
+                df_index = load_stored_sheet(self.file_id, self.file_version, SHEET_INDEX_STORE_KEY, SHEET_INDEX_STORE_VARIANT)
+                if df_index is not None and {'sheet_name', 'fingerprint'}.issubset(df_index.columns):
+                    self._sheet_index = tuple(zip(df_index['sheet_name'].astype(str), df_index['fingerprint'].astype(str)))
+            return None if self._sheet_index is None else list(self._sheet_index)
+
+    def sheet_index(self, file_bytes: io.BytesIO) -> list:
+        """
+        (시트 이름, 시트 지문) 목록을 반환합니다. 통합문서 전체를 열지 않고 zip 안의 workbook.xml만 읽습니다.
+        지문을 알 수 없는 시트(xls 등)는 파일 버전 전체를 지문으로 사용합니다.
+        """
+        with self._lock:
+            cached_index = self.get_cached_sheet_index()
+            if cached_index is not None:
+                return cached_index
+            self._sheet_index = tuple(
+                (name, fingerprint or self.file_version) for name, fingerprint in read_xlsx_sheet_index(file_bytes)
+            )
+            df_index = pd.DataFrame(list(self._sheet_index), columns=['sheet_name', 'fingerprint'])
+            save_stored_sheet(self.file_id, self.file_version, SHEET_INDEX_STORE_KEY, df_index, SHEET_INDEX_STORE_VARIANT)
+            return list(self._sheet_index)
+
+    def get_cached_sheet_names(self) -> list | None:
+        """메모리 또는 sheet_store에 있는 시트 이름 목록을 반환합니다. 없으면 None (파일을 열지 않음)."""
+        cached_index = self.get_cached_sheet_index()
+        return None if cached_index is None else [name for name, _fingerprint in cached_index]
+
+    def sheet_names(self, file_bytes: io.BytesIO) -> list:
+        """시트 이름 목록을 반환합니다. 통합문서 전체를 열지 않고 zip 안의 workbook.xml만 읽습니다."""
+        return [name for name, _fingerprint in self.sheet_index(file_bytes)]
+
+    def sheet_dates(self, file_bytes: io.BytesIO | None = None) -> list | None:
+        """'YYYYMMDD' 시트의 날짜 목록(최신 순)을 반환합니다. 시트 이름을 아직 모르고 file_bytes도 없으면 None."""
+        with self._lock:
+            if self._sheet_dates is None:
+                sheet_names = self.get_cached_sheet_names()
+                if sheet_names is None:
+                    if file_bytes is None:
+                        return None
+                    sheet_names = self.sheet_names(file_bytes)
+                self._sheet_dates = tuple(_sheet_names_to_dates(sheet_names))
+            return list(self._sheet_dates)
+
+    def get_cached_sheet(self, sheet_name, schema: str | None = None):
+        """메모리 또는 Parquet 저장소에 있는 시트를 반환합니다. 없으면 None (파일을 열지 않음)."""
+        with self._lock:
+            if (sheet_name, schema) in self._sheets:
+                return self._sheets[(sheet_name, schema)]
+            variant = "raw" if schema is None else get_sheet_schema(schema).store_variant
+            df_stored = load_stored_sheet(self.file_id, self.file_version, sheet_name, variant)
+            if df_stored is not None:
+                self._sheets[(sheet_name, schema)] = df_stored
+            return df_stored
+
+    def parse_sheet(self, sheet_name, file_bytes: io.BytesIO, keep: bool = True, schema: str | None = None) -> pd.DataFrame:
+        """
+        시트를 파싱하여 보관합니다. 시트가 없으면 pd.read_excel과 같은 ValueError가 발생합니다.
+        schema를 주면 sheet_schemas의 해당 스키마 컬럼만 정해진 dtype으로 읽고 별칭 컬럼 이름을 표준 이름으로 바꿉니다.
+        keep=False이면 한 번만 쓰고 버릴 시트로 보고 메모리/sheet_store에 보관하지 않습니다.
+        """
+        with self._lock:
+            if (sheet_name, schema) in self._sheets:
+                return self._sheets[(sheet_name, schema)]
+            if schema is None:
+                df_sheet = self._open(file_bytes).parse(sheet_name=sheet_name, header=0)
+                variant = "raw"
+            else:
+                sheet_schema = get_sheet_schema(schema)
+                df_sheet = self._open(file_bytes).parse(sheet_name=sheet_name, header=0, **sheet_schema.read_kwargs())
+                df_sheet = sheet_schema.normalize(df_sheet)
+                variant = sheet_schema.store_variant
+            if keep:
+                self._sheets[(sheet_name, schema)] = df_sheet
+                save_stored_sheet(self.file_id, self.file_version, sheet_name, df_sheet, variant)
+            return df_sheet
+
+@st.cache_resource(max_entries=WORKBOOK_REGISTRY_MAX_ENTRIES, show_spinner=False)
+def _get_workbook_for_version(file_id: str, file_version: str) -> ExcelWorkbook:
+    """(file_id, file_version)마다 하나의 ExcelWorkbook을 프로세스 전체에서 공유합니다."""
+    return ExcelWorkbook(file_id, file_version)
+
+def get_excel_workbook(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file", file_version: str | None = None) -> ExcelWorkbook | None:
+    """
+    Drive 파일 버전에 해당하는 공유 ExcelWorkbook을 반환합니다. 버전 확인 실패 시 None.
+    file_version을 주면 다시 조회하지 않고 그 버전의 통합문서를 반환합니다.
+    """
+    if drive_service is None:
+        st.error(f"오류: Google Drive 서비스가 초기화되지 않았습니다. ({file_name_for_error_msg} 읽기 시도)")
+        return None
+    if file_version is None:
+        file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+        if file_version is None:
+            return None
+    return _get_workbook_for_version(file_id, file_version)
+
+def read_excel_sheet(drive_service: Resource, file_id: str, sheet_name: str | int = 0, file_name_for_error_msg: str = "Excel file", keep: bool = True, schema: str | None = None, file_version: str | None = None) -> pd.DataFrame | None:
+    """
+    Google Drive 엑셀 파일의 시트 하나를 DataFrame으로 읽어옵니다 (header=0).
+    공유 레지스트리 → sheet_store의 Parquet 사본 → 엑셀 파싱 순으로 찾으며,
+    파일 다운로드와 파싱은 파일 버전/시트마다 한 번만 일어납니다.
+    다운로드 실패 시 None을 반환하며, 시트가 없으면 pd.read_excel과 같은 ValueError를 올려 보냅니다.
+    반환되는 DataFrame은 공유본의 복사본이므로 호출자가 자유롭게 수정해도 됩니다.
+    keep=False는 결과를 따로 가공해 보관하는 호출자(예: sm_history)용으로, 원본 시트를 레지스트리에 남기지 않습니다.
+    schema는 sheet_schemas에 등록된 시트 유형 이름입니다 (예: 'sm_snapshot', 's-list').
+    주면 스키마의 컬럼만 읽으며 코드/문자열 컬럼은 문자열, 숫자 컬럼은 숫자로, 별칭 컬럼은 표준 이름으로 옵니다.
+    file_version을 주면 버전을 다시 조회하지 않고 정확히 그 버전의 시트를 읽습니다 (버전별 캐시 함수용).
+    """
+    workbook = get_excel_workbook(drive_service, file_id, file_name_for_error_msg, file_version)
+    if workbook is None:
+        return None
+
+    df_sheet = workbook.get_cached_sheet(sheet_name, schema)
+    if df_sheet is None:
+        file_bytes = _fetch_drive_file_for_version(drive_service, file_id, workbook.file_version, file_name_for_error_msg)
+        if file_bytes is None:
+            return None
+        # 같은 버전/시트의 파싱이 이미 진행 중이면 그 결과를 함께 받습니다.
+        df_sheet, shared = _sheet_parse_flight.do(
+            (file_id, workbook.file_version, sheet_name, schema, keep),
+            lambda: workbook.parse_sheet(sheet_name, file_bytes, keep=keep, schema=schema)
+        )
+        if not keep and not shared:
+            return df_sheet
+    return df_sheet.copy()
+
+def _sheet_names_to_dates(sheet_names) -> list:
+    """시트 이름 중 'YYYYMMDD' 형식만 datetime.date로 바꾸어 최신 날짜 순으로 반환합니다."""
+    available_dates = []
+    for sheet_name in sheet_names:
+        try:
+            available_dates.append(datetime.datetime.strptime(sheet_name, "%Y%m%d").date())
+        except (ValueError, TypeError):
+            # 날짜 형식이 아닌 시트 이름은 조용히 무시
+            pass
+    available_dates.sort(reverse=True) # 최신 날짜가 맨 앞으로 오도록 정렬
+    return available_dates
+
+def get_excel_sheet_names(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file", file_version: str | None = None) -> list | None:
+    """
+    공유 레지스트리를 통해 Drive 엑셀 파일의 시트 이름 목록을 반환합니다. 실패 시 None.
+    이미 알고 있는 버전이면 파일을 다시 받거나 열지 않습니다. file_version을 주면 그 버전의 목록을 반환합니다.
+    """
+    workbook = get_excel_workbook(drive_service, file_id, file_name_for_error_msg, file_version)
+    if workbook is None:
+        return None
+    sheet_names = workbook.get_cached_sheet_names()
+    if sheet_names is not None:
+        return sheet_names
+    file_bytes = _fetch_drive_file_for_version(drive_service, file_id, workbook.file_version, file_name_for_error_msg)
+    if file_bytes is None:
+        return None
+    try:
+        return workbook.sheet_names(file_bytes)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 목록을 읽는 중 오류 발생: {e}")
+        return None
+
+def get_excel_sheet_index(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file", file_version: str | None = None) -> list | None:
+    """
+    Drive 엑셀 파일의 (시트 이름, 시트 지문) 목록을 반환합니다. 실패 시 None.
+    시트 지문은 시트 내용이 바뀌었을 때만 달라지므로, 시트 단위로 가공 결과를 보관하는 쪽의 키로 사용합니다.
+    file_version을 주면 그 버전의 목록을 반환합니다 (지문과 시트 파싱을 같은 버전으로 맞출 때 사용).
+    """
+    workbook = get_excel_workbook(drive_service, file_id, file_name_for_error_msg, file_version)
+    if workbook is None:
+        return None
+    sheet_index = workbook.get_cached_sheet_index()
+    if sheet_index is not None:
+        return sheet_index
+    file_bytes = _fetch_drive_file_for_version(drive_service, file_id, workbook.file_version, file_name_for_error_msg)
+    if file_bytes is None:
         return None
+    try:
+        return workbook.sheet_index(file_bytes)
     except Exception as e:
-        st.error(f"오류: '{file_name_for_error_msg}' (ID: {file_id}) 파일 처리 중 예외 발생: {e}")
+        st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 목록을 읽는 중 오류 발생: {e}")
         return None
 
-@st.cache_data(ttl=300) # 파일 내용 기반 캐싱이므로 drive_service는 직접 받지 않음
+def get_available_sheet_dates(drive_service: Resource, file_id: str, file_name_for_error_msg: str = "Excel file", file_version: str | None = None) -> list:
+    """
+    Drive 엑셀 파일에서 'YYYYMMDD' 형식 시트의 날짜 목록(최신 순)을 반환합니다.
+    날짜 목록은 파일 버전별 통합문서에 색인으로 보관되므로, 같은 버전이면 버전 확인 외에는 비용이 없습니다.
+    file_version을 주면 다시 조회하지 않고 그 버전의 날짜 목록을 반환합니다.
+    """
+    workbook = get_excel_workbook(drive_service, file_id, file_name_for_error_msg, file_version)
+    if workbook is None:
+        return []
+    sheet_dates = workbook.sheet_dates()
+    if sheet_dates is not None:
+        return sheet_dates
+    file_bytes = _fetch_drive_file_for_version(drive_service, file_id, workbook.file_version, file_name_for_error_msg)
+    if file_bytes is None:
+        return []
+    try:
+        return workbook.sheet_dates(file_bytes)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 목록을 읽는 중 오류 발생: {e}")
+        return []
+
 def get_all_available_sheet_dates_from_bytes(file_content_bytes: io.BytesIO | None, file_name_for_error_msg: str = "Excel file") -> list:
     """
     io.BytesIO 객체 (엑셀 파일 내용)에서 'YYYYMMDD' 형식의 시트 이름을 찾아
     datetime.date 객체 리스트로 반환합니다. 리스트는 최신 날짜 순으로 정렬됩니다.
     파일 내용이 없거나 읽기 오류 시 빈 리스트를 반환하고 UI에 경고를 표시합니다.
+    workbook.xml만 읽으므로 충분히 빨라 캐시하지 않습니다 (캐시 키 계산 시 파일 전체를 해시하지 않도록).
     """
-    available_dates = []
     if file_content_bytes is None:
         st.warning(f"경고: '{file_name_for_error_msg}' 파일 내용이 없어 시트 날짜를 추출할 수 없습니다.")
-        return available_dates
+        return []
     try:
-        # BytesIO 객체는 파일처럼 바로 읽을 수 있습니다.
-        with pd.ExcelFile(file_content_bytes) as xls:
-            sheet_names = xls.sheet_names
-        for sheet_name in sheet_names:
-            try:
-                dt_object = datetime.datetime.strptime(sheet_name, "%Y%m%d").date()
-                available_dates.append(dt_object)
-            except ValueError:
-                # 날짜 형식이 아닌 시트 이름은 조용히 무시
-                pass
-        available_dates.sort(reverse=True) # 최신 날짜가 맨 앞으로 오도록 정렬
-        return available_dates
+        return _sheet_names_to_dates(read_xlsx_sheet_names(file_content_bytes))
     except Exception as e:
         st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 목록을 읽는 중 오류 발생: {e}")
         return []
 
-@st.cache_data(ttl=300, hash_funcs={Resource: hash_google_api_resource})
 def load_sm_sheet_data(drive_service: Resource, file_id: str, date_str_yyyymmdd: str, file_name_for_error_msg: str = "SM재고현황") -> pd.DataFrame | None:
     """
     지정된 Google Drive 파일 ID에서 특정 날짜(YYYYMMDD)의 시트 데이터를 DataFrame으로 로드합니다.
+    결과는 파일 버전별로 공유되는 읽기 전용 DataFrame입니다 (수정하지 마세요).
     """
-    file_bytes = download_excel_from_drive_as_bytes(drive_service, file_id, f"{file_name_for_error_msg} ({date_str_yyyymmdd})")
-    if file_bytes is None:
-        return None # 파일 다운로드 실패
+    file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+    if file_version is None:
+        return None
+    try:
+        return _load_sm_sheet_data_for_version(drive_service, file_id, date_str_yyyymmdd, file_version, file_name_for_error_msg)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않으므로 다음 rerun에서 다시 시도)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 '{date_str_yyyymmdd}' 처리 중 예외 발생: {e}")
+        return None
 
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sm_sheet_data_for_version(_drive_service: Resource, file_id: str, date_str_yyyymmdd: str, file_version: str, file_name_for_error_msg: str) -> pd.DataFrame | None:
+    """load_sm_sheet_data의 실제 로딩 함수입니다. 다운로드 실패는 TransientLoadError로 올려 보내 캐시하지 않습니다."""
     try:
-        df_sheet = pd.read_excel(file_bytes, sheet_name=date_str_yyyymmdd, header=0)
+        df_sheet = read_excel_sheet(_drive_service, file_id, date_str_yyyymmdd, f"{file_name_for_error_msg} ({date_str_yyyymmdd})", schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+        if df_sheet is None:
+            raise TransientLoadError(f"{file_name_for_error_msg} ({date_str_yyyymmdd}) 다운로드 실패")
         df_sheet.dropna(how='all', inplace=True)
         if df_sheet.empty:
             return pd.DataFrame() # 빈 데이터프레임 반환
@@ -120,20 +645,17 @@ def load_sm_sheet_data(drive_service: Resource, file_id: str, date_str_yyyymmdd:
         df_sheet_copy = df_sheet.copy()
         df_sheet_copy['날짜'] = pd.to_datetime(date_str_yyyymmdd, format='%Y%m%d')
         
+        # 상품코드/지점명은 스키마로 읽어 이미 공백이 제거된 문자열이고, 잔량은 숫자입니다.
         df_processed_sheet = df_sheet_copy[['날짜', '지점명', '상품코드', SM_QTY_COL_TREND, SM_WGT_COL_TREND]].copy()
         for col in [SM_QTY_COL_TREND, SM_WGT_COL_TREND]:
-            df_processed_sheet[col] = pd.to_numeric(df_processed_sheet[col], errors='coerce').fillna(0)
+            df_processed_sheet[col] = df_processed_sheet[col].fillna(0)
         
-        df_processed_sheet['지점명'] = df_processed_sheet['지점명'].astype(str).str.strip()
         df_processed_sheet['날짜'] = pd.to_datetime(df_processed_sheet['날짜']).dt.normalize()
         return df_processed_sheet
 
     except ValueError as ve: 
         st.warning(f"경고: '{file_name_for_error_msg}' 파일에 '{date_str_yyyymmdd}' 시트를 찾을 수 없거나 읽는 중 오류: {ve}")
         return None
-    except Exception as e:
-        st.error(f"오류: '{file_name_for_error_msg}' 파일의 시트 '{date_str_yyyymmdd}' 처리 중 예외 발생: {e}")
-        return None
 
 # 다른 공통 함수들도 필요에 따라 여기에 추가할 수 있습니다.
 # 예를 들어, 입고/출고 로그 파일을 처리하는 범용 함수 등
@@ -0,0 +1,138 @@
+# display_utils.py (화면 표시용 표 서식 공통 함수)
+
+import io
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+KOREAN_DAYS = ['월', '화', '수', '목', '금', '토', '일']
+TABLE_PAGE_SIZE_OPTIONS = [50, 100, 500]
+
+
+def format_date_headers(dates):
+    """날짜 목록을 'MM/DD(요일)' 형식의 컬럼 제목 배열로 바꿉니다 (datetime.date / Timestamp 모두 가능)."""
+    date_index = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+    weekday_names = np.array(KOREAN_DAYS)[date_index.weekday]
+    return list(date_index.strftime('%m/%d') + '(' + weekday_names + ')')
+
+
+def format_box_kg_table(pivot_box, pivot_kg, kg_suffix="", show_change_indicator=False, total_label='합계', row_label='index'):
+    """
+    [행 x 날짜] 박스/중량 피벗 두 개로 '박스 / Kg' 표시용 표를 한 번에 만듭니다.
+    - 마지막에 날짜별 합계 행(total_label)을 붙입니다.
+    - 박스와 중량이 모두 0인 칸은 '-'로 표시합니다.
+    - show_change_indicator=True이면 전날 대비 박스 수 증감을 🔺/▼로 앞에 붙입니다 (합계 행 포함).
+    - 컬럼 제목은 'MM/DD(요일)' 형식이며, 행 이름은 피벗의 index 이름(없으면 row_label) 컬럼으로 나옵니다.
+    두 피벗은 같은 행/열 순서여야 합니다 (reindex 후 전달).
+    """
+    box_all = pd.concat([pivot_box, pivot_box.sum(axis=0).to_frame(total_label).T])
+    kg_all = pd.concat([pivot_kg, pivot_kg.sum(axis=0).to_frame(total_label).T])
+    box_values = box_all.to_numpy(dtype='float64')
+    kg_values = kg_all.to_numpy(dtype='float64')
+
+    box_text = box_all.map('{:,.0f}'.format).to_numpy(dtype=str)
+    kg_text = kg_all.map('{:,.1f}'.format).to_numpy(dtype=str)
+    cell_text = np.char.add(np.char.add(box_text, " / "), np.char.add(kg_text, kg_suffix))
+
+    if show_change_indicator and box_values.shape[1] > 1:
+        # 첫 날짜 열은 비교 대상이 없으므로 diff가 NaN이 되어 표시하지 않습니다.
+        box_diff = box_all.diff(axis=1).to_numpy(dtype='float64')
+        indicator = np.where(box_diff > 0.01, "🔺 ", np.where(box_diff < -0.01, "▼ ", ""))
+        cell_text = np.char.add(indicator, cell_text)
+
+    cell_text = np.where((box_values == 0) & (kg_values == 0), "-", cell_text)
+
+    index_name = pivot_box.index.name or row_label
+    display_table = pd.DataFrame(cell_text.astype(object), index=box_all.index, columns=format_date_headers(box_all.columns))
+    display_table.index.name = index_name
+    return display_table.reset_index()
+
+
+def _sorted_row_order(df, sort_by, ascending):
+    """
+    정렬 순서(행 위치 배열)를 만듭니다. 정렬 키 한 컬럼만 정렬하므로 rerun마다 계산해도 가볍습니다.
+    (호출자는 대부분 rerun마다 새로 거른 DataFrame을 넘기므로 객체 기준으로 기억해 두어도 맞는 경우가 없습니다.)
+    """
+    if sort_by is None or sort_by not in df.columns:
+        return np.arange(len(df))
+    # 안정 정렬로 같은 값끼리는 원래 순서를 유지하고, 빈 값은 방향과 관계없이 맨 뒤에 둡니다.
+    sort_keys = df[sort_by].reset_index(drop=True)
+    return sort_keys.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+
+def _page_to_excel_bytes(df_page, sheet_name):
+    excel_stream = io.BytesIO()
+    with pd.ExcelWriter(excel_stream, engine='xlsxwriter') as writer:
+        df_page.to_excel(writer, index=False, sheet_name=sheet_name)
+    return excel_stream.getvalue()
+
+
+def render_paginated_table(df, key, columns=None, sort_by=None, ascending=True, date_cols=None, rename=None,
+                           formatters=None, page_size=100, export_name=None, hide_index=True, height=None):
+    """
+    큰 결과 표를 페이지 단위로 표시합니다.
+    전체 행은 정렬 순서(행 위치)만 만들고, 날짜 문자열 변환/이름 변경/서식 지정은 현재 페이지 행에만 적용하여
+    브라우저에는 한 페이지 분량만 보냅니다.
+    - columns: 표시할 컬럼 (없는 컬럼은 건너뜀, None이면 전체)
+    - sort_by/ascending: 정렬 기준 컬럼 (None이면 df 순서 그대로)
+    - date_cols: 'YYYY-MM-DD' 문자열로 표시할 날짜 컬럼
+    - rename: 표시용 컬럼 이름 바꾸기 {원래 이름: 표시 이름}
+    - formatters: Styler.format에 넘길 {표시 이름: 서식}
+    - export_name: 주면 현재 페이지를 CSV/엑셀로 내려받는 버튼을 표시합니다 (파일 이름 앞부분).
+    key는 페이지 위젯에 쓰이므로 표마다 달라야 합니다.
+    """
+    if df is None or df.empty:
+        return
+    display_positions = np.arange(df.shape[1]) if columns is None else df.columns.get_indexer([col for col in columns if col in df.columns])
+    total_rows = len(df)
+
+    size_key = f"{key}__page_size"
+    page_key = f"{key}__page"
+    nav_col1, nav_col2, nav_col3 = st.columns([1, 1, 2])
+    with nav_col1:
+        default_size = page_size if page_size in TABLE_PAGE_SIZE_OPTIONS else TABLE_PAGE_SIZE_OPTIONS[0]
+        rows_per_page = st.selectbox("페이지당 행 수", TABLE_PAGE_SIZE_OPTIONS, index=TABLE_PAGE_SIZE_OPTIONS.index(default_size), key=size_key)
+    total_pages = max(1, -(-total_rows // rows_per_page))
+    # 결과가 줄어 저장된 페이지 번호가 범위를 벗어나면 마지막 페이지로 맞춥니다 (위젯 생성 전에만 변경 가능).
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    with nav_col2:
+        page_number = st.number_input("페이지", min_value=1, max_value=total_pages, value=1, step=1, key=page_key)
+    start = (int(page_number) - 1) * rows_per_page
+    end = min(start + rows_per_page, total_rows)
+    with nav_col3:
+        st.caption(f"전체 {total_rows:,}행 중 {start + 1:,}~{end:,}행 ({int(page_number)}/{total_pages} 페이지)")
+
+    order = _sorted_row_order(df, sort_by, ascending)
+    # 행/컬럼 모두 take로 잘라 새 DataFrame을 만듭니다 (아래에서 수정해도 원본/경고와 무관).
+    df_page = df.take(order[start:end]).take(display_positions, axis=1)
+    for col in (date_cols or []):
+        if col in df_page.columns:
+            df_page[col] = pd.to_datetime(df_page[col], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    if rename:
+        df_page = df_page.rename(columns=rename)
+
+    page_formatters = {col: fmt for col, fmt in (formatters or {}).items() if col in df_page.columns}
+    table_data = df_page.style.format(page_formatters, na_rep="-") if page_formatters else df_page
+    dataframe_kwargs = {'hide_index': hide_index, 'use_container_width': True}
+    if height is not None:
+        dataframe_kwargs['height'] = height
+    st.dataframe(table_data, **dataframe_kwargs)
+
+    if export_name:
+        export_col1, export_col2 = st.columns(2)
+        file_stem = f"{export_name}_{int(page_number)}페이지"
+        export_col1.download_button(
+            label="📄 현재 페이지 CSV 다운로드",
+            data=df_page.to_csv(index=False).encode('utf-8-sig'), # 엑셀에서 한글이 깨지지 않도록 BOM 포함
+            file_name=f"{file_stem}.csv",
+            mime="text/csv",
+            key=f"{key}__csv"
+        )
+        export_col2.download_button(
+            label="📥 현재 페이지 엑셀 다운로드",
+            data=_page_to_excel_bytes(df_page, '데이터'),
+            file_name=f"{file_stem}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=f"{key}__xlsx"
+        )
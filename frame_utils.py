@@ -0,0 +1,143 @@
+# frame_utils.py (DataFrame 메모리 절약 및 행 선택 공통 함수)
+#
+# 로더가 반환하는 DataFrame은 파일 버전별로 캐시되어 모든 세션이 공유하므로,
+# 반환 직전에 compact_frame으로 한 번 줄여 두면 프로세스 전체의 메모리 사용량이 줄어듭니다.
+# - 값 종류가 적은 문자열 컬럼(지점명, 상품명, 거래처명 등)은 category로 바꿉니다.
+# - 나머지 문자열 컬럼은 빈 칸이 없으면 pyarrow 기반 문자열(string[pyarrow])로 바꿉니다.
+# - 소수점이 없는 숫자 컬럼은 int32로 줄입니다. 소수가 있는 컬럼(금액 합계 등)은 정밀도를 위해 float64를 유지합니다.
+# 화면별 필터링은 take_rows로 필요한 행/컬럼만 한 번에 잘라내어, 전체 DataFrame을 .copy()하지 않도록 합니다.
+# category 컬럼으로 groupby할 때는 관측되지 않은 값이 결과에 끼지 않도록 observed=True를 주어야 합니다.
+
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRINGS_AVAILABLE = True
+except ImportError:
+    ARROW_STRINGS_AVAILABLE = False
+
+CATEGORY_MAX_UNIQUE_RATIO = 0.5 # 고유값 수 / 행 수가 이 값 이하인 문자열 컬럼만 category로 바꿉니다.
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+_memory_stats_lock = threading.Lock()
+_memory_stats = {} # 라벨 -> {'rows': 행 수, 'before': 변환 전 바이트, 'after': 변환 후 바이트}
+
+
+def frame_memory_bytes(df):
+    """DataFrame의 실제 메모리 사용량(문자열 내용 포함, memory_usage(deep=True))을 바이트로 반환합니다."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _is_string_column(series):
+    return series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty')
+
+
+def _downcast_numeric(series):
+    """소수점이 없고 int32 범위 안의 숫자 컬럼을 int32로 줄입니다. 그 외에는 그대로 반환합니다."""
+    if series.empty or series.hasnans:
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        values = series.to_numpy()
+    elif pd.api.types.is_float_dtype(series.dtype):
+        values = series.to_numpy()
+        if not np.all(np.isfinite(values)) or not np.array_equal(values, np.trunc(values)):
+            return series
+    else:
+        return series
+    if values.min() < INT32_MIN or values.max() > INT32_MAX or series.dtype == np.int32:
+        return series
+    return series.astype(np.int32)
+
+
+def compact_frame(df, label=None, category_cols=None, string_cols=None):
+    """
+    문자열 컬럼을 category/pyarrow 문자열로, 정수 값 숫자 컬럼을 int32로 바꾼 새 DataFrame을 반환합니다.
+    category_cols: category 후보 컬럼 (None이면 모든 문자열 컬럼을 고유값 비율로 판단)
+    string_cols: pyarrow 문자열 후보 컬럼 (None이면 category가 되지 않은 나머지 문자열 컬럼)
+    label을 주면 변환 전/후 메모리 사용량을 기록하여 render_memory_debug_panel에 표시합니다.
+    """
+    if df is None or df.empty:
+        return df
+    before_bytes = frame_memory_bytes(df) if label else None
+    category_candidates = set(df.columns if category_cols is None else category_cols)
+    string_candidates = None if string_cols is None else set(string_cols)
+
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if _is_string_column(series):
+            if col in category_candidates and series.nunique(dropna=True) <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+                converted[col] = series.astype('category')
+            elif ARROW_STRINGS_AVAILABLE and not series.hasnans and (string_candidates is None or col in string_candidates):
+                converted[col] = series.astype('string[pyarrow]')
+        else:
+            downcast = _downcast_numeric(series)
+            if downcast is not series:
+                converted[col] = downcast
+    df_compact = df.assign(**converted) if converted else df.copy()
+
+    if label:
+        with _memory_stats_lock:
+            _memory_stats[label] = {'rows': len(df_compact), 'before': before_bytes, 'after': frame_memory_bytes(df_compact)}
+    return df_compact
+
+
+def combine_masks(*masks):
+    """여러 불리언 마스크(Series/배열, None은 무시)를 AND로 합친 numpy 배열을 반환합니다."""
+    combined = None
+    for mask in masks:
+        if mask is None:
+            continue
+        mask_values = np.asarray(mask, dtype=bool)
+        combined = mask_values if combined is None else (combined & mask_values)
+    return combined
+
+
+def take_rows(df, mask=None, columns=None):
+    """
+    mask가 True인 행의 columns(없는 컬럼은 건너뜀)만 한 번에 잘라 새 DataFrame으로 반환합니다.
+    원본 전체를 복사하지 않으며, 결과는 원본과 메모리를 공유하지 않으므로 호출자가 자유롭게 수정해도 됩니다.
+    mask가 None이면 모든 행을 사용합니다.
+    """
+    if columns is not None:
+        col_positions = df.columns.get_indexer([col for col in columns if col in df.columns])
+        df = df.take(col_positions, axis=1)
+    if mask is None:
+        return df.copy() if columns is None else df
+    return df.take(np.flatnonzero(np.asarray(mask, dtype=bool)), axis=0)
+
+
+def get_memory_stats():
+    """compact_frame(label=...)로 기록된 라벨별 메모리 통계의 복사본을 반환합니다."""
+    with _memory_stats_lock:
+        return {label: dict(stats) for label, stats in _memory_stats.items()}
+
+
+def render_memory_debug_panel(frames=None):
+    """
+    사이드바에 메모리 사용량 디버그 패널을 표시합니다 (체크했을 때만 계산).
+    compact_frame에 기록된 변환 전/후 사용량과, frames(라벨 -> DataFrame)로 넘긴 현재 화면 데이터의 사용량을 보여 줍니다.
+    """
+    if not st.sidebar.checkbox("🧠 메모리 사용량 보기 (디버그)", key="memory_debug_panel"):
+        return
+    rows = []
+    for label, stats in get_memory_stats().items():
+        saved_ratio = 1 - stats['after'] / stats['before'] if stats['before'] else 0.0
+        rows.append({'데이터': label, '행 수': stats['rows'], '변환 전(MB)': stats['before'] / 1024 ** 2,
+                     '변환 후(MB)': stats['after'] / 1024 ** 2, '절감률(%)': saved_ratio * 100})
+    for label, df in (frames or {}).items():
+        if df is None:
+            continue
+        current_mb = frame_memory_bytes(df) / 1024 ** 2
+        rows.append({'데이터': f"{label} (현재)", '행 수': len(df), '변환 전(MB)': np.nan,
+                     '변환 후(MB)': current_mb, '절감률(%)': np.nan})
+    if not rows:
+        st.sidebar.caption("기록된 메모리 사용량이 없습니다.")
+        return
+    st.sidebar.dataframe(
+        pd.DataFrame(rows).style.format({'변환 전(MB)': '{:,.2f}', '변환 후(MB)': '{:,.2f}', '절감률(%)': '{:.0f}%'}, na_rep='-'),
+        hide_index=True, use_container_width=True
+    )
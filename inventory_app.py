@@ -8,20 +8,26 @@ import os
 import traceback
 import plotly.express as px
 import json
-import io
 
 # --- Google Drive API 관련 라이브러리 임포트 ---
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
+
+# common_utils.py 에서 공통 다운로드 함수 가져오기 (파일 버전 기반 캐싱)
+from common_utils import DATASET_CACHE_MAX_ENTRIES, PREFETCH_DRIVE_FILES, TransientLoadError, get_available_sheet_dates, get_drive_file_version, prefetch_drive_files
+from sm_history import load_sm_history_rows
+from log_store import get_log_cube, get_log_max_date, load_log_rows
+from display_utils import format_box_kg_table, format_date_headers
+from chart_utils import downsample_frame
+from cache_warmer import attach_page_to_cache_warmer
+from sheet_schemas import PURCHASE_LOG_SCHEMA, SALES_LOG_SCHEMA
 
 # --- 페이지 설정 (가장 먼저 호출) ---
 st.set_page_config(page_title="데이터 분석 대시보드", layout="wide", initial_sidebar_state="expanded")
 
 
 # --- 상수 정의 ---
-KOREAN_DAYS = ['월', '화', '수', '목', '금', '토', '일']
 # 메모 기능이 완전히 제거되었으므로, 읽기 전용 권한만 사용합니다.
 DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 SM_FILE_ID = "1tRljdvOpp4fITaVEXvoL9mNveNg2qt4p"
@@ -33,10 +39,13 @@ REPORT_LOCATION_MAP_TREND = {'신갈냉동': '신갈', '선왕CH4층': '선왕',
 TARGET_SM_LOCATIONS_FOR_TREND = ['신갈냉동', '선왕CH4층', '신갈김형제', '신갈상이품/작업', '케이미트스토어']
 REPORT_ROW_ORDER_TREND = ['신갈', '선왕', '김형제', '상이품', '스토어']
 PURCHASE_DATE_COL = '매입일자'; PURCHASE_CODE_COL = '코드'; PURCHASE_CUSTOMER_COL = '거래처명'
-PURCHASE_PROD_CODE_COL = '상품코드'; PURCHASE_PROD_NAME_COL = '상 품 명'; PURCHASE_LOCATION_COL = '지 점 명'
+# 원본의 '상 품 명', '지 점 명' 컬럼은 p-list 스키마로 읽을 때 '상품명', '지점명'으로 바뀝니다.
+PURCHASE_PROD_CODE_COL = '상품코드'; PURCHASE_PROD_NAME_COL = '상품명'; PURCHASE_LOCATION_COL = '지점명'
 PURCHASE_QTY_BOX_COL = 'Box'; PURCHASE_QTY_KG_COL = 'Kg'
 PURCHASE_LOG_SHEET_NAME = 'p-list'
-SALES_DATE_COL = '매출일자'; SALES_PROD_CODE_COL = '상품코드'; SALES_PROD_NAME_COL = '상  품  명'
+# 매입내역은 같은 전표의 둘째 줄부터 일자/지점/코드/거래처가 비어 있으므로 위에서 채워 넣습니다 (log_store 적재 시 적용).
+PURCHASE_LOG_FFILL_COLS = (PURCHASE_DATE_COL, PURCHASE_LOCATION_COL, PURCHASE_CODE_COL, PURCHASE_CUSTOMER_COL)
+SALES_DATE_COL = '매출일자'; SALES_PROD_CODE_COL = '상품코드'; SALES_PROD_NAME_COL = '상품명' # 원본 '상  품  명'
 SALES_QTY_BOX_COL = '수량(Box)'; SALES_QTY_KG_COL = '수량(Kg)'; SALES_LOCATION_COL = '지점명'
 SALES_LOG_SHEET_NAME = 's-list'
 SUMMARY_TABLE_LOCATIONS = ['신갈냉동', '선왕CH4층', '신갈김형제', '신갈상이품/작업', '케이미트스토어']
@@ -67,155 +76,129 @@ def get_drive_service():
         # 클라우드 배포 시에는 이 부분이 실행되지 않으므로, 오류를 발생시키지 않습니다.
         return None
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
-def download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg="Excel file"):
-    if _drive_service is None: return None
-    try:
-        request = _drive_service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-        fh.seek(0)
-        return fh
-    except Exception as e:
-        st.error(f"파일 다운로드 오류 ({file_name_for_error_msg}): {e}")
-        return None
-
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
+# 아래 로더들은 Drive 파일 버전을 캐시 키에 포함하여 결과를 st.cache_resource에 보관합니다.
+# 파일이 바뀌지 않는 한 모든 세션이 같은 결과 객체를 복사 없이 공유하므로, 반환된 DataFrame은 수정하지 않습니다.
 def get_all_available_sheet_dates_from_excel_drive(_drive_service, file_id, file_name_for_error_msg="SM재고현황.xlsx"):
-    fh = download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg)
-    if fh is None: return []
-    try:
-        xls = pd.ExcelFile(fh)
-        sheet_names = xls.sheet_names
-        valid_dates = []
-        for name in sheet_names:
-            try: 
-                dt_obj = datetime.datetime.strptime(name, "%Y%m%d").date()
-                valid_dates.append(dt_obj)
-            except ValueError: 
-                continue
-        valid_dates.sort(reverse=True)
-        return valid_dates
-    except Exception as e:
-        st.warning(f"시트 날짜 조회 오류: {e}")
-        return []
+    # 시트 목록은 common_utils의 공유 통합문서 레지스트리에서 파일 버전별로 한 번만 읽습니다.
+    return get_available_sheet_dates(_drive_service, file_id, file_name_for_error_msg)
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def load_sm_data_from_excel_drive(_drive_service, file_id, date_strings_yyyymmdd_list, file_name_for_error_msg="SM재고현황.xlsx"):
+    # 일자별 재고 행은 sm_history 이력 저장소에서 시트마다 한 번만 변환된 것을 가져옵니다 (상품코드/지점명별 합계).
     if not date_strings_yyyymmdd_list: return None
-    fh = download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg)
-    if fh is None: return None
-    all_data = []
-    try:
-        xls = pd.ExcelFile(fh)
-        available_sheets = xls.sheet_names
-        for date_str in date_strings_yyyymmdd_list:
-            if date_str in available_sheets:
-                try:
-                    df_sheet = pd.read_excel(xls, sheet_name=date_str, header=0)
-                    df_sheet.dropna(how='all', inplace=True)
-                    if df_sheet.empty: continue
-                    required_cols = ['지점명', '상품코드', SM_QTY_COL_TREND, SM_WGT_COL_TREND]
-                    if not all(col in df_sheet.columns for col in required_cols):
-                        continue
-                    df_sheet_copy = df_sheet.copy()
-                    df_sheet_copy['날짜'] = pd.to_datetime(date_str, format='%Y%m%d')
-                    df_processed_sheet = df_sheet_copy[['날짜', '지점명', '상품코드', SM_QTY_COL_TREND, SM_WGT_COL_TREND]].copy()
-                    for col in [SM_QTY_COL_TREND, SM_WGT_COL_TREND]:
-                        df_processed_sheet[col] = pd.to_numeric(df_processed_sheet[col], errors='coerce').fillna(0)
-                    df_processed_sheet['지점명'] = df_processed_sheet['지점명'].astype(str).str.strip()
-                    df_processed_sheet['날짜'] = pd.to_datetime(df_processed_sheet['날짜']).dt.normalize()
-                    all_data.append(df_processed_sheet)
-                except Exception:
-                    continue
-        if not all_data: return None
-        return pd.concat(all_data, ignore_index=True)
-    except Exception:
-        return None
+    return load_sm_history_rows(_drive_service, file_id, date_strings_yyyymmdd_list, file_name_for_error_msg)
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
-def get_latest_date_from_log_drive(_drive_service, file_id, sheet_name, date_col, file_name_for_error_msg=""):
-    fh = download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg)
-    if fh is None: return None
+def get_latest_date_from_log_drive(_drive_service, file_id, sheet_name, date_col, file_name_for_error_msg="", ffill_cols=(), schema=None):
+    # 최신 일자는 log_store가 적재할 때 기록한 워터마크를 그대로 사용합니다 (시트 전체를 다시 읽지 않음).
     try:
-        df = pd.read_excel(fh, sheet_name=sheet_name, header=0)
-        df.dropna(subset=[date_col], how='all', inplace=True)
-        if df.empty or date_col not in df.columns: return None
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-        df.dropna(subset=[date_col], inplace=True)
-        if df.empty: return None
-        return df[date_col].max().date()
+        return get_log_max_date(_drive_service, file_id, sheet_name, date_col, ffill_cols, file_name_for_error_msg, schema)
     except Exception:
         return None
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def load_daily_log_data_for_period_from_excel_drive(_drive_service, file_id, sheet_name, date_col, location_col, qty_box_col, qty_kg_col, start_date, end_date, is_purchase_log=False, file_name_for_error_msg=""):
-    fh = download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg)
-    if fh is None: return pd.DataFrame()
+    file_version = get_drive_file_version(_drive_service, file_id, file_name_for_error_msg)
+    if file_version is None: return pd.DataFrame()
     try:
-        df = pd.read_excel(fh, sheet_name=sheet_name, header=0)
-        df.dropna(how='all', inplace=True)
-        if df.empty: return pd.DataFrame()
-        if is_purchase_log:
-            ffill_cols = [date_col, location_col, PURCHASE_CODE_COL, PURCHASE_CUSTOMER_COL]
-            for col_to_ffill in ffill_cols:
-                if col_to_ffill in df.columns:
-                    df[col_to_ffill] = df[col_to_ffill].ffill()
-                elif col_to_ffill == date_col or col_to_ffill == location_col:
-                    return pd.DataFrame()
-        required_cols_log = [date_col, location_col, qty_box_col, qty_kg_col]
-        if not all(col in df.columns for col in required_cols_log):
-            return pd.DataFrame()
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
-        df.dropna(subset=[date_col], inplace=True)
-        if df.empty: return pd.DataFrame()
-        mask = (df[date_col].dt.date >= start_date) & (df[date_col].dt.date <= end_date)
-        df_period = df.loc[mask].copy()
-        if df_period.empty: return pd.DataFrame()
-        for col in [qty_box_col, qty_kg_col]:
-            df_period[col] = pd.to_numeric(df_period[col], errors='coerce').fillna(0)
-        df_period[location_col] = df_period[location_col].astype(str).str.strip()
-        daily_summary = df_period.groupby([df_period[date_col].dt.date, location_col]).agg(
-            TotalQtyBox=(qty_box_col, 'sum'),
-            TotalQtyKg=(qty_kg_col, 'sum')
-        ).reset_index()
-        daily_summary.rename(columns={date_col: '날짜'}, inplace=True)
-        return daily_summary
-    except Exception:
+        return _load_daily_log_data_for_version(_drive_service, file_id, sheet_name, date_col, location_col, qty_box_col, qty_kg_col, start_date, end_date, is_purchase_log, file_version, file_name_for_error_msg)
+    except TransientLoadError:
+        # 실패는 캐시되지 않으므로 다음 rerun에서 다시 시도합니다.
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"'{file_name_for_error_msg}' 기간 집계 중 예상 못한 오류: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
-def load_log_data_for_period_from_excel_drive(_drive_service, file_id, sheet_name, date_col, qty_kg_col, location_col, start_date, end_date, is_purchase_log=False, file_name_for_error_msg=""):
-    fh = download_excel_from_drive_as_bytes(_drive_service, file_id, file_name_for_error_msg)
-    if fh is None: return pd.DataFrame()
-    try:
-        df = pd.read_excel(fh, sheet_name=sheet_name, header=0)
-        df.dropna(how='all', inplace=True)
-        if df.empty: return pd.DataFrame()
-        if is_purchase_log:
-            ffill_cols = [date_col, location_col, PURCHASE_CODE_COL, PURCHASE_CUSTOMER_COL]
-            for col_to_ffill in ffill_cols:
-                if col_to_ffill in df.columns: df[col_to_ffill] = df[col_to_ffill].ffill()
-                elif col_to_ffill == date_col or col_to_ffill == location_col:
-                    return pd.DataFrame()
-        if date_col not in df.columns or qty_kg_col not in df.columns:
-            return pd.DataFrame()
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
-        df.dropna(subset=[date_col], inplace=True)
-        df[qty_kg_col] = pd.to_numeric(df[qty_kg_col], errors='coerce').fillna(0)
-        mask = (df[date_col].dt.date >= start_date) & (df[date_col].dt.date <= end_date)
-        df_period = df.loc[mask].copy()
-        if df_period.empty: return pd.DataFrame()
-        df_period['월'] = df_period[date_col].dt.strftime('%Y-%m')
-        monthly_sum = df_period.groupby('월')[qty_kg_col].sum().reset_index()
-        monthly_sum.rename(columns={qty_kg_col: '중량(Kg)'}, inplace=True)
-        return monthly_sum
-    except Exception:
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_daily_log_data_for_version(_drive_service, file_id, sheet_name, date_col, location_col, qty_box_col, qty_kg_col, start_date, end_date, is_purchase_log, file_version, file_name_for_error_msg):
+    # 조회 기간에 걸친 월 파티션만 읽습니다. 매입내역의 빈 칸 채우기(ffill)는 적재 시 이미 적용되어 있습니다.
+    ffill_cols = (date_col, location_col, PURCHASE_CODE_COL, PURCHASE_CUSTOMER_COL) if is_purchase_log else ()
+    schema = PURCHASE_LOG_SCHEMA.name if is_purchase_log else SALES_LOG_SCHEMA.name
+    df = load_log_rows(_drive_service, file_id, sheet_name, date_col, start_date, end_date, ffill_cols, file_name_for_error_msg, schema, file_version)
+    if df is None: raise TransientLoadError(f"{file_name_for_error_msg} 로그 읽기 실패") # 빈 결과를 캐시하지 않음
+    df.dropna(how='all', inplace=True)
+    if df.empty: return pd.DataFrame()
+    if is_purchase_log and (date_col not in df.columns or location_col not in df.columns):
         return pd.DataFrame()
+    required_cols_log = [date_col, location_col, qty_box_col, qty_kg_col]
+    if not all(col in df.columns for col in required_cols_log):
+        return pd.DataFrame()
+    df[date_col] = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
+    df.dropna(subset=[date_col], inplace=True)
+    if df.empty: return pd.DataFrame()
+    mask = (df[date_col].dt.date >= start_date) & (df[date_col].dt.date <= end_date)
+    df_period = df.loc[mask].copy()
+    if df_period.empty: return pd.DataFrame()
+    # 수량은 스키마로 읽어 이미 숫자이고, 지점명은 공백이 제거된 문자열입니다.
+    for col in [qty_box_col, qty_kg_col]:
+        df_period[col] = df_period[col].fillna(0)
+    daily_summary = df_period.groupby([df_period[date_col].dt.date, location_col]).agg(
+        TotalQtyBox=(qty_box_col, 'sum'),
+        TotalQtyKg=(qty_kg_col, 'sum')
+    ).reset_index()
+    daily_summary.rename(columns={date_col: '날짜'}, inplace=True)
+    return daily_summary
+
+# --- 메인 페이지 데이터셋 ---
+# 렌더링과 백그라운드 갱신기(cache_warmer)가 같은 함수를 같은 인자로 호출하므로, 갱신기가 미리 만든 캐시를 화면이 그대로 사용합니다.
+def select_report_dates(all_available_dates_desc, today):
+    """오늘 이전의 가장 최근 날짜부터 최대 7일치 날짜를 오름차순으로 고릅니다. (날짜 목록, 최신 날짜로 대체했는지) 반환."""
+    latest_anchor_date = next((dt for dt in all_available_dates_desc if dt <= today), None)
+    used_fallback = latest_anchor_date is None
+    if used_fallback:
+        latest_anchor_date = all_available_dates_desc[0]
+    start_index = all_available_dates_desc.index(latest_anchor_date)
+    end_index = min(start_index + 7, len(all_available_dates_desc))
+    dates_for_report = sorted(all_available_dates_desc[start_index:end_index][:7])
+    return dates_for_report, used_fallback
+
+def get_latest_log_dates(_drive_service):
+    latest_purchase_date = get_latest_date_from_log_drive(_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, "입고내역.xlsx", PURCHASE_LOG_FFILL_COLS, PURCHASE_LOG_SCHEMA.name)
+    latest_sales_date = get_latest_date_from_log_drive(_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, "출고내역.xlsx", schema=SALES_LOG_SCHEMA.name)
+    return latest_purchase_date, latest_sales_date
+
+def load_purchase_daily_summary(_drive_service, start_date, end_date):
+    return load_daily_log_data_for_period_from_excel_drive(
+        _drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME,
+        PURCHASE_DATE_COL, PURCHASE_LOCATION_COL, PURCHASE_QTY_BOX_COL, PURCHASE_QTY_KG_COL,
+        start_date, end_date,
+        is_purchase_log=True, file_name_for_error_msg="입고내역.xlsx"
+    )
 
+def load_sales_daily_summary(_drive_service, start_date, end_date):
+    return load_daily_log_data_for_period_from_excel_drive(
+        _drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME,
+        SALES_DATE_COL, SALES_LOCATION_COL, SALES_QTY_BOX_COL, SALES_QTY_KG_COL,
+        start_date, end_date,
+        file_name_for_error_msg="출고내역.xlsx"
+    )
+
+def get_purchase_log_cube(_drive_service):
+    return get_log_cube(_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, PURCHASE_LOCATION_COL, PURCHASE_QTY_KG_COL, PURCHASE_QTY_BOX_COL, PURCHASE_LOG_FFILL_COLS, file_name_for_error_msg="입고내역.xlsx", schema=PURCHASE_LOG_SCHEMA.name)
+
+def get_sales_log_cube(_drive_service):
+    return get_log_cube(_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, SALES_LOCATION_COL, SALES_QTY_KG_COL, SALES_QTY_BOX_COL, file_name_for_error_msg="출고내역.xlsx", schema=SALES_LOG_SCHEMA.name)
+
+def warm_sm_trend_datasets(_drive_service):
+    """갱신기 작업: 1~4번 섹션의 7일 재고 추이 데이터를 미리 만듭니다."""
+    all_available_dates_desc = get_all_available_sheet_dates_from_excel_drive(_drive_service, SM_FILE_ID, "SM재고현황.xlsx")
+    if not all_available_dates_desc: return
+    dates_for_report, _ = select_report_dates(all_available_dates_desc, datetime.date.today())
+    load_sm_data_from_excel_drive(_drive_service, SM_FILE_ID, [d.strftime("%Y%m%d") for d in dates_for_report], "SM재고현황.xlsx")
+
+def warm_log_datasets(_drive_service):
+    """갱신기 작업: 5번(최근 7일 입고/출고)과 6번(전년 동기 비교) 섹션의 데이터를 미리 만듭니다."""
+    latest_dates = [d for d in get_latest_log_dates(_drive_service) if d]
+    if latest_dates:
+        end_date_7day = max(latest_dates)
+        start_date_7day = end_date_7day - datetime.timedelta(days=6)
+        load_purchase_daily_summary(_drive_service, start_date_7day, end_date_7day)
+        load_sales_daily_summary(_drive_service, start_date_7day, end_date_7day)
+    get_purchase_log_cube(_drive_service)
+    get_sales_log_cube(_drive_service)
+
+MAIN_PAGE_WARM_TASKS = [
+    (SM_FILE_ID, warm_sm_trend_datasets),
+    (PURCHASE_FILE_ID, warm_log_datasets),
+    (SALES_FILE_ID, warm_log_datasets),
+]
 
 # --- 페이지 렌더링 함수 ---
 def render_main_page_content():
@@ -236,15 +219,10 @@ def render_main_page_content():
         st.warning("경고: 'SM재고현황.xlsx' 파일에서 사용 가능한 날짜 형식의 시트를 찾을 수 없습니다.")
     else:
         today = datetime.date.today()
-        latest_anchor_date = next((dt for dt in all_available_dates_desc if dt <= today), None)
-        if latest_anchor_date is None:
+        dates_for_report, used_fallback = select_report_dates(all_available_dates_desc, today)
+        if used_fallback:
             st.warning(f"경고: 오늘({today.strftime('%Y-%m-%d')}) 또는 그 이전 날짜에 대한 데이터를 찾을 수 없어 가장 최근 데이터로 리포트를 생성합니다.")
-            latest_anchor_date = all_available_dates_desc[0]
-        start_index = all_available_dates_desc.index(latest_anchor_date)
-        end_index = min(start_index + 7, len(all_available_dates_desc))
-        dates_for_report = all_available_dates_desc[start_index:end_index][:7]
         if dates_for_report:
-            dates_for_report.sort()
             st.info(f"분석 기간 ({len(dates_for_report)}일 데이터): {dates_for_report[0].strftime('%Y-%m-%d')} ~ {dates_for_report[-1].strftime('%Y-%m-%d')}")
         else:
             st.warning("경고: 리포트에 사용할 날짜를 선정하지 못했습니다.")
@@ -273,7 +251,7 @@ def render_main_page_content():
                 daily_location_summary['날짜'] = pd.to_datetime(daily_location_summary['날짜']).dt.normalize()
                 chart_pivot_raw = daily_location_summary.pivot_table(index='날짜', columns='창고명', values=value_column)
                 chart_pivot_final = chart_pivot_raw.reindex(index=report_dates_pd, columns=REPORT_ROW_ORDER_TREND).fillna(0)
-                st.line_chart(chart_pivot_final, use_container_width=True, height=220)
+                st.line_chart(downsample_frame(chart_pivot_final), use_container_width=True, height=220) # 기간이 길면 그래프 폭에 맞게 점 수를 줄임
             except Exception as e_chart1:
                 st.error(f"재고 추이 차트 생성 오류: {e_chart1}")
         elif dates_for_report:
@@ -319,52 +297,15 @@ def render_main_page_content():
             table_pivot_qty = daily_location_summary.pivot_table(index='창고명', columns='날짜', values=SM_QTY_COL_TREND, fill_value=0).reindex(index=REPORT_ROW_ORDER_TREND, columns=report_dates_pd, fill_value=0)
             table_pivot_wgt = daily_location_summary.pivot_table(index='창고명', columns='날짜', values=SM_WGT_COL_TREND, fill_value=0).reindex(index=REPORT_ROW_ORDER_TREND, columns=report_dates_pd, fill_value=0)
             
-            qty_diff = pd.DataFrame(index=table_pivot_qty.index, columns=table_pivot_qty.columns); daily_qty_totals = table_pivot_qty.sum(axis=0)
-            daily_wgt_totals = table_pivot_wgt.sum(axis=0); total_qty_diff = pd.Series(dtype='float64', index=daily_qty_totals.index)
-            
-            if len(table_pivot_qty.columns) > 1: qty_diff = table_pivot_qty.diff(axis=1)
-            if len(daily_qty_totals.index) > 1: total_qty_diff = daily_qty_totals.diff()
-
-            combined_table = pd.DataFrame(index=table_pivot_qty.index, columns=pd.MultiIndex.from_tuples([(ts, KOREAN_DAYS[ts.weekday()]) for ts in table_pivot_qty.columns], names=['날짜', '요일_temp']), dtype=object)
-            
-            for date_col_ts in table_pivot_qty.columns:
-                qty_series = table_pivot_qty[date_col_ts]; wgt_series = table_pivot_wgt[date_col_ts]; diff_series = qty_diff.get(date_col_ts)
-                cell_strings = []
-                for warehouse in table_pivot_qty.index:
-                    qty_val = qty_series.get(warehouse, 0); wgt_val = wgt_series.get(warehouse, 0); diff_val = diff_series.get(warehouse, None) if diff_series is not None else None
-                    base_string = f"{qty_val:,.0f} / {wgt_val:,.1f} Kg"; indicator = ""
-                    if qty_val == 0 and wgt_val == 0: cell_strings.append("-")
-                    else:
-                        if pd.notnull(diff_val) and len(table_pivot_qty.columns) > 1:
-                            if diff_val > 0.01: indicator = "🔺 "
-                            elif diff_val < -0.01: indicator = "▼ "
-                        cell_strings.append(f"{indicator}{base_string}")
-                combined_table[(date_col_ts, KOREAN_DAYS[date_col_ts.weekday()])] = cell_strings
-            
-            total_row_data = {}
-            for date_col_ts in table_pivot_qty.columns:
-                total_qty_val = daily_qty_totals.get(date_col_ts, 0); total_wgt_val = daily_wgt_totals.get(date_col_ts, 0); total_diff_val = total_qty_diff.get(date_col_ts, None)
-                base_total_string = f"{total_qty_val:,.0f} / {total_wgt_val:,.1f} Kg"; total_indicator = ""
-                if total_qty_val == 0 and total_wgt_val == 0:
-                    total_row_data[(date_col_ts, KOREAN_DAYS[date_col_ts.weekday()])] = "-"
-                else:
-                    if pd.notnull(total_diff_val) and len(daily_qty_totals.index) > 1:
-                        if total_diff_val > 0.01: total_indicator = "🔺 "
-                        elif total_diff_val < -0.01: total_indicator = "▼ "
-                    total_row_data[(date_col_ts, KOREAN_DAYS[date_col_ts.weekday()])] = f"{total_indicator}{base_total_string}"
-            
-            combined_table.loc['합계'] = pd.Series(total_row_data)
-            combined_table.columns = [f"{ts.strftime('%m/%d')}({day})" for ts, day in combined_table.columns]
-            
-            combined_table_display = combined_table.reindex(REPORT_ROW_ORDER_TREND + ['합계'])
-            st.dataframe(combined_table_display.reset_index().rename(columns={'index': '창고명'}), hide_index=True, use_container_width=True, height=300)
+            combined_table_display = format_box_kg_table(table_pivot_qty, table_pivot_wgt, kg_suffix=" Kg", show_change_indicator=True, row_label='창고명')
+            st.dataframe(combined_table_display, hide_index=True, use_container_width=True, height=300)
         except Exception as e_table:
             st.error(f"표 데이터 생성 중 오류: {e_table}")
             traceback.print_exc()
     elif dates_for_report:
         st.write("표시할 테이블 데이터가 없습니다.")
         if not report_dates_pd.empty:
-            empty_table_cols = [ts.strftime('%m/%d') + f"({KOREAN_DAYS[ts.weekday()]})" for ts in report_dates_pd]
+            empty_table_cols = format_date_headers(report_dates_pd)
             empty_table_data = {col_name: ['-'] * (len(REPORT_ROW_ORDER_TREND) + 1) for col_name in empty_table_cols}
             empty_table_df = pd.DataFrame(empty_table_data, index=REPORT_ROW_ORDER_TREND + ['합계']); empty_table_df.index.name = '창고명'
             st.dataframe(empty_table_df.reset_index(), hide_index=True, use_container_width=True, height=300)
@@ -374,8 +315,7 @@ def render_main_page_content():
     st.markdown("---")
 
     st.markdown(f"{title_style}5. 최근 7일 일별 입고/출고 현황</h3>", unsafe_allow_html=True)
-    latest_purchase_date = get_latest_date_from_log_drive(current_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, "입고내역.xlsx")
-    latest_sales_date = get_latest_date_from_log_drive(current_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, "출고내역.xlsx")
+    latest_purchase_date, latest_sales_date = get_latest_log_dates(current_drive_service)
     overall_latest_date = None
     if latest_purchase_date and latest_sales_date: overall_latest_date = max(latest_purchase_date, latest_sales_date)
     elif latest_purchase_date: overall_latest_date = latest_purchase_date
@@ -390,63 +330,27 @@ def render_main_page_content():
         with log_cols[0]:
             st.markdown("<h4 style='font-size:1.0rem; margin-bottom:0.1rem;'>일별 입고 현황 (Box/Kg)</h4>", unsafe_allow_html=True)
             st.caption(period_caption)
-            df_purchase_daily_raw = load_daily_log_data_for_period_from_excel_drive(
-                current_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME,
-                PURCHASE_DATE_COL, PURCHASE_LOCATION_COL, PURCHASE_QTY_BOX_COL, PURCHASE_QTY_KG_COL,
-                start_date_7day, end_date_7day,
-                is_purchase_log=True, file_name_for_error_msg="입고내역.xlsx"
-            )
+            df_purchase_daily_raw = load_purchase_daily_summary(current_drive_service, start_date_7day, end_date_7day)
             if df_purchase_daily_raw is not None and not df_purchase_daily_raw.empty:
                 purchase_pivot_box = df_purchase_daily_raw.pivot_table(index=PURCHASE_LOCATION_COL, columns='날짜', values='TotalQtyBox', fill_value=0)
                 purchase_pivot_kg = df_purchase_daily_raw.pivot_table(index=PURCHASE_LOCATION_COL, columns='날짜', values='TotalQtyKg', fill_value=0)
                 purchase_pivot_box = purchase_pivot_box.reindex(index=SUMMARY_TABLE_LOCATIONS, columns=actual_7day_date_range, fill_value=0)
                 purchase_pivot_kg = purchase_pivot_kg.reindex(index=SUMMARY_TABLE_LOCATIONS, columns=actual_7day_date_range, fill_value=0)
-                purchase_combined_table = pd.DataFrame(index=purchase_pivot_box.index, columns=pd.MultiIndex.from_tuples([(d, KOREAN_DAYS[d.weekday()]) for d in purchase_pivot_box.columns]), dtype=object)
-                daily_purchase_totals_box = purchase_pivot_box.sum(axis=0)
-                daily_purchase_totals_kg = purchase_pivot_kg.sum(axis=0)
-                for date_col_obj in purchase_pivot_box.columns:
-                    for loc_idx, loc in enumerate(purchase_combined_table.index):
-                        box = purchase_pivot_box.iloc[loc_idx][date_col_obj]
-                        kg = purchase_pivot_kg.iloc[loc_idx][date_col_obj]
-                        purchase_combined_table.loc[loc, (date_col_obj, KOREAN_DAYS[date_col_obj.weekday()])] = f"{box:,.0f} / {kg:,.1f}" if not (box == 0 and kg == 0) else "-"
-                total_row_data_p = {}
-                for date_obj in purchase_pivot_box.columns:
-                    total_val_str = f"{daily_purchase_totals_box.get(date_obj, 0):,.0f} / {daily_purchase_totals_kg.get(date_obj, 0):,.1f}"
-                    total_row_data_p[(date_obj, KOREAN_DAYS[date_obj.weekday()])] = total_val_str if not (daily_purchase_totals_box.get(date_obj, 0) == 0 and daily_purchase_totals_kg.get(date_obj, 0) == 0) else "-"
-                purchase_combined_table.loc['합계'] = pd.Series(total_row_data_p)
-                purchase_combined_table.columns = [f"{d.strftime('%m/%d')}({day})" for d, day in purchase_combined_table.columns]
-                st.dataframe(purchase_combined_table.reset_index().rename(columns={'index': '지점명'}), hide_index=True, use_container_width=True, height=250)
+                purchase_combined_table = format_box_kg_table(purchase_pivot_box, purchase_pivot_kg, row_label='지점명')
+                st.dataframe(purchase_combined_table, hide_index=True, use_container_width=True, height=250)
             else:
                 st.write("해당 기간 입고 데이터가 없습니다.")
         with log_cols[1]:
             st.markdown("<h4 style='font-size:1.0rem; margin-bottom:0.1rem;'>일별 출고 현황 (Box/Kg)</h4>", unsafe_allow_html=True)
             st.caption(period_caption)
-            df_sales_daily_raw = load_daily_log_data_for_period_from_excel_drive(
-                current_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME,
-                SALES_DATE_COL, SALES_LOCATION_COL, SALES_QTY_BOX_COL, SALES_QTY_KG_COL,
-                start_date_7day, end_date_7day,
-                file_name_for_error_msg="출고내역.xlsx"
-            )
+            df_sales_daily_raw = load_sales_daily_summary(current_drive_service, start_date_7day, end_date_7day)
             if df_sales_daily_raw is not None and not df_sales_daily_raw.empty:
                 sales_pivot_box = df_sales_daily_raw.pivot_table(index=SALES_LOCATION_COL, columns='날짜', values='TotalQtyBox', fill_value=0)
                 sales_pivot_kg = df_sales_daily_raw.pivot_table(index=SALES_LOCATION_COL, columns='날짜', values='TotalQtyKg', fill_value=0)
                 sales_pivot_box = sales_pivot_box.reindex(index=SUMMARY_TABLE_LOCATIONS, columns=actual_7day_date_range, fill_value=0)
                 sales_pivot_kg = sales_pivot_kg.reindex(index=SUMMARY_TABLE_LOCATIONS, columns=actual_7day_date_range, fill_value=0)
-                sales_combined_table = pd.DataFrame(index=sales_pivot_box.index, columns=pd.MultiIndex.from_tuples([(d, KOREAN_DAYS[d.weekday()]) for d in sales_pivot_box.columns]), dtype=object)
-                daily_sales_totals_box = sales_pivot_box.sum(axis=0)
-                daily_sales_totals_kg = sales_pivot_kg.sum(axis=0)
-                for date_col_obj in sales_pivot_box.columns:
-                    for loc_idx, loc in enumerate(sales_combined_table.index):
-                        box = sales_pivot_box.iloc[loc_idx][date_col_obj]
-                        kg = sales_pivot_kg.iloc[loc_idx][date_col_obj]
-                        sales_combined_table.loc[loc, (date_col_obj, KOREAN_DAYS[date_col_obj.weekday()])] = f"{box:,.0f} / {kg:,.1f}" if not (box == 0 and kg == 0) else "-"
-                total_row_data_s = {}
-                for date_obj in sales_pivot_box.columns:
-                    total_val_str = f"{daily_sales_totals_box.get(date_obj, 0):,.0f} / {daily_sales_totals_kg.get(date_obj, 0):,.1f}"
-                    total_row_data_s[(date_obj, KOREAN_DAYS[date_obj.weekday()])] = total_val_str if not (daily_sales_totals_box.get(date_obj, 0) == 0 and daily_sales_totals_kg.get(date_obj, 0) == 0) else "-"
-                sales_combined_table.loc['합계'] = pd.Series(total_row_data_s)
-                sales_combined_table.columns = [f"{d.strftime('%m/%d')}({day})" for d, day in sales_combined_table.columns]
-                st.dataframe(sales_combined_table.reset_index().rename(columns={'index': '지점명'}), hide_index=True, use_container_width=True, height=250)
+                sales_combined_table = format_box_kg_table(sales_pivot_box, sales_pivot_kg, row_label='지점명')
+                st.dataframe(sales_combined_table, hide_index=True, use_container_width=True, height=250)
             else:
                 st.write("해당 기간 출고 데이터가 없습니다.")
     else:
@@ -460,24 +364,13 @@ def render_main_page_content():
     previous_year_start = current_year_start - relativedelta(years=1); previous_year_end = current_year_end - relativedelta(years=1)
     st.caption(f"기간: 올해({current_year_start.strftime('%y/%m/%d')}~{current_year_end.strftime('%y/%m/%d')}) vs 작년({previous_year_start.strftime('%y/%m/%d')}~{previous_year_end.strftime('%y/%m/%d')})")
 
-    df_sales_cy = load_log_data_for_period_from_excel_drive(current_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, SALES_QTY_KG_COL, SALES_LOCATION_COL, current_year_start, current_year_end, file_name_for_error_msg="출고내역.xlsx")
-    df_sales_py = load_log_data_for_period_from_excel_drive(current_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, SALES_QTY_KG_COL, SALES_LOCATION_COL, previous_year_start, previous_year_end, file_name_for_error_msg="출고내역.xlsx")
-    df_purchase_cy = load_log_data_for_period_from_excel_drive(current_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, PURCHASE_QTY_KG_COL, PURCHASE_LOCATION_COL, current_year_start, current_year_end, is_purchase_log=True, file_name_for_error_msg="입고내역.xlsx")
-    df_purchase_py = load_log_data_for_period_from_excel_drive(current_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, PURCHASE_QTY_KG_COL, PURCHASE_LOCATION_COL, previous_year_start, previous_year_end, is_purchase_log=True, file_name_for_error_msg="입고내역.xlsx")
-    
-    def prepare_comparison_df(df_cy, df_py, name_prefix):
-        df_list = []
-        if df_cy is not None and not df_cy.empty:
-            df_cy_copy = df_cy.copy(); df_cy_copy['구분'] = f'{name_prefix} (올해)'; df_list.append(df_cy_copy)
-        if df_py is not None and not df_py.empty:
-            df_py_copy = df_py.copy()
-            df_py_copy['월'] = pd.to_datetime(df_py_copy['월']).apply(lambda x: x.replace(year=today.year)).dt.strftime('%Y-%m')
-            df_py_copy['구분'] = f'{name_prefix} (작년)'; df_list.append(df_py_copy)
-        
-        if not df_list: return pd.DataFrame(columns=['월', '중량(Kg)', '구분'])
-        
-        combined = pd.concat(df_list)
-        return combined
+    # 로그마다 [일자 x 지점] 큐브를 파일 버전별로 한 번만 만들고, 올해/작년 월별 합계는 큐브에서 잘라 씁니다.
+    sales_cube = get_sales_log_cube(current_drive_service)
+    purchase_cube = get_purchase_log_cube(current_drive_service)
+
+    def prepare_comparison_df(log_cube, name_prefix):
+        if log_cube is None or log_cube.empty: return pd.DataFrame(columns=['월', '중량(Kg)', '구분'])
+        return log_cube.year_over_year(current_year_end, years_back=1, value_col='Kg', name_prefix=name_prefix)
 
     def plot_comparison_chart(df_combined, title):
         if df_combined.empty or '중량(Kg)' not in df_combined.columns or df_combined['중량(Kg)'].sum() == 0 :
@@ -494,11 +387,11 @@ def render_main_page_content():
 
     comparison_cols = st.columns(2)
     with comparison_cols[0]:
-        df_purchase_compare = prepare_comparison_df(df_purchase_cy, df_purchase_py, "입고")
+        df_purchase_compare = prepare_comparison_df(purchase_cube, "입고")
         plot_comparison_chart(df_purchase_compare, "월별 입고 중량 비교")
     
     with comparison_cols[1]:
-        df_sales_compare = prepare_comparison_df(df_sales_cy, df_sales_py, "출고")
+        df_sales_compare = prepare_comparison_df(sales_cube, "출고")
         plot_comparison_chart(df_sales_compare, "월별 출고 중량 비교")
 
 # --- 앱 실행 로직 ---
@@ -508,7 +401,17 @@ def main():
     if 'drive_service' not in st.session_state:
         st.session_state.drive_service = get_drive_service()
 
-    # 2. Drive 서비스가 성공적으로 로드된 경우에만 나머지 UI를 렌더링합니다.
+    # 2. 세션의 첫 실행에서 등록된 Drive 파일들을 동시에 미리 받아 둡니다.
+    #    (각 섹션/페이지가 차례로 받는 대신, 가장 느린 파일 하나만큼만 기다리게 됩니다.)
+    if st.session_state.get('drive_service') and 'drive_prefetch_done' not in st.session_state:
+        with st.spinner("데이터 파일을 불러오는 중입니다..."):
+            prefetch_drive_files(st.session_state.drive_service, PREFETCH_DRIVE_FILES.keys())
+        st.session_state.drive_prefetch_done = True
+
+    # 3. 서버당 한 번 백그라운드 갱신기를 시작하고, 메인 페이지 데이터셋을 데우기 작업으로 등록합니다 (사이드바 신선도 표시 포함).
+    attach_page_to_cache_warmer(st.session_state.get('drive_service'), "main", MAIN_PAGE_WARM_TASKS)
+
+    # 4. Drive 서비스가 성공적으로 로드된 경우에만 나머지 UI를 렌더링합니다.
     if st.session_state.get('drive_service'):
         # 메인 페이지 콘텐츠를 렌더링합니다.
         render_main_page_content()
@@ -0,0 +1,171 @@
+# inventory_flow.py (재고 흐름 검증: 이전 잔량 + 입고 − 출고 vs SM 실제 잔량)
+#
+# SM재고현황 일자별 스냅샷(sm_history 형식), 매입내역(p-list), 매출내역(s-list)을 맞대어
+# [날짜, 상품코드, 지점명]마다 "직전 스냅샷 잔량 + 그 사이 입고 − 그 사이 출고"로 예상 잔량을 계산하고
+# 실제 스냅샷 잔량과의 차이(잔차)를 구합니다.
+# 스냅샷 날짜가 비어 있는 날(주말 등)의 입출고는 다음 스냅샷 날짜 구간에 합산합니다 (스냅샷은 그날 마감 기준으로 봅니다).
+#
+# 네 가지 값(기초/입고/출고/실제)을 모두 (구간, 상품코드, 지점명) 정수 키 하나로 바꾼 뒤
+# np.bincount로 한 번에 합산하므로, 1년치 날짜와 전 품목을 행별 반복 없이 한 번의 묶음 계산으로 처리합니다.
+# 입력 DataFrame은 캐시된 공유 데이터일 수 있으므로 수정하지 않습니다.
+
+import numpy as np
+import pandas as pd
+
+FLOW_DATE_COL = '날짜'
+FLOW_PREV_DATE_COL = '이전 날짜'
+PROD_CODE_COL = '상품코드'
+LOCATION_COL = '지점명'
+MOVE_BOX_COL = '박스'
+MOVE_KG_COL = 'Kg'
+
+# sm_history 이력 행의 잔량 컬럼
+SNAPSHOT_BOX_COL = '잔량(박스)'
+SNAPSHOT_KG_COL = '잔량(Kg)'
+
+FLOW_UNITS = ['박스', 'Kg']
+MEASURE_OPENING = '기초'
+MEASURE_IN = '입고'
+MEASURE_OUT = '출고'
+MEASURE_ACTUAL = '실제'
+MEASURE_EXPECTED = '예상'
+MEASURE_RESIDUAL = '차이'
+_SUMMED_MEASURES = [MEASURE_OPENING, MEASURE_IN, MEASURE_OUT, MEASURE_ACTUAL]
+
+FLOW_BOX_TOLERANCE = 0.5 # 박스 잔차가 이 값을 넘으면 이상으로 봅니다.
+FLOW_KG_TOLERANCE = 0.1  # Kg 잔차가 이 값을 넘으면 이상으로 봅니다.
+
+FLOW_CHECKED_COUNT_COL = '검사 항목'
+FLOW_FLAGGED_COUNT_COL = '이상 항목'
+FLOW_ABS_RESIDUAL_COL = '차이 절대값 합계(Kg)'
+
+
+def flow_col(measure, unit):
+    """측정값 컬럼 이름 (예: flow_col('예상', 'Kg') -> '예상(Kg)')."""
+    return f"{measure}({unit})"
+
+
+def flow_columns():
+    """흐름 검증 표의 컬럼 순서."""
+    value_cols = [flow_col(measure, unit) for unit in FLOW_UNITS
+                  for measure in (MEASURE_OPENING, MEASURE_IN, MEASURE_OUT, MEASURE_EXPECTED, MEASURE_ACTUAL, MEASURE_RESIDUAL)]
+    return [FLOW_DATE_COL, FLOW_PREV_DATE_COL, PROD_CODE_COL, LOCATION_COL] + value_cols
+
+
+def _empty_flow_frame():
+    return pd.DataFrame({col: pd.Series(dtype='datetime64[ns]' if col in (FLOW_DATE_COL, FLOW_PREV_DATE_COL) else
+                                        object if col in (PROD_CODE_COL, LOCATION_COL) else 'float64')
+                         for col in flow_columns()})
+
+
+def daily_movements(df_rows, date_col, box_col, kg_col, code_col=PROD_CODE_COL, location_col=LOCATION_COL):
+    """
+    매입/매출 로그 행을 [날짜, 상품코드, 지점명]별 박스/Kg 합계로 묶습니다.
+    일자를 해석할 수 없는 행은 제외하며, 필요한 컬럼이 없으면 None을 반환합니다.
+    """
+    if df_rows is None or any(col not in df_rows.columns for col in (date_col, box_col, kg_col, code_col, location_col)):
+        return None
+    dates = pd.to_datetime(df_rows[date_col], errors='coerce').dt.normalize()
+    valid = dates.notna().to_numpy()
+    df_moves = pd.DataFrame({
+        FLOW_DATE_COL: dates[valid].to_numpy(),
+        PROD_CODE_COL: df_rows[code_col][valid].to_numpy(dtype=object),
+        LOCATION_COL: df_rows[location_col][valid].to_numpy(dtype=object),
+        MOVE_BOX_COL: pd.to_numeric(df_rows[box_col][valid], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+        MOVE_KG_COL: pd.to_numeric(df_rows[kg_col][valid], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+    })
+    return df_moves.groupby([FLOW_DATE_COL, PROD_CODE_COL, LOCATION_COL], sort=True, as_index=False, dropna=False)[[MOVE_BOX_COL, MOVE_KG_COL]].sum()
+
+
+def compute_inventory_flow(df_snapshots, df_purchases, df_sales):
+    """
+    연속한 스냅샷 날짜 구간마다 [상품코드, 지점명]별 기초/입고/출고/예상/실제/차이(박스, Kg)를 계산합니다.
+    df_snapshots: sm_history 이력 행 (날짜, 상품코드, 지점명, 잔량(박스), 잔량(Kg))
+    df_purchases / df_sales: daily_movements 결과 (없으면 None)
+    첫 스냅샷 날짜는 기초가 없으므로 결과에 들어가지 않으며, 첫 날짜 이전/마지막 날짜 이후의 입출고는 무시합니다.
+    차이 = 실제 − 예상 (양수면 장부보다 재고가 많음), 예상 = 기초 + 입고 − 출고
+    """
+    if df_snapshots is None or df_snapshots.empty:
+        return _empty_flow_frame()
+    snapshot_dates = pd.DatetimeIndex(pd.unique(df_snapshots[FLOW_DATE_COL])).sort_values()
+    num_dates = len(snapshot_dates)
+    if num_dates < 2:
+        return _empty_flow_frame()
+
+    # 값마다 (구간 번호, 상품코드, 지점명, 측정값 번호, 박스, Kg) 배열을 모읍니다. 구간 i는 (날짜[i-1], 날짜[i]]입니다.
+    snapshot_pos = snapshot_dates.get_indexer(pd.DatetimeIndex(df_snapshots[FLOW_DATE_COL]))
+    snapshot_parts = (df_snapshots[PROD_CODE_COL].to_numpy(dtype=object), df_snapshots[LOCATION_COL].to_numpy(dtype=object),
+                      df_snapshots[SNAPSHOT_BOX_COL].fillna(0).to_numpy(dtype='float64'),
+                      df_snapshots[SNAPSHOT_KG_COL].fillna(0).to_numpy(dtype='float64'))
+    sources = [
+        (snapshot_pos, _SUMMED_MEASURES.index(MEASURE_ACTUAL)) + snapshot_parts,
+        (snapshot_pos + 1, _SUMMED_MEASURES.index(MEASURE_OPENING)) + snapshot_parts,
+    ]
+    for df_moves, measure in ((df_purchases, MEASURE_IN), (df_sales, MEASURE_OUT)):
+        if df_moves is None or df_moves.empty:
+            continue
+        move_pos = snapshot_dates.searchsorted(pd.DatetimeIndex(df_moves[FLOW_DATE_COL]), side='left')
+        sources.append((move_pos, _SUMMED_MEASURES.index(measure),
+                        df_moves[PROD_CODE_COL].to_numpy(dtype=object), df_moves[LOCATION_COL].to_numpy(dtype=object),
+                        df_moves[MOVE_BOX_COL].to_numpy(dtype='float64'), df_moves[MOVE_KG_COL].to_numpy(dtype='float64')))
+
+    intervals = np.concatenate([source[0] for source in sources]).astype(np.int64)
+    keep = (intervals >= 1) & (intervals < num_dates)
+    intervals = intervals[keep]
+    measure_ids = np.concatenate([np.full(len(source[0]), source[1], dtype=np.int64) for source in sources])[keep]
+    product_ids, products = pd.factorize(np.concatenate([source[2] for source in sources])[keep], sort=True, use_na_sentinel=False)
+    location_ids, locations = pd.factorize(np.concatenate([source[3] for source in sources])[keep], sort=True, use_na_sentinel=False)
+    box_values = np.concatenate([source[4] for source in sources])[keep]
+    kg_values = np.concatenate([source[5] for source in sources])[keep]
+    if not len(intervals):
+        return _empty_flow_frame()
+
+    # (구간, 상품, 지점)을 정수 하나로 묶어 한 번에 합산합니다.
+    num_products, num_locations = len(products), len(locations)
+    group_keys = (intervals * num_products + product_ids) * num_locations + location_ids
+    groups, group_ids = np.unique(group_keys, return_inverse=True)
+    num_measures = len(_SUMMED_MEASURES)
+    slots = group_ids * num_measures + measure_ids
+    sums = {
+        'box': np.bincount(slots, weights=box_values, minlength=len(groups) * num_measures).reshape(-1, num_measures),
+        'kg': np.bincount(slots, weights=kg_values, minlength=len(groups) * num_measures).reshape(-1, num_measures),
+    }
+
+    group_intervals = groups // (num_products * num_locations)
+    group_products = (groups // num_locations) % num_products
+    group_locations = groups % num_locations
+    result = {
+        FLOW_DATE_COL: snapshot_dates[group_intervals],
+        FLOW_PREV_DATE_COL: snapshot_dates[group_intervals - 1],
+        PROD_CODE_COL: np.asarray(products, dtype=object)[group_products],
+        LOCATION_COL: np.asarray(locations, dtype=object)[group_locations],
+    }
+    for unit, unit_sums in zip(FLOW_UNITS, (sums['box'], sums['kg'])):
+        opening, moved_in, moved_out, actual = (unit_sums[:, i] for i in range(num_measures))
+        expected = opening + moved_in - moved_out
+        result.update({
+            flow_col(MEASURE_OPENING, unit): opening, flow_col(MEASURE_IN, unit): moved_in,
+            flow_col(MEASURE_OUT, unit): moved_out, flow_col(MEASURE_EXPECTED, unit): expected,
+            flow_col(MEASURE_ACTUAL, unit): actual, flow_col(MEASURE_RESIDUAL, unit): actual - expected,
+        })
+    return pd.DataFrame(result)[flow_columns()]
+
+
+def flow_residual_flags(df_flow, box_tolerance=FLOW_BOX_TOLERANCE, kg_tolerance=FLOW_KG_TOLERANCE):
+    """박스 또는 Kg 잔차가 허용 오차를 넘는 행의 불리언 배열을 반환합니다."""
+    box_residual = np.abs(df_flow[flow_col(MEASURE_RESIDUAL, '박스')].to_numpy(dtype='float64'))
+    kg_residual = np.abs(df_flow[flow_col(MEASURE_RESIDUAL, 'Kg')].to_numpy(dtype='float64'))
+    return (box_residual > box_tolerance) | (kg_residual > kg_tolerance)
+
+
+def summarize_flow_by_date(df_flow, flags):
+    """[날짜, 지점명]별 검사 항목 수, 이상 항목 수, 이상 항목의 Kg 차이 절대값 합계를 반환합니다."""
+    kg_residual = np.abs(df_flow[flow_col(MEASURE_RESIDUAL, 'Kg')].to_numpy(dtype='float64'))
+    df_counts = pd.DataFrame({
+        FLOW_DATE_COL: df_flow[FLOW_DATE_COL].to_numpy(),
+        LOCATION_COL: df_flow[LOCATION_COL].to_numpy(dtype=object),
+        FLOW_CHECKED_COUNT_COL: 1,
+        FLOW_FLAGGED_COUNT_COL: flags.astype(np.int64),
+        FLOW_ABS_RESIDUAL_COL: np.where(flags, kg_residual, 0.0),
+    })
+    return df_counts.groupby([FLOW_DATE_COL, LOCATION_COL], sort=True, as_index=False, dropna=False).sum()
@@ -0,0 +1,341 @@
+# inventory_reconciliation.py (ERP vs SM 재고 대사)
+#
+# 지점별/상품별로 합산된 ERP 재고와 SM 재고를 (지점명, 상품코드) 인덱스로 한 번에 outer join하여
+# 요약, ERP에만 있는 항목, SM에만 있는 항목, 수량/중량 불일치 항목을 함께 만듭니다.
+# 상품코드와 지점명을 문자열로 이어 붙인 키를 만들지 않으므로 '-'가 들어간 상품코드도 그대로 유지되며,
+# 행별 apply 없이 모든 계산을 컬럼 단위로 처리합니다.
+# 입력 DataFrame은 캐시된 공유 데이터일 수 있으므로 수정하지 않습니다.
+#
+# 여러 날짜를 한꺼번에 대사할 때(run_batch_reconciliation)는 프로세스 풀의 각 작업자가
+# 두 통합문서를 한 번씩 열어 두고 날짜 시트를 나누어 파싱/대사한 뒤 지점별 요약만 돌려줍니다.
+# 작업자는 Streamlit 세션 밖에서 실행되므로 이 모듈의 대사 함수는 UI를 호출하지 않습니다.
+#
+# 전일 대비 변동(diff_mismatches)은 불일치 항목마다 (지점명, 상품코드) -> 수량/중량 값의 해시(지문)를 만들어
+# 이전 대사의 지문과 비교합니다. 지문이 같은 항목은 '지속'으로 개수만 세고 건너뛰므로,
+# 검토할 표의 크기는 재고 규모가 아니라 바뀐 항목 수에 비례합니다.
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+import numpy as np
+import pandas as pd
+
+from frame_utils import take_rows
+from sheet_schemas import ERP_STOCK_SCHEMA, SM_SNAPSHOT_SCHEMA
+
+# ERP 호실 -> SM 지점명
+LOCATION_MAP = {
+    "냉동": "신갈냉동",
+    "상이품/작업": "신갈상이품/작업",
+    "선왕판매": "배정분"  # "케이미트스토어"를 "배정분"으로 수정
+}
+ERP_TARGET_LOCATIONS = list(LOCATION_MAP.keys())
+SM_TARGET_LOCATIONS = list(LOCATION_MAP.values())
+
+ERP_ROOM_COL = '호실'
+ERP_ITEM_NAME_COL = '품목명'
+LOCATION_COL = '지점명'
+PRODUCT_CODE_COL = '상품코드'
+PRODUCT_NAME_COL = '상품명'
+RECONCILE_KEYS = [LOCATION_COL, PRODUCT_CODE_COL]
+
+ERP_NAME_COL = '상품명_ERP'
+SM_NAME_COL = '상품명_SM'
+ERP_QTY_COL = '수량'
+ERP_WGT_COL = '중량'
+QTY_DIFF_COL = '수량차이'
+WGT_DIFF_COL = '중량차이'
+
+QTY_TOLERANCE = 1e-9
+WGT_DECIMALS = 2 # 중량은 소수 둘째 자리까지 같으면 일치로 봅니다.
+
+_IN_ERP_COL = '_in_erp'
+_IN_SM_COL = '_in_sm'
+
+# 지점별 요약 컬럼
+COMMON_COUNT_COL = '공통'
+MATCH_COUNT_COL = '일치'
+MISMATCH_COUNT_COL = '불일치'
+ONLY_ERP_COUNT_COL = 'ERP에만'
+ONLY_SM_COUNT_COL = 'SM에만'
+MATCH_RATE_COL = '일치율(%)'
+TOTAL_LOCATION_LABEL = '전체'
+
+# 전일 대비 불일치 변동 구분
+CHANGE_TYPE_COL = '변동구분'
+CHANGE_NEW = '신규'
+CHANGE_CHANGED = '변동'
+CHANGE_RESOLVED = '해소'
+CHANGE_PERSISTING = '지속'
+PREV_QTY_DIFF_COL = '이전 수량차이'
+PREV_WGT_DIFF_COL = '이전 중량차이'
+FINGERPRINT_DECIMALS = WGT_DECIMALS # 이 자리수 아래의 차이는 같은 값으로 봅니다.
+
+RECON_BATCH_MAX_WORKERS = 4
+_worker_excel_files = {} # 일괄 대사 작업자 프로세스가 열어 둔 통합문서 ('erp' / 'sm' -> pd.ExcelFile). 작업자 프로세스에서만 씁니다.
+
+
+def prepare_erp_stock(df_erp_raw):
+    """
+    ERP 재고현황 시트(erp_stock 스키마로 읽은 것)에서 대상 호실만 SM 지점명으로 바꿔 (지점명, 상품코드)별로 합산합니다.
+    수량과 중량이 모두 0인 항목은 제외합니다. 대상 호실 데이터가 없으면 빈 표입니다.
+    """
+    df_erp = df_erp_raw[df_erp_raw[ERP_ROOM_COL].isin(ERP_TARGET_LOCATIONS)]
+    # 상품코드/품목명은 스키마로 읽어 이미 공백이 제거된 문자열이고, 수량/중량은 숫자입니다.
+    df_erp = pd.DataFrame({
+        LOCATION_COL: df_erp[ERP_ROOM_COL].map(LOCATION_MAP),
+        PRODUCT_CODE_COL: df_erp[PRODUCT_CODE_COL].fillna(''),
+        ERP_ITEM_NAME_COL: df_erp[ERP_ITEM_NAME_COL],
+        ERP_QTY_COL: df_erp[ERP_QTY_COL].fillna(0),
+        ERP_WGT_COL: df_erp[ERP_WGT_COL].fillna(0),
+    })
+    df_erp = df_erp.groupby(RECONCILE_KEYS, as_index=False).agg(**{
+        ERP_NAME_COL: (ERP_ITEM_NAME_COL, 'first'),
+        ERP_QTY_COL: (ERP_QTY_COL, 'sum'),
+        ERP_WGT_COL: (ERP_WGT_COL, 'sum'),
+    })
+    # 'first'는 빈 값을 건너뛰므로 품목명은 합산한 뒤에 채웁니다 (앞 행의 빈 이름이 뒤 행의 실제 이름을 가리지 않도록).
+    df_erp[ERP_NAME_COL] = df_erp[ERP_NAME_COL].fillna('')
+    return df_erp[~((df_erp[ERP_QTY_COL] == 0) & (df_erp[ERP_WGT_COL] == 0))]
+
+
+def prepare_sm_stock(df_sm_raw, sm_qty_col, sm_wgt_col):
+    """
+    SM재고현황 시트(sm_snapshot 스키마로 읽은 것)에서 대상 지점만 (지점명, 상품코드)별로 합산합니다.
+    잔량(박스/Kg)이 모두 0인 항목은 제외합니다. 대상 지점 데이터가 없으면 빈 표입니다.
+    """
+    df_sm = df_sm_raw[df_sm_raw[LOCATION_COL].isin(SM_TARGET_LOCATIONS)]
+    # 상품코드/지점명/상품명은 스키마로 읽어 이미 공백이 제거된 문자열이고, 잔량은 숫자입니다.
+    df_sm = pd.DataFrame({
+        LOCATION_COL: df_sm[LOCATION_COL],
+        PRODUCT_CODE_COL: df_sm[PRODUCT_CODE_COL].fillna(''),
+        PRODUCT_NAME_COL: df_sm[PRODUCT_NAME_COL],
+        sm_qty_col: df_sm[sm_qty_col].fillna(0),
+        sm_wgt_col: df_sm[sm_wgt_col].fillna(0),
+    })
+    df_sm = df_sm.groupby(RECONCILE_KEYS, as_index=False).agg(**{
+        SM_NAME_COL: (PRODUCT_NAME_COL, 'first'),
+        sm_qty_col: (sm_qty_col, 'sum'),
+        sm_wgt_col: (sm_wgt_col, 'sum'),
+    })
+    df_sm[SM_NAME_COL] = df_sm[SM_NAME_COL].fillna('') # 품목명과 같은 이유로 합산한 뒤에 채웁니다.
+    return df_sm[~((df_sm[sm_qty_col] == 0) & (df_sm[sm_wgt_col] == 0))]
+
+
+def reconciliation_columns(sm_qty_col, sm_wgt_col):
+    """결과 표의 컬럼 순서 (ERP에만 있는 항목, SM에만 있는 항목, 불일치 항목)."""
+    only_erp_cols = [PRODUCT_CODE_COL, PRODUCT_NAME_COL, LOCATION_COL, ERP_QTY_COL, ERP_WGT_COL]
+    only_sm_cols = [PRODUCT_CODE_COL, PRODUCT_NAME_COL, LOCATION_COL, sm_qty_col, sm_wgt_col]
+    mismatch_cols = [PRODUCT_CODE_COL, PRODUCT_NAME_COL, LOCATION_COL,
+                     ERP_QTY_COL, sm_qty_col, QTY_DIFF_COL, ERP_WGT_COL, sm_wgt_col, WGT_DIFF_COL]
+    return only_erp_cols, only_sm_cols, mismatch_cols
+
+
+def join_inventories(df_erp, df_sm, sm_qty_col, sm_wgt_col):
+    """
+    ERP/SM 재고를 (지점명, 상품코드)로 outer join한 표와, 각 행이 ERP/SM에 있었는지를 나타내는 불리언 배열 두 개를 반환합니다.
+    한쪽에만 있는 항목의 수량/중량은 0, 상품명은 ERP 상품명(없으면 SM 상품명)입니다.
+    """
+    erp_indexed = df_erp.set_index(RECONCILE_KEYS)[[ERP_NAME_COL, ERP_QTY_COL, ERP_WGT_COL]].assign(**{_IN_ERP_COL: True})
+    sm_indexed = df_sm.set_index(RECONCILE_KEYS)[[SM_NAME_COL, sm_qty_col, sm_wgt_col]].assign(**{_IN_SM_COL: True})
+    joined = erp_indexed.join(sm_indexed, how='outer')
+
+    in_erp = joined[_IN_ERP_COL].notna().to_numpy()
+    in_sm = joined[_IN_SM_COL].notna().to_numpy()
+    num_cols = [ERP_QTY_COL, ERP_WGT_COL, sm_qty_col, sm_wgt_col]
+    erp_names = joined[ERP_NAME_COL].fillna('')
+    sm_names = joined[SM_NAME_COL].fillna('')
+
+    df_joined = joined.reset_index()
+    df_joined = df_joined.assign(**{
+        col: pd.to_numeric(df_joined[col], errors='coerce').fillna(0).to_numpy(dtype='float64') for col in num_cols
+    })
+    df_joined[PRODUCT_NAME_COL] = np.where(erp_names.to_numpy() != '', erp_names.to_numpy(), sm_names.to_numpy())
+    df_joined[QTY_DIFF_COL] = df_joined[ERP_QTY_COL] - df_joined[sm_qty_col]
+    df_joined[WGT_DIFF_COL] = df_joined[ERP_WGT_COL] - df_joined[sm_wgt_col]
+    return df_joined.drop(columns=[_IN_ERP_COL, _IN_SM_COL]), in_erp, in_sm
+
+
+def match_flags(df_joined, sm_qty_col, sm_wgt_col):
+    """수량 일치, 중량(소수 둘째 자리) 일치 여부 배열을 반환합니다."""
+    qty_match = np.isclose(df_joined[QTY_DIFF_COL].to_numpy(), 0, atol=QTY_TOLERANCE)
+    wgt_match = np.isclose(df_joined[ERP_WGT_COL].round(WGT_DECIMALS).to_numpy(),
+                           df_joined[sm_wgt_col].round(WGT_DECIMALS).to_numpy(), atol=QTY_TOLERANCE)
+    return qty_match, wgt_match
+
+
+def _reconcile_flags(df_erp, df_sm, sm_qty_col, sm_wgt_col):
+    """join 결과와 ERP에만/SM에만/공통/완전 일치 여부 배열을 반환합니다."""
+    df_joined, in_erp, in_sm = join_inventories(df_erp, df_sm, sm_qty_col, sm_wgt_col)
+    qty_match, wgt_match = match_flags(df_joined, sm_qty_col, sm_wgt_col)
+    both = in_erp & in_sm
+    return df_joined, in_erp & ~in_sm, in_sm & ~in_erp, both, both & qty_match & wgt_match
+
+
+def reconcile_location_summary(df_erp, df_sm, sm_qty_col, sm_wgt_col):
+    """
+    지점별(마지막 행은 '전체') 공통/일치/불일치/ERP에만/SM에만 항목 수와 일치율(%)을 반환합니다 (index: 지점명).
+    공통 항목이 없는 지점의 일치율은 NaN입니다.
+    """
+    df_joined, only_erp, only_sm, both, full_match = _reconcile_flags(df_erp, df_sm, sm_qty_col, sm_wgt_col)
+    df_flags = pd.DataFrame({
+        COMMON_COUNT_COL: both, MATCH_COUNT_COL: full_match,
+        ONLY_ERP_COUNT_COL: only_erp, ONLY_SM_COUNT_COL: only_sm,
+    }, index=df_joined[LOCATION_COL].to_numpy()).astype(np.int64)
+    df_summary = df_flags.groupby(level=0, sort=True).sum()
+    df_summary.loc[TOTAL_LOCATION_LABEL] = df_summary.sum()
+    df_summary[MISMATCH_COUNT_COL] = df_summary[COMMON_COUNT_COL] - df_summary[MATCH_COUNT_COL]
+    common = df_summary[COMMON_COUNT_COL].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df_summary[MATCH_RATE_COL] = np.where(common > 0, df_summary[MATCH_COUNT_COL].to_numpy() / common * 100, np.nan)
+    df_summary.index.name = LOCATION_COL
+    return df_summary[[COMMON_COUNT_COL, MATCH_COUNT_COL, MISMATCH_COUNT_COL, ONLY_ERP_COUNT_COL, ONLY_SM_COUNT_COL, MATCH_RATE_COL]]
+
+
+def reconcile_inventories(df_erp, df_sm, sm_qty_col, sm_wgt_col):
+    """
+    ERP/SM 재고를 대사하여 (요약 dict, ERP에만 있는 항목, SM에만 있는 항목, 불일치 항목)을 반환합니다.
+    df_erp: 지점명, 상품코드, 상품명_ERP, 수량, 중량 / df_sm: 지점명, 상품코드, 상품명_SM, sm_qty_col, sm_wgt_col
+    (두 표 모두 (지점명, 상품코드)당 한 행)
+    """
+    only_erp_cols, only_sm_cols, mismatch_cols = reconciliation_columns(sm_qty_col, sm_wgt_col)
+    df_joined, only_erp, only_sm, both, full_match = _reconcile_flags(df_erp, df_sm, sm_qty_col, sm_wgt_col)
+
+    common_total = int(both.sum())
+    match_count = int(full_match.sum())
+    summary = {
+        'erp_total': len(df_erp), 'sm_total': len(df_sm), 'common_total': common_total,
+        'only_erp_count': int(only_erp.sum()), 'only_sm_count': int(only_sm.sum()),
+        'match_count': match_count, 'mismatch_count': common_total - match_count,
+        'match_rate': (match_count / common_total) * 100 if common_total > 0 else 0.0
+    }
+    df_only_erp = take_rows(df_joined, only_erp, only_erp_cols).reset_index(drop=True)
+    df_only_sm = take_rows(df_joined, only_sm, only_sm_cols).reset_index(drop=True)
+    df_mismatches = take_rows(df_joined, both & ~full_match, mismatch_cols).reset_index(drop=True)
+    return summary, df_only_erp, df_only_sm, df_mismatches
+
+
+# --- 전일 대비 불일치 변동 ---
+
+def mismatch_fingerprints(df_mismatches, sm_qty_col, sm_wgt_col):
+    """불일치 항목의 (지점명, 상품코드) -> ERP/SM 수량·중량 값 지문(uint64) Series를 반환합니다."""
+    values = df_mismatches[[ERP_QTY_COL, sm_qty_col, ERP_WGT_COL, sm_wgt_col]].astype('float64').round(FINGERPRINT_DECIMALS)
+    fingerprints = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return pd.Series(fingerprints, index=pd.MultiIndex.from_frame(df_mismatches[RECONCILE_KEYS]))
+
+
+def diff_mismatches(df_mismatches, df_previous_mismatches, sm_qty_col, sm_wgt_col):
+    """
+    오늘 불일치 항목을 이전 대사의 불일치 항목과 (지점명, 상품코드)로 비교합니다.
+    반환: (구분별 개수 dict, 변동 항목 표)
+    - 신규: 오늘 새로 불일치 / 변동: 계속 불일치이지만 수량·중량 값이 바뀜 / 해소: 이전에만 불일치
+    - 지속: 값까지 같은 불일치 (개수만 세고 표에는 넣지 않음)
+    변동 항목 표는 불일치 항목 표 컬럼 앞에 변동구분, 뒤에 이전 수량/중량차이를 붙인 것입니다.
+    해소 항목의 오늘 값과 신규 항목의 이전 차이는 비어 있습니다.
+    """
+    mismatch_cols = reconciliation_columns(sm_qty_col, sm_wgt_col)[2]
+    today_fp = mismatch_fingerprints(df_mismatches, sm_qty_col, sm_wgt_col)
+    previous_fp = mismatch_fingerprints(df_previous_mismatches, sm_qty_col, sm_wgt_col)
+
+    previous_pos = previous_fp.index.get_indexer(today_fp.index)
+    in_previous = previous_pos >= 0
+    same_values = np.zeros(len(today_fp), dtype=bool)
+    same_values[in_previous] = previous_fp.to_numpy()[previous_pos[in_previous]] == today_fp.to_numpy()[in_previous]
+    resolved = np.ones(len(previous_fp), dtype=bool)
+    resolved[previous_pos[in_previous]] = False
+
+    is_new = ~in_previous
+    is_changed = in_previous & ~same_values
+    counts = {
+        CHANGE_NEW: int(is_new.sum()), CHANGE_CHANGED: int(is_changed.sum()),
+        CHANGE_RESOLVED: int(resolved.sum()), CHANGE_PERSISTING: int(same_values.sum()),
+    }
+
+    # 지속 항목은 건너뛰고 바뀐 행만 잘라 냅니다.
+    changed_pos = np.flatnonzero(is_new | is_changed)
+    df_today_changes = take_rows(df_mismatches, is_new | is_changed, mismatch_cols)
+    previous_diffs = df_previous_mismatches[[QTY_DIFF_COL, WGT_DIFF_COL]].to_numpy(dtype='float64')
+    today_prev_diffs = np.full((len(changed_pos), 2), np.nan)
+    has_previous = in_previous[changed_pos]
+    today_prev_diffs[has_previous] = previous_diffs[previous_pos[changed_pos][has_previous]]
+    df_today_changes = df_today_changes.assign(**{
+        CHANGE_TYPE_COL: np.where(is_new[changed_pos], CHANGE_NEW, CHANGE_CHANGED),
+        PREV_QTY_DIFF_COL: today_prev_diffs[:, 0], PREV_WGT_DIFF_COL: today_prev_diffs[:, 1],
+    })
+
+    df_resolved = take_rows(df_previous_mismatches, resolved, [PRODUCT_CODE_COL, PRODUCT_NAME_COL, LOCATION_COL, QTY_DIFF_COL, WGT_DIFF_COL])
+    df_resolved = df_resolved.rename(columns={QTY_DIFF_COL: PREV_QTY_DIFF_COL, WGT_DIFF_COL: PREV_WGT_DIFF_COL}).assign(**{CHANGE_TYPE_COL: CHANGE_RESOLVED})
+
+    df_changes = pd.concat([df_today_changes, df_resolved], ignore_index=True)
+    return counts, df_changes.reindex(columns=[CHANGE_TYPE_COL] + mismatch_cols + [PREV_QTY_DIFF_COL, PREV_WGT_DIFF_COL])
+
+
+# --- 여러 날짜 일괄 대사 (프로세스 풀) ---
+
+def _read_schema_sheet(excel_file, sheet_name, schema):
+    df_sheet = schema.normalize(excel_file.parse(sheet_name=sheet_name, header=0, **schema.read_kwargs()))
+    missing_cols = schema.missing_columns(df_sheet)
+    if missing_cols:
+        raise ValueError(f"'{sheet_name}' 시트에 필수 컬럼이 없습니다: {missing_cols}")
+    return df_sheet
+
+
+def reconcile_sheet_pair(df_erp_raw, df_sm_raw, sm_qty_col, sm_wgt_col):
+    """같은 날짜의 ERP/SM 원본 시트(스키마로 읽은 것)로 지점별 대사 요약을 만듭니다."""
+    return reconcile_location_summary(prepare_erp_stock(df_erp_raw), prepare_sm_stock(df_sm_raw, sm_qty_col, sm_wgt_col), sm_qty_col, sm_wgt_col)
+
+
+def _open_batch_workbooks(erp_file_bytes, sm_file_bytes):
+    """두 통합문서를 엽니다 ('erp' / 'sm' -> pd.ExcelFile)."""
+    return {'erp': pd.ExcelFile(io.BytesIO(erp_file_bytes)), 'sm': pd.ExcelFile(io.BytesIO(sm_file_bytes))}
+
+
+def _init_batch_worker(erp_file_bytes, sm_file_bytes):
+    """작업자마다 두 통합문서를 한 번만 엽니다 (작업자 프로세스 전용)."""
+    _worker_excel_files.update(_open_batch_workbooks(erp_file_bytes, sm_file_bytes))
+
+
+def _reconcile_sheet(excel_files, sheet_name, sm_qty_col, sm_wgt_col):
+    """열어 둔 통합문서로 날짜 시트 하나를 대사합니다. 반환: (시트 이름, 지점별 요약 또는 None, 오류 메시지 또는 None)"""
+    try:
+        df_erp_raw = _read_schema_sheet(excel_files['erp'], sheet_name, ERP_STOCK_SCHEMA)
+        df_sm_raw = _read_schema_sheet(excel_files['sm'], sheet_name, SM_SNAPSHOT_SCHEMA)
+        return sheet_name, reconcile_sheet_pair(df_erp_raw, df_sm_raw, sm_qty_col, sm_wgt_col), None
+    except Exception as e:
+        return sheet_name, None, str(e)
+
+
+def _reconcile_sheet_in_worker(sheet_name, sm_qty_col, sm_wgt_col):
+    """작업자에서 날짜 시트 하나를 대사합니다 (_init_batch_worker가 연 통합문서 사용)."""
+    return _reconcile_sheet(_worker_excel_files, sheet_name, sm_qty_col, sm_wgt_col)
+
+
+def run_batch_reconciliation(erp_file_bytes, sm_file_bytes, sheet_names, sm_qty_col, sm_wgt_col, max_workers=RECON_BATCH_MAX_WORKERS):
+    """
+    여러 날짜 시트를 프로세스 풀에서 나누어 대사합니다.
+    반환: {시트 이름: (지점별 요약 또는 None, 오류 메시지 또는 None)}
+    작업자는 spawn으로 시작하여 서버 프로세스의 스레드/잠금 상태를 물려받지 않습니다.
+    프로세스를 만들 수 없는 환경이면 현재 프로세스에서 차례대로 처리합니다. 이때는 이 호출에서 연 통합문서를
+    직접 넘기므로 (모듈 전역을 쓰지 않으므로) 여러 세션이 동시에 실행해도 서로의 통합문서를 건드리지 않습니다.
+    """
+    sheet_names = list(sheet_names)
+    results = {}
+    if not sheet_names:
+        return results
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max(1, min(max_workers, len(sheet_names))),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_batch_worker, initargs=(erp_file_bytes, sm_file_bytes)
+        ) as executor:
+            for sheet_name, df_summary, error in executor.map(_reconcile_sheet_in_worker, sheet_names, repeat(sm_qty_col), repeat(sm_wgt_col)):
+                results[sheet_name] = (df_summary, error)
+    except (OSError, BrokenProcessPool):
+        excel_files = _open_batch_workbooks(erp_file_bytes, sm_file_bytes)
+        for sheet_name in sheet_names:
+            if sheet_name not in results:
+                _, df_summary, error = _reconcile_sheet(excel_files, sheet_name, sm_qty_col, sm_wgt_col)
+                results[sheet_name] = (df_summary, error)
+    return results
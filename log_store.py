@@ -0,0 +1,415 @@
+# log_store.py (매출/매입 로그 시트 증분 적재 저장소)
+#
+# s-list(매출내역), p-list(매입내역)처럼 아래로 계속 행이 추가되는 로그 시트를 월별 파티션으로 나누어 보관합니다.
+# 적재할 때마다 워터마크(행 수, 기존 행 전체의 해시, 최대 일자)를 남겨 두고,
+# Drive 파일이 새 버전이 되면 기존 행이 그대로인지 해시로 확인하여 새로 추가된 행만 해당 월 파티션에 덧붙입니다.
+# 기존 행이 수정/삭제된 경우에만 전체를 다시 적재합니다.
+# 기간 조회("최근 7일", "최근 90일" 등)는 그 기간에 걸친 월 파티션만 읽습니다.
+#
+# 파티션은 sheet_store와 달리 LRU로 지워지면 안 되므로 별도 디렉터리(KMEAT_LOG_STORE_DIR)에 저장하며,
+# pyarrow가 없으면 디스크 없이 메모리에서만 같은 방식으로 동작합니다.
+#
+# 갱신기는 새 버전을, 대화형 rerun은 아직 게시된 이전 버전을 동시에 읽을 수 있으므로 조회는 항상 파일 버전을 지정합니다.
+# 행만 추가된 이전 버전은 현재 파티션의 앞부분 행으로 그대로 재현하고, 이미 다른 버전으로 교체된 버전은
+# 다시 적재하지 않습니다 (저장소가 두 버전 사이를 오가며 전체를 다시 만드는 일이 없도록).
+
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import threading
+import pandas as pd
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version, read_excel_sheet
+from sheet_store import PARQUET_AVAILABLE, prepare_for_parquet
+
+LOG_STORE_DIR = os.environ.get(
+    "KMEAT_LOG_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".log_store")
+)
+LOG_STORE_FORMAT_VERSION = 3
+UNDATED_PARTITION = "undated" # 일자를 해석할 수 없는 행(빈 행 포함)을 모아 두는 파티션
+LOG_STORE_PREFIX_VERSIONS = 4 # 현재 파티션의 앞부분으로 재현할 수 있게 기억해 두는 이전 버전 수
+
+
+def _rows_digest(row_hashes):
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def _month_key(month_start):
+    return month_start.strftime("%Y-%m")
+
+
+class LogStore:
+    """
+    한 로그 시트(file_id, sheet_name)의 월별 파티션 저장소입니다.
+    ffill_cols가 주어지면 적재 시 빈 행이 아닌 행들에 대해 해당 컬럼을 위에서 아래로 채웁니다
+    (매입내역처럼 같은 전표의 둘째 줄부터 일자/지점이 비어 있는 시트용).
+    schema는 시트를 읽을 때 사용할 sheet_schemas의 스키마 이름입니다 (없으면 모든 컬럼을 그대로 읽음).
+    """
+    def __init__(self, file_id, sheet_name, date_col, ffill_cols=(), schema=None):
+        self.file_id = file_id
+        self.sheet_name = sheet_name
+        self.date_col = date_col
+        self.ffill_cols = tuple(ffill_cols)
+        self.schema = schema
+        self._lock = threading.RLock()
+        store_key = hashlib.sha1(f"{sheet_name!r}|{date_col}|{self.ffill_cols!r}|{schema}".encode('utf-8')).hexdigest()[:16]
+        self._dir = os.path.join(LOG_STORE_DIR, str(file_id), store_key)
+        self._manifest = None
+        self._partitions = {} # 파티션 키 -> DataFrame (메모리에 올라온 것만)
+        self._prefix_manifests = {} # 이전 파일 버전 -> 그 버전의 매니페스트 (행만 추가된 버전, 오래된 것부터)
+        self._superseded_versions = set() # 현재 파티션으로 재현할 수 없게 교체된 파일 버전
+        self._load_manifest()
+
+    # --- 워터마크 / 매니페스트 ---
+    def _manifest_path(self):
+        return os.path.join(self._dir, "manifest.json")
+
+    def _partition_path(self, key):
+        return os.path.join(self._dir, f"{key}.parquet")
+
+    def _load_manifest(self):
+        if not PARQUET_AVAILABLE:
+            return
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get('format_version') != LOG_STORE_FORMAT_VERSION:
+            return
+        if not all(os.path.exists(self._partition_path(key)) for key in manifest.get('partitions', [])):
+            return # 파티션이 빠져 있으면 다음 적재 때 전체를 다시 만듭니다.
+        self._manifest = manifest
+
+    def _save_manifest(self):
+        if not PARQUET_AVAILABLE:
+            return
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self._manifest_path())
+        except OSError:
+            pass
+
+    @property
+    def file_version(self):
+        return None if self._manifest is None else self._manifest['file_version']
+
+    def _manifest_for(self, file_version):
+        """file_version의 행을 재현할 매니페스트를 반환합니다 (None이면 현재 버전). 재현할 수 없으면 None."""
+        if file_version is None or file_version == self.file_version:
+            return self._manifest
+        return self._prefix_manifests.get(file_version)
+
+    def has_version(self, file_version):
+        """file_version의 행을 저장소에서 바로 읽을 수 있는지 여부."""
+        with self._lock:
+            return self._manifest_for(file_version) is not None
+
+    def is_superseded(self, file_version):
+        """file_version이 이미 다른 버전으로 교체되어 다시 적재하면 안 되는 버전인지 여부."""
+        with self._lock:
+            return file_version in self._superseded_versions
+
+    def max_date(self, file_version=None):
+        """file_version까지 적재된 행 중 가장 늦은 일자 (워터마크). 없거나 재현할 수 없는 버전이면 None."""
+        with self._lock:
+            manifest = self._manifest_for(file_version)
+        if manifest is None or not manifest.get('max_date'):
+            return None
+        return datetime.date.fromisoformat(manifest['max_date'])
+
+    # --- 파티션 입출력 ---
+    def _read_partition(self, key):
+        if key in self._partitions:
+            return self._partitions[key]
+        df_part = pd.read_parquet(self._partition_path(key))
+        self._partitions[key] = df_part
+        return df_part
+
+    def _write_partition(self, key, df_part):
+        self._partitions[key] = df_part
+        if not PARQUET_AVAILABLE:
+            return
+        df_to_store = prepare_for_parquet(df_part)
+        if df_to_store is None:
+            raise ValueError(f"'{self.sheet_name}' 시트의 컬럼 이름을 Parquet로 저장할 수 없습니다.")
+        os.makedirs(self._dir, exist_ok=True)
+        tmp_path = f"{self._partition_path(key)}.{os.getpid()}.tmp"
+        df_to_store.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._partition_path(key))
+
+    def _partition_keys_for(self, df_rows):
+        """각 행이 들어갈 월 파티션 키(YYYY-MM 또는 undated)를 계산합니다."""
+        if self.date_col not in df_rows.columns:
+            return pd.Series(UNDATED_PARTITION, index=df_rows.index)
+        dates = pd.to_datetime(df_rows[self.date_col], errors='coerce')
+        return dates.dt.strftime("%Y-%m").fillna(UNDATED_PARTITION)
+
+    def _prepare_rows(self, df_raw):
+        """시트 원본에 ffill을 적용합니다 (빈 행은 그대로 둡니다)."""
+        ffill_cols = [col for col in self.ffill_cols if col in df_raw.columns]
+        if not ffill_cols:
+            return df_raw
+        df_rows = df_raw.copy()
+        non_empty = df_rows.notna().any(axis=1)
+        df_rows.loc[non_empty, ffill_cols] = df_rows.loc[non_empty, ffill_cols].ffill()
+        return df_rows
+
+    # --- 적재 ---
+    def ingest(self, df_raw, file_version):
+        """
+        새 파일 버전의 시트 원본을 적재합니다.
+        기존 행이 그대로이고 뒤에 행만 추가되었다면 추가된 행만 덧붙이고, 아니면 전체를 다시 만듭니다.
+        덧붙인 경우 이전 버전은 파티션의 앞부분 행으로 계속 읽을 수 있고, 다시 만든 경우 이전 버전들은 교체된 것으로 기록됩니다.
+        반환값: 'unchanged' / 'appended' / 'rebuilt'
+        """
+        with self._lock:
+            row_hashes = pd.util.hash_pandas_object(df_raw, index=False).to_numpy()
+            df_rows = self._prepare_rows(df_raw)
+            partition_keys = self._partition_keys_for(df_rows)
+
+            old = self._manifest
+            can_append = (
+                old is not None
+                and old['columns'] == [str(col) for col in df_raw.columns]
+                and old['row_count'] <= len(df_raw)
+                and old['rows_digest'] == _rows_digest(row_hashes[:old['row_count']])
+            )
+
+            if can_append and old['row_count'] == len(df_raw):
+                mode = 'unchanged'
+                partition_rows = dict(old['partition_rows'])
+            elif can_append:
+                mode = 'appended'
+                partition_rows = dict(old['partition_rows'])
+                df_new = df_rows.iloc[old['row_count']:]
+                new_keys = partition_keys.iloc[old['row_count']:]
+                for key, df_new_part in df_new.groupby(new_keys, sort=False):
+                    if key in partition_rows:
+                        df_part = pd.concat([self._read_partition(key), df_new_part], ignore_index=True)
+                    else:
+                        df_part = df_new_part.reset_index(drop=True)
+                    self._write_partition(key, df_part)
+                    partition_rows[key] = len(df_part)
+            else:
+                mode = 'rebuilt'
+                self._partitions = {}
+                if PARQUET_AVAILABLE and os.path.isdir(self._dir):
+                    shutil.rmtree(self._dir, ignore_errors=True)
+                partition_rows = {}
+                for key, df_part in df_rows.groupby(partition_keys, sort=True):
+                    self._write_partition(key, df_part.reset_index(drop=True))
+                    partition_rows[key] = len(df_part)
+
+            if old is not None and old['file_version'] != file_version:
+                if mode == 'rebuilt':
+                    self._superseded_versions.update(self._prefix_manifests)
+                    self._superseded_versions.add(old['file_version'])
+                    self._prefix_manifests = {}
+                else:
+                    self._prefix_manifests[old['file_version']] = old
+                    while len(self._prefix_manifests) > LOG_STORE_PREFIX_VERSIONS:
+                        oldest_version = next(iter(self._prefix_manifests))
+                        del self._prefix_manifests[oldest_version]
+                        self._superseded_versions.add(oldest_version)
+
+            dates = pd.to_datetime(df_rows[self.date_col], errors='coerce') if self.date_col in df_rows.columns else pd.Series(dtype='datetime64[ns]')
+            max_date = dates.max()
+            self._manifest = {
+                'format_version': LOG_STORE_FORMAT_VERSION,
+                'file_version': file_version,
+                'columns': [str(col) for col in df_raw.columns],
+                'row_count': int(len(df_raw)),
+                'rows_digest': _rows_digest(row_hashes),
+                'max_date': None if pd.isna(max_date) else max_date.date().isoformat(),
+                'partitions': sorted(partition_rows),
+                'partition_rows': partition_rows,
+            }
+            self._save_manifest()
+            return mode
+
+    # --- 조회 ---
+    def rows(self, start_date=None, end_date=None, file_version=None):
+        """
+        start_date~end_date에 걸친 월 파티션의 행을 원래 순서(파티션 내)대로 이어 붙여 반환합니다.
+        기간 경계 안쪽 필터링은 호출자가 합니다. 기간을 주지 않으면 일자가 없는 행까지 전부 반환합니다.
+        file_version을 주면 그 버전의 행만 반환하며, 저장소가 그 버전을 재현할 수 없으면 None을 반환합니다.
+        반환되는 DataFrame은 새로 만든 것이므로 호출자가 수정해도 됩니다.
+        """
+        with self._lock:
+            manifest = self._manifest_for(file_version)
+            if manifest is None:
+                return None
+            partitions = manifest['partitions']
+            if start_date is not None or end_date is not None:
+                first_key = _month_key(start_date) if start_date is not None else None
+                last_key = _month_key(end_date) if end_date is not None else None
+                partitions = [
+                    key for key in partitions
+                    if key != UNDATED_PARTITION
+                    and (first_key is None or key >= first_key)
+                    and (last_key is None or key <= last_key)
+                ]
+            # 이전 버전은 각 파티션의 앞부분 행(그 버전 적재 당시의 행 수)만 읽습니다.
+            frames = [self._read_partition(key).iloc[:manifest['partition_rows'][key]] for key in partitions]
+            columns = manifest['columns']
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_log_store(file_id, sheet_name, date_col, ffill_cols=(), schema=None):
+    """(파일, 시트, 일자 컬럼, ffill 컬럼, 스키마) 조합마다 하나의 LogStore를 프로세스 전체에서 공유합니다."""
+    return LogStore(file_id, sheet_name, date_col, ffill_cols, schema)
+
+
+def sync_log_store(drive_service, file_id, sheet_name, date_col, ffill_cols=(), file_name_for_error_msg="", schema=None, file_version=None):
+    """
+    로그 저장소를 file_version(주지 않으면 Drive 파일의 현재 버전)까지 적재하고 (저장소, 버전)을 반환합니다. 실패 시 (None, None).
+    저장소가 이미 그 버전을 읽을 수 있으면 파일을 받거나 파싱하지 않습니다.
+    이미 더 새 버전으로 교체된 버전은 다시 적재하지 않고 실패로 돌려보냅니다 (다음 rerun은 새로 게시된 버전을 사용).
+    """
+    if drive_service is None:
+        return None, None
+    if file_version is None:
+        file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+        if file_version is None:
+            return None, None
+    store = get_log_store(file_id, sheet_name, date_col, tuple(ffill_cols), schema)
+    if store.has_version(file_version):
+        return store, file_version
+    with store._lock:
+        if store.has_version(file_version):
+            return store, file_version
+        if store.is_superseded(file_version):
+            return None, None
+        df_raw = read_excel_sheet(drive_service, file_id, sheet_name, file_name_for_error_msg, keep=False, schema=schema, file_version=file_version)
+        if df_raw is None:
+            return None, None
+        store.ingest(df_raw, file_version)
+    return store, file_version
+
+
+def load_log_rows(drive_service, file_id, sheet_name, date_col, start_date=None, end_date=None, ffill_cols=(), file_name_for_error_msg="", schema=None, file_version=None):
+    """
+    로그 시트의 행을 저장소에서 읽어 옵니다. start_date/end_date를 주면 그 기간에 걸친 월 파티션만 읽습니다.
+    file_version을 주면 정확히 그 버전의 행을 읽습니다 (버전별 캐시 함수는 캐시 키로 쓴 버전을 넘겨야 합니다).
+    실패 시 None을 반환하며, 시트가 없으면 read_excel_sheet과 같은 ValueError를 올려 보냅니다.
+    같은 로그를 읽는 호출자들은 같은 schema를 넘겨야 저장소 하나를 함께 씁니다.
+    """
+    store, file_version = sync_log_store(drive_service, file_id, sheet_name, date_col, ffill_cols, file_name_for_error_msg, schema, file_version)
+    if store is None:
+        return None
+    return store.rows(start_date, end_date, file_version)
+
+
+def get_log_max_date(drive_service, file_id, sheet_name, date_col, ffill_cols=(), file_name_for_error_msg="", schema=None, file_version=None):
+    """로그 시트의 최대 일자(워터마크)를 반환합니다. 데이터가 없거나 실패하면 None."""
+    store, file_version = sync_log_store(drive_service, file_id, sheet_name, date_col, ffill_cols, file_name_for_error_msg, schema, file_version)
+    if store is None:
+        return None
+    return store.max_date(file_version)
+
+
+# --- 일자 x 지점 집계 큐브 (전년 동기 비교용) ---
+YOY_PERIOD_LABELS = {0: '올해', 1: '작년', 2: '재작년'}
+
+
+class LogCube:
+    """
+    로그 한 개를 [일자, 지점]별 Kg/Box 합계로 한 번에 집계한 큐브입니다.
+    월별 합계는 일자 단위에서 잘라 만들므로, '1월 1일 ~ 오늘'처럼 달 중간에서 끝나는 기간도 정확히 계산됩니다.
+    파일 버전별로 캐시되어 모든 세션이 공유하므로 속성을 수정하지 않습니다.
+    """
+    def __init__(self, by_day_location):
+        self.by_day_location = by_day_location # MultiIndex(일자, 지점) -> ['Kg', 'Box']
+        self.by_day = by_day_location.groupby(level=0).sum() # DatetimeIndex(일자) -> ['Kg', 'Box']
+
+    @property
+    def empty(self):
+        return self.by_day.empty
+
+    def monthly_totals(self, start_date, end_date, value_col='Kg'):
+        """start_date~end_date 기간의 월별 합계 Series (PeriodIndex, 데이터가 있는 달만)를 반환합니다."""
+        days = self.by_day.loc[pd.Timestamp(start_date):pd.Timestamp(end_date), value_col]
+        return days.groupby(days.index.to_period('M')).sum()
+
+    def monthly_by_location(self, start_date, end_date, value_col='Kg'):
+        """start_date~end_date 기간의 [월 x 지점] 합계 표를 반환합니다."""
+        idx = pd.IndexSlice
+        days = self.by_day_location.loc[idx[pd.Timestamp(start_date):pd.Timestamp(end_date), :], value_col]
+        months = days.index.get_level_values(0).to_period('M')
+        locations = days.index.get_level_values(1)
+        return days.groupby([months, locations]).sum().unstack(fill_value=0)
+
+    def year_over_year(self, end_date, years_back=1, value_col='Kg', name_prefix='', value_label='중량(Kg)'):
+        """
+        올해(1월 1일 ~ end_date)와 이전 years_back개 해의 같은 기간 월별 합계를 한 표로 반환합니다.
+        이전 해의 '월'은 올해 달력으로 옮겨 표시하므로 같은 달끼리 겹쳐 그릴 수 있습니다.
+        반환 컬럼: ['월', value_label, '구분']
+        """
+        frames = []
+        for years_ago in range(years_back + 1):
+            period_end = end_date - relativedelta(years=years_ago)
+            period_start = period_end.replace(month=1, day=1)
+            monthly = self.monthly_totals(period_start, period_end, value_col)
+            if monthly.empty:
+                continue
+            # 월 단위 Period에 12 x N개월을 더해 올해로 옮깁니다 (행마다 replace(year=...)를 호출하지 않음).
+            shifted_months = (monthly.index + 12 * years_ago).strftime('%Y-%m')
+            period_label = YOY_PERIOD_LABELS.get(years_ago, f'{years_ago}년 전')
+            frames.append(pd.DataFrame({
+                '월': shifted_months,
+                value_label: monthly.to_numpy(),
+                '구분': f'{name_prefix} ({period_label})',
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['월', value_label, '구분'])
+        return pd.concat(frames, ignore_index=True)
+
+
+def build_log_cube(df_rows, date_col, location_col, qty_kg_col, qty_box_col=None):
+    """로그 행 전체를 한 번 훑어 [일자, 지점]별 Kg/Box 합계 큐브를 만듭니다. 필요한 컬럼이 없으면 None."""
+    if df_rows is None or date_col not in df_rows.columns or qty_kg_col not in df_rows.columns:
+        return None
+    df_rows = df_rows.dropna(how='all')
+    dates = pd.to_datetime(df_rows[date_col], errors='coerce').dt.normalize()
+    valid = dates.notna()
+    locations = df_rows[location_col].astype(str).str.strip() if location_col in df_rows.columns else pd.Series('', index=df_rows.index)
+    values = pd.DataFrame({
+        'Kg': pd.to_numeric(df_rows[qty_kg_col], errors='coerce').fillna(0),
+        'Box': pd.to_numeric(df_rows[qty_box_col], errors='coerce').fillna(0) if qty_box_col and qty_box_col in df_rows.columns else 0.0,
+    }, index=df_rows.index)[valid]
+    by_day_location = values.groupby([dates[valid].rename('일자'), locations[valid].rename('지점')]).sum().sort_index()
+    return LogCube(by_day_location)
+
+
+def get_log_cube(drive_service, file_id, sheet_name, date_col, location_col, qty_kg_col, qty_box_col=None, ffill_cols=(), file_name_for_error_msg="", schema=None):
+    """로그의 [일자, 지점] 집계 큐브를 파일 버전별로 한 번만 만들어 반환합니다. 실패 시 None."""
+    file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg) if drive_service is not None else None
+    if file_version is None:
+        return None
+    try:
+        return _build_log_cube_for_version(drive_service, file_id, sheet_name, date_col, location_col, qty_kg_col, qty_box_col, tuple(ffill_cols), file_version, file_name_for_error_msg, schema)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않으므로 다음 호출에서 다시 시도합니다)
+    except Exception as e:
+        st.error(f"'{file_name_for_error_msg}' 집계 큐브 생성 중 예상 못한 오류: {e}")
+        return None
+
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _build_log_cube_for_version(_drive_service, file_id, sheet_name, date_col, location_col, qty_kg_col, qty_box_col, ffill_cols, file_version, file_name_for_error_msg, schema):
+    """get_log_cube의 실제 집계 함수입니다. 캐시 키로 쓴 file_version의 행만 읽으며, 읽기 실패는 예외로 올려 보냅니다."""
+    df_rows = load_log_rows(_drive_service, file_id, sheet_name, date_col, ffill_cols=ffill_cols, file_name_for_error_msg=file_name_for_error_msg, schema=schema, file_version=file_version)
+    if df_rows is None:
+        raise TransientLoadError(f"{file_name_for_error_msg} 로그 읽기 실패")
+    return build_log_cube(df_rows, date_col, location_col, qty_kg_col, qty_box_col)
@@ -5,15 +5,27 @@ import pandas as pd
 import datetime
 # import os # os.path.exists는 더 이상 직접 사용하지 않음
 import traceback
-import numpy as np
 
 # common_utils.py 에서 공통 유틸리티 함수 및 상수 가져오기
 from common_utils import (
-    download_excel_from_drive_as_bytes, 
-    get_all_available_sheet_dates_from_bytes,
+    DATASET_CACHE_MAX_ENTRIES,
+    TransientLoadError,
+    get_drive_file_version,
+    get_available_sheet_dates,
+    download_excel_from_drive_as_bytes,
+    read_excel_sheet,
     SM_QTY_COL_TREND as SM_QTY_COL, 
     SM_WGT_COL_TREND as SM_WGT_COL
 )
+from cache_warmer import attach_page_to_cache_warmer
+from sheet_schemas import ERP_STOCK_SCHEMA, SM_SNAPSHOT_SCHEMA
+from display_utils import render_paginated_table
+from inventory_reconciliation import (
+    ERP_TARGET_LOCATIONS, SM_TARGET_LOCATIONS,
+    LOCATION_COL, MATCH_RATE_COL, MISMATCH_COUNT_COL, ONLY_ERP_COUNT_COL, ONLY_SM_COUNT_COL,
+    CHANGE_TYPE_COL, CHANGE_NEW, CHANGE_CHANGED, CHANGE_RESOLVED, CHANGE_PERSISTING, PREV_QTY_DIFF_COL, PREV_WGT_DIFF_COL,
+    prepare_erp_stock, prepare_sm_stock, reconcile_inventories, diff_mismatches, run_batch_reconciliation
+)
 
 # --- Google Drive 파일 ID 정의 ---
 # 사용자님이 제공해주신 실제 파일 ID를 사용합니다.
@@ -23,13 +35,8 @@ SM_FILE_ID = "1tRljdvOpp4fITaVEXvoL9mNveNg2qt4p"
 
 
 # --- 이 페이지 고유의 설정 ---
-LOCATION_MAP = {
-    "냉동": "신갈냉동",
-    "상이품/작업": "신갈상이품/작업",
-    "선왕판매": "배정분"  # "케이미트스토어"를 "배정분"으로 수정
-}
-ERP_TARGET_LOCATIONS = list(LOCATION_MAP.keys())
-SM_TARGET_LOCATIONS = list(LOCATION_MAP.values())
+# LOCATION_MAP / ERP_TARGET_LOCATIONS / SM_TARGET_LOCATIONS는 일괄 대사 작업자와 함께 쓰도록 inventory_reconciliation에 있습니다.
+BATCH_DATE_COL = '날짜'
 
 SM_PROD_NAME_COL = '상품명' 
 # SM_QTY_COL 와 SM_WGT_COL 은 common_utils에서 가져온 것을 사용
@@ -48,8 +55,21 @@ drive_service = retrieved_drive_service
 
 
 # --- 분석 함수 정의 (Google Drive 연동으로 수정) ---
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None}) # drive_service 해시 방지
-def load_and_process_erp(_drive_service, file_id_erp, sheet_name): 
+def load_and_process_erp(_drive_service, file_id_erp, sheet_name):
+    file_version = get_drive_file_version(_drive_service, file_id_erp, f"ERP 재고현황 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_and_process_erp_for_version(_drive_service, file_id_erp, sheet_name, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e: 
+        st.error(f"ERP 데이터 (ID: {file_id_erp}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_and_process_erp_for_version(_drive_service, file_id_erp, sheet_name, file_version):
+    """load_and_process_erp의 실제 로딩 함수입니다. 다운로드 실패는 TransientLoadError로 올려 보내 캐시하지 않습니다."""
     erp_prod_name_col_raw = '품목명' 
     expected_cols = ['호실', '상품코드', '수량', '중량', erp_prod_name_col_raw]
     
@@ -57,66 +77,53 @@ def load_and_process_erp(_drive_service, file_id_erp, sheet_name):
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (ERP 데이터 로딩)")
         return None
 
-    file_bytes_erp = download_excel_from_drive_as_bytes(_drive_service, file_id_erp, f"ERP 재고현황 ({sheet_name})")
-    if file_bytes_erp is None:
-        return None
-        
     try:
-        df_erp_raw = pd.read_excel(file_bytes_erp, sheet_name=sheet_name)
+        df_erp_raw = read_excel_sheet(_drive_service, file_id_erp, sheet_name, f"ERP 재고현황 ({sheet_name})", schema=ERP_STOCK_SCHEMA.name, file_version=file_version)
+        if df_erp_raw is None:
+            raise TransientLoadError(f"ERP 재고현황 ({sheet_name}) 다운로드 실패")
         # st.info(f"ERP 원본 ({sheet_name}): {df_erp_raw.shape[0]} 행")
 
         if not all(col in df_erp_raw.columns for col in expected_cols):
             st.error(f"오류: ERP 시트({sheet_name}) 필요 컬럼({expected_cols}) 없음. 컬럼: {df_erp_raw.columns.tolist()}")
             return None
 
-        df_erp = df_erp_raw[df_erp_raw['호실'].isin(ERP_TARGET_LOCATIONS)].copy()
-        if df_erp.empty: 
+        if not df_erp_raw['호실'].isin(ERP_TARGET_LOCATIONS).any():
             st.warning(f"ERP 대상 호실({ERP_TARGET_LOCATIONS}) 데이터 없음 ({sheet_name})")
             return pd.DataFrame()
 
-        df_erp = df_erp[['호실', '상품코드', erp_prod_name_col_raw, '수량', '중량']].copy()
-        df_erp['지점명'] = df_erp['호실'].map(LOCATION_MAP)
-        df_erp.drop(columns=['호실'], inplace=True)
-        df_erp['상품코드'] = df_erp['상품코드'].astype(str).str.strip()
-        df_erp[erp_prod_name_col_raw] = df_erp[erp_prod_name_col_raw].astype(str).str.strip()
-        df_erp['수량'] = pd.to_numeric(df_erp['수량'], errors='coerce').fillna(0)
-        df_erp['중량'] = pd.to_numeric(df_erp['중량'], errors='coerce').fillna(0)
-
-        if not df_erp.empty:
-            df_erp = df_erp.groupby(['지점명', '상품코드'], as_index=False).agg(
-                상품명_ERP=(erp_prod_name_col_raw, 'first'),
-                수량=('수량', 'sum'),
-                중량=('중량', 'sum')
-            )
-        
-        original_erp_count = len(df_erp)
-        if not df_erp.empty: df_erp = df_erp[~((df_erp['수량'] == 0) & (df_erp['중량'] == 0))]
-        
-        df_erp['key'] = df_erp['상품코드'] + '-' + df_erp['지점명']
-        return df_erp
+        # 호실 -> 지점명 변환, (지점명, 상품코드)별 합산, 수량/중량 0 제외 (일괄 대사와 같은 함수)
+        return prepare_erp_stock(df_erp_raw)
     except ValueError as ve:
         if f"Worksheet named '{sheet_name}' not found" in str(ve): 
             st.error(f"오류: ERP 파일 (ID: {file_id_erp})에 '{sheet_name}' 시트 없음")
         else: 
             st.error(f"ERP 데이터 (ID: {file_id_erp}, 시트: {sheet_name}) 로드/처리 중 값 오류: {ve}")
         return None
+
+def load_and_process_sm(_drive_service, file_id_sm, sheet_name):
+    file_version = get_drive_file_version(_drive_service, file_id_sm, f"SM 재고현황 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_and_process_sm_for_version(_drive_service, file_id_sm, sheet_name, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
     except Exception as e: 
-        st.error(f"ERP 데이터 (ID: {file_id_erp}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
+        st.error(f"SM 데이터 (ID: {file_id_sm}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
         return None
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None}) # drive_service 해시 방지
-def load_and_process_sm(_drive_service, file_id_sm, sheet_name): 
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_and_process_sm_for_version(_drive_service, file_id_sm, sheet_name, file_version):
+    """load_and_process_sm의 실제 로딩 함수입니다. 다운로드 실패는 TransientLoadError로 올려 보내 캐시하지 않습니다."""
     if _drive_service is None:
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (SM 데이터 로딩)")
         return None
 
-    file_bytes_sm = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, f"SM 재고현황 ({sheet_name})")
-    if file_bytes_sm is None:
-        return None
-
     try:
         required_sm_cols = ['지점명', '상품코드', SM_PROD_NAME_COL, SM_QTY_COL, SM_WGT_COL]
-        df_sm_raw = pd.read_excel(file_bytes_sm, sheet_name=sheet_name)
+        df_sm_raw = read_excel_sheet(_drive_service, file_id_sm, sheet_name, f"SM 재고현황 ({sheet_name})", schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+        if df_sm_raw is None:
+            raise TransientLoadError(f"SM 재고현황 ({sheet_name}) 다운로드 실패")
         # st.info(f"SM 원본 ({sheet_name}): {df_sm_raw.shape[0]} 행")
 
         if not all(col in df_sm_raw.columns for col in required_sm_cols):
@@ -124,39 +131,18 @@ def load_and_process_sm(_drive_service, file_id_sm, sheet_name):
             st.error(f"오류: SM 시트({sheet_name}) 필요 컬럼({missing_cols}) 없음. 컬럼: {df_sm_raw.columns.tolist()}")
             return None
 
-        df_sm = df_sm_raw[df_sm_raw['지점명'].isin(SM_TARGET_LOCATIONS)].copy()
-        if df_sm.empty: 
+        if not df_sm_raw['지점명'].isin(SM_TARGET_LOCATIONS).any():
             st.warning(f"SM 대상 지점명({SM_TARGET_LOCATIONS}) 데이터 없음 ({sheet_name})")
             return pd.DataFrame()
 
-        df_sm = df_sm[required_sm_cols].copy()
-        df_sm['상품코드'] = df_sm['상품코드'].astype(str).str.strip()
-        df_sm['지점명'] = df_sm['지점명'].astype(str).str.strip()
-        df_sm[SM_PROD_NAME_COL] = df_sm[SM_PROD_NAME_COL].astype(str).str.strip()
-        df_sm[SM_QTY_COL] = pd.to_numeric(df_sm[SM_QTY_COL], errors='coerce').fillna(0)
-        df_sm[SM_WGT_COL] = pd.to_numeric(df_sm[SM_WGT_COL], errors='coerce').fillna(0)
-
-        if not df_sm.empty:
-            df_sm = df_sm.groupby(['지점명', '상품코드'], as_index=False).agg(
-                상품명_SM=(SM_PROD_NAME_COL, 'first'),
-                QtySum=(SM_QTY_COL, 'sum'),
-                WgtSum=(SM_WGT_COL, 'sum')
-            ).rename(columns={'QtySum': SM_QTY_COL, 'WgtSum': SM_WGT_COL})
-
-        original_sm_count = len(df_sm)
-        if not df_sm.empty: df_sm = df_sm[~((df_sm[SM_QTY_COL] == 0) & (df_sm[SM_WGT_COL] == 0))]
-        
-        df_sm['key'] = df_sm['상품코드'] + '-' + df_sm['지점명']
-        return df_sm
+        # (지점명, 상품코드)별 합산, 잔량 0 제외 (일괄 대사와 같은 함수)
+        return prepare_sm_stock(df_sm_raw, SM_QTY_COL, SM_WGT_COL)
     except ValueError as ve:
         if f"Worksheet named '{sheet_name}' not found" in str(ve): 
             st.error(f"오류: SM 파일 (ID: {file_id_sm})에 '{sheet_name}' 시트 없음")
         else: 
             st.error(f"SM 데이터 (ID: {file_id_sm}, 시트: {sheet_name}) 로드/처리 중 값 오류: {ve}")
         return None
-    except Exception as e: 
-        st.error(f"SM 데이터 (ID: {file_id_sm}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
-        return None
 
 def compare_inventories(df_erp, df_sm):
     if df_erp is None or df_sm is None or df_erp.empty or df_sm.empty : 
@@ -185,68 +171,82 @@ def compare_inventories(df_erp, df_sm):
             
         return summary, df_only_erp, df_only_sm, pd.DataFrame(columns=mismatch_cols)
 
-    df_merged = pd.merge(
-        df_erp[['key', '상품코드', '지점명', '상품명_ERP', '수량', '중량']],
-        df_sm[['key', '상품명_SM', SM_QTY_COL, SM_WGT_COL]], 
-        on='key', how='outer', indicator=True
-    )
+    # (지점명, 상품코드) 인덱스 join 한 번으로 요약/ERP 전용/SM 전용/불일치 항목을 모두 만듭니다 (문자열 키 없음).
+    return reconcile_inventories(df_erp, df_sm, SM_QTY_COL, SM_WGT_COL)
 
-    num_cols = ['수량', '중량', SM_QTY_COL, SM_WGT_COL]
-    for col in num_cols:
-        if col in df_merged.columns: df_merged[col] = pd.to_numeric(df_merged[col].fillna(0), errors='coerce').fillna(0)
-    
-    df_merged['상품명_ERP'] = df_merged['상품명_ERP'].fillna('')
-    df_merged['상품명_SM'] = df_merged['상품명_SM'].fillna('')
-    df_merged['상품명'] = df_merged.apply(lambda row: row['상품명_ERP'] if row['상품명_ERP'] else row['상품명_SM'], axis=1)
-
-    only_erp = df_merged[df_merged['_merge'] == 'left_only'].copy()
-    only_sm = df_merged[df_merged['_merge'] == 'right_only'].copy()
-    both = df_merged[df_merged['_merge'] == 'both'].copy()
-    
-    if not only_erp.empty: only_erp['상품명'] = only_erp['상품명_ERP'] 
-    if not only_sm.empty: 
-        only_sm['상품명'] = only_sm['상품명_SM'] 
-        try:
-            split_key = only_sm['key'].str.split('-', n=1, expand=True)
-            if split_key.shape[1] > 0: only_sm['상품코드'] = split_key[0]
-            if split_key.shape[1] > 1: only_sm['지점명'] = split_key[1]
-        except Exception as e_split:
-            st.warning(f"SM 전용 데이터 Key 분리 중 오류: {e_split}.")
-            if '상품코드' not in only_sm.columns: only_sm['상품코드'] = '분리 오류'
-            if '지점명' not in only_sm.columns: only_sm['지점명'] = '분리 오류'
-
-    summary = {
-        'erp_total': len(df_erp), 'sm_total': len(df_sm), 'common_total': len(both),
-        'only_erp_count': len(only_erp), 'only_sm_count': len(only_sm),
-        'match_count': 0, 'mismatch_count': 0, 'match_rate': 0.0
-    }
-    mismatches_list = pd.DataFrame()
-
-    if not both.empty:
-        both['수량차이'] = both['수량'] - both[SM_QTY_COL]
-        both['중량차이'] = both['중량'] - both[SM_WGT_COL]
-        tolerance = 1e-9
-        qty_match = np.isclose(both['수량차이'], 0, atol=tolerance)
-        erp_wgt_rounded = both['중량'].round(2) 
-        sm_wgt_rounded = both[SM_WGT_COL].round(2) 
-        wgt_match = np.isclose(erp_wgt_rounded, sm_wgt_rounded, atol=tolerance)
-        full_match = qty_match & wgt_match
-        summary['match_count'] = int(full_match.sum())
-        summary['mismatch_count'] = len(both) - summary['match_count']
-        summary['match_rate'] = (summary['match_count'] / len(both)) * 100 if len(both) > 0 else 0.0
-        
-        mismatch_cols_def = ['상품코드', '상품명', '지점명', '수량', SM_QTY_COL, '수량차이', '중량', SM_WGT_COL, '중량차이']
-        mismatches_list = both.loc[~full_match, [col for col in mismatch_cols_def if col in both.columns]].copy()
+def find_previous_comparison_date(_drive_service, selected_date, sm_dates):
+    """선택 날짜보다 앞서면서 ERP/SM 두 파일 모두에 시트가 있는 가장 최근 날짜 (없으면 None)."""
+    erp_dates = set(get_available_sheet_dates(_drive_service, ERP_FILE_ID, "ERP 재고현황 (날짜조회용)"))
+    earlier_dates = [d for d in sm_dates if d < selected_date and d in erp_dates]
+    return max(earlier_dates) if earlier_dates else None
 
-    only_erp_cols_def = ['상품코드', '상품명', '지점명', '수량', '중량']
-    only_erp_return = only_erp[[col for col in only_erp_cols_def if col in only_erp.columns]].copy() if not only_erp.empty else pd.DataFrame(columns=only_erp_cols_def)
-    
-    only_sm_cols_def = ['상품코드', '상품명', '지점명', SM_QTY_COL, SM_WGT_COL]
-    only_sm_return = only_sm[[col for col in only_sm_cols_def if col in only_sm.columns]].copy() if not only_sm.empty else pd.DataFrame(columns=only_sm_cols_def)
-
-    if mismatches_list.empty: mismatches_list = pd.DataFrame(columns=mismatch_cols_def)
-
-    return summary, only_erp_return, only_sm_return, mismatches_list
+def load_previous_mismatches(_drive_service, previous_sheet_name):
+    """이전 날짜의 불일치 항목 표 (데이터가 부족하면 None). 로더가 파일 버전별로 캐시하므로 보통 다시 읽지 않습니다."""
+    df_erp_prev = load_and_process_erp(_drive_service, ERP_FILE_ID, previous_sheet_name)
+    df_sm_prev = load_and_process_sm(_drive_service, SM_FILE_ID, previous_sheet_name)
+    if df_erp_prev is None or df_sm_prev is None or df_erp_prev.empty or df_sm_prev.empty:
+        return None
+    return reconcile_inventories(df_erp_prev, df_sm_prev, SM_QTY_COL, SM_WGT_COL)[3]
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _get_batch_reconciliation_store(erp_file_version, sm_file_version):
+    """
+    파일 버전 쌍별 날짜 대사 결과 보관소입니다 (시트 이름 -> 지점별 요약).
+    기간을 바꿔 다시 실행해도 이미 대사한 날짜는 다시 계산하지 않습니다. 보관된 요약은 수정하지 않습니다.
+    실패한 날짜는 보관하지 않으므로 다음 실행에서 다시 시도합니다.
+    """
+    return {}
+
+def run_batch_comparison(_drive_service, start_date, end_date):
+    """
+    기간 안에서 ERP/SM 두 파일 모두에 시트가 있는 날짜를 프로세스 풀로 한꺼번에 대사합니다.
+    반환: (날짜/지점별 요약 표, {시트 이름: 오류 메시지}) / 파일을 가져오지 못하면 (None, {})
+    """
+    erp_version = get_drive_file_version(_drive_service, ERP_FILE_ID, "ERP 재고현황 (일괄 대사)")
+    sm_version = get_drive_file_version(_drive_service, SM_FILE_ID, "SM 재고현황 (일괄 대사)")
+    if erp_version is None or sm_version is None:
+        return None, {}
+    erp_dates = set(get_available_sheet_dates(_drive_service, ERP_FILE_ID, "ERP 재고현황 (일괄 대사)", erp_version))
+    sm_dates = set(get_available_sheet_dates(_drive_service, SM_FILE_ID, "SM 재고현황 (일괄 대사)", sm_version))
+    target_dates = sorted(d for d in erp_dates & sm_dates if start_date <= d <= end_date)
+    sheet_names = [d.strftime("%Y%m%d") for d in target_dates]
+
+    # 날짜 목록/다운로드/보관소 모두 위에서 정한 버전 쌍을 기준으로 하므로, 도중에 파일이 바뀌어도 섞이지 않습니다.
+    store = _get_batch_reconciliation_store(erp_version, sm_version)
+    pending_sheets = [name for name in sheet_names if name not in store]
+    errors = {}
+    if pending_sheets:
+        erp_bytes = download_excel_from_drive_as_bytes(_drive_service, ERP_FILE_ID, "ERP 재고현황 (일괄 대사)", erp_version)
+        sm_bytes = download_excel_from_drive_as_bytes(_drive_service, SM_FILE_ID, "SM 재고현황 (일괄 대사)", sm_version)
+        if erp_bytes is None or sm_bytes is None:
+            return None, {}
+        batch_results = run_batch_reconciliation(erp_bytes.getvalue(), sm_bytes.getvalue(), pending_sheets, SM_QTY_COL, SM_WGT_COL)
+        for sheet_name, (df_summary, error) in batch_results.items():
+            if df_summary is None:
+                errors[sheet_name] = error
+            else:
+                store[sheet_name] = df_summary
+
+    frames = []
+    for target_date, sheet_name in zip(target_dates, sheet_names):
+        df_summary = store.get(sheet_name)
+        if df_summary is not None:
+            frames.append(df_summary.reset_index().assign(**{BATCH_DATE_COL: pd.Timestamp(target_date)}))
+    if not frames:
+        return pd.DataFrame(), errors
+    df_trend = pd.concat(frames, ignore_index=True)
+    return df_trend[[BATCH_DATE_COL] + [col for col in df_trend.columns if col != BATCH_DATE_COL]], errors
+
+def warm_comparison_datasets(_drive_service):
+    """갱신기 작업: 기본 선택 날짜(SM 최신 날짜 시트)의 ERP/SM 대사 데이터를 미리 만듭니다."""
+    available_dates = get_available_sheet_dates(_drive_service, SM_FILE_ID, "SM재고현황 (날짜조회용)")
+    if not available_dates: return
+    target_sheet_name = max(available_dates).strftime("%Y%m%d")
+    load_and_process_erp(_drive_service, ERP_FILE_ID, target_sheet_name)
+    load_and_process_sm(_drive_service, SM_FILE_ID, target_sheet_name)
+
+# 새 파일 버전이 게시되기 전에 기본 화면의 데이터가 준비되도록 갱신기에 등록합니다 (사이드바 신선도 표시 포함).
+attach_page_to_cache_warmer(drive_service, "page_inventory_comparison", [(ERP_FILE_ID, warm_comparison_datasets), (SM_FILE_ID, warm_comparison_datasets)])
 
 # --- Streamlit 페이지 UI 구성 ---
 st.title("🔄 ERP vs SM 재고 비교 분석")
@@ -263,9 +263,7 @@ st.markdown("---")
 available_sm_dates = []
 # SM_FILE_ID가 플레이스홀더가 아닌 실제 ID인지 확인
 if SM_FILE_ID and not SM_FILE_ID.startswith("YOUR_"): 
-    sm_file_bytes = download_excel_from_drive_as_bytes(drive_service, SM_FILE_ID, "SM재고현황 (날짜조회용)")
-    if sm_file_bytes:
-        available_sm_dates = get_all_available_sheet_dates_from_bytes(sm_file_bytes, "SM재고현황 (날짜조회용)")
+    available_sm_dates = get_available_sheet_dates(drive_service, SM_FILE_ID, "SM재고현황 (날짜조회용)")
 else:
     st.warning("SM_FILE_ID가 코드에 올바르게 설정되지 않았습니다. 코드 상단에서 실제 파일 ID로 수정해주세요.")
 
@@ -304,6 +302,9 @@ if selected_date_obj:
     st.info(f"**선택된 날짜:** {selected_date_obj.strftime('%Y-%m-%d')} (대상 시트: {target_sheet_name})")
 
     if st.button("재고 비교 분석 실행", key="btn_run_comparison"):
+        st.session_state.comparison_sheet_name = target_sheet_name
+    # 결과 표의 페이지를 넘기는 등 다시 실행되어도, 분석을 실행한 날짜라면 결과를 계속 표시합니다.
+    if st.session_state.get('comparison_sheet_name') == target_sheet_name:
         # ERP_FILE_ID와 SM_FILE_ID가 플레이스홀더가 아닌지 다시 한번 확인
         if (ERP_FILE_ID and ERP_FILE_ID.startswith("YOUR_")) or \
            (SM_FILE_ID and SM_FILE_ID.startswith("YOUR_")):
@@ -330,37 +331,124 @@ if selected_date_obj:
                 col8.metric("🟢 재고 완전 일치율 (공통 항목 중)", match_rate_display)
                 st.markdown("---")
 
+                # 매일 같은 불일치를 다시 보지 않도록, 직전 대사 날짜와 비교해 바뀐 불일치만 보여줍니다.
+                st.header("🔁 직전 대사 대비 불일치 변동")
+                # 오늘 대사가 데이터 부족으로 건너뛰어졌으면 불일치가 비어 있으므로, 직전 불일치가 모두 '해소'로 잘못 보입니다.
+                current_comparable = df_erp is not None and not df_erp.empty and df_sm is not None and not df_sm.empty
+                previous_date = None
+                df_previous_mismatches = None
+                if current_comparable:
+                    previous_date = find_previous_comparison_date(drive_service, selected_date_obj, available_sm_dates)
+                if previous_date is not None:
+                    previous_sheet_name = previous_date.strftime("%Y%m%d")
+                    df_previous_mismatches = load_previous_mismatches(drive_service, previous_sheet_name)
+                if not current_comparable:
+                    st.info("선택한 날짜의 ERP/SM 대사 데이터가 충분하지 않아 직전 대사와 비교할 수 없습니다.")
+                elif previous_date is None:
+                    st.info("선택한 날짜 이전에 ERP/SM 두 파일 모두에 있는 날짜 시트가 없어 비교할 수 없습니다.")
+                elif df_previous_mismatches is None:
+                    st.info(f"직전 날짜({previous_date.strftime('%Y-%m-%d')})의 대사 데이터가 충분하지 않아 비교할 수 없습니다.")
+                else:
+                    change_counts, df_changes = diff_mismatches(df_mismatches, df_previous_mismatches, SM_QTY_COL, SM_WGT_COL)
+                    st.caption(f"비교 기준: {previous_date.strftime('%Y-%m-%d')} (시트: {previous_sheet_name})")
+                    ccol1, ccol2, ccol3, ccol4 = st.columns(4)
+                    ccol1.metric("🆕 신규 불일치", change_counts[CHANGE_NEW])
+                    ccol2.metric("🔀 차이 변동", change_counts[CHANGE_CHANGED])
+                    ccol3.metric("✅ 해소", change_counts[CHANGE_RESOLVED])
+                    ccol4.metric("⏸️ 지속 (변동 없음)", change_counts[CHANGE_PERSISTING])
+                    if df_changes.empty:
+                        st.success("직전 대사 이후 새로 생기거나 바뀐 불일치가 없습니다.")
+                    else:
+                        show_types = st.multiselect(
+                            "표시할 변동 구분", [CHANGE_NEW, CHANGE_CHANGED, CHANGE_RESOLVED],
+                            default=[CHANGE_NEW, CHANGE_CHANGED], key="mismatch_change_types"
+                        )
+                        render_paginated_table(
+                            df_changes[df_changes[CHANGE_TYPE_COL].isin(show_types)], key="mismatch_change_table",
+                            rename={
+                                '수량': '수량(ERP)', SM_QTY_COL: f'수량(SM)', 
+                                '중량': '중량(ERP)', SM_WGT_COL: f'중량(SM)'
+                            },
+                            formatters={'수량차이': '{:,.2f}', '중량차이': '{:,.2f}', PREV_QTY_DIFF_COL: '{:,.2f}', PREV_WGT_DIFF_COL: '{:,.2f}'},
+                            export_name=f"불일치변동_{previous_sheet_name}_{target_sheet_name}"
+                        )
+                st.markdown("---")
+
                 st.header("📋 상세 분석 결과")
                 if df_only_erp is not None and not df_only_erp.empty: 
                     with st.expander(f"ERP 에만 있는 항목 ({summary['only_erp_count']} 건)", expanded=False):
-                        df_only_erp_display = df_only_erp.rename(columns={'상품명_ERP': '상품명'})
-                        st.dataframe(df_only_erp_display[['상품코드', '상품명', '지점명', '수량', '중량']], use_container_width=True)
+                        render_paginated_table(
+                            df_only_erp, key="only_erp_table", columns=['상품코드', '상품명', '상품명_ERP', '지점명', '수량', '중량'],
+                            rename={'상품명_ERP': '상품명'}, hide_index=False, export_name=f"ERP에만있는항목_{target_sheet_name}"
+                        )
                 
                 if df_only_sm is not None and not df_only_sm.empty: 
                     with st.expander(f"SM 에만 있는 항목 ({summary['only_sm_count']} 건)", expanded=False):
-                        df_only_sm_display = df_only_sm.rename(columns={
-                            '상품명_SM': '상품명', 
-                            SM_QTY_COL: f'수량({SM_QTY_COL.replace("잔량(","").replace(")","")})', 
-                            SM_WGT_COL: f'중량({SM_WGT_COL.replace("잔량(","").replace(")","")})'
-                        })
-                        display_cols_sm = ['상품코드', '상품명', '지점명', 
-                                           f'수량({SM_QTY_COL.replace("잔량(","").replace(")","")})', 
-                                           f'중량({SM_WGT_COL.replace("잔량(","").replace(")","")})']
-                        st.dataframe(df_only_sm_display[[col for col in display_cols_sm if col in df_only_sm_display.columns]], use_container_width=True)
+                        render_paginated_table(
+                            df_only_sm, key="only_sm_table", columns=['상품코드', '상품명', '상품명_SM', '지점명', SM_QTY_COL, SM_WGT_COL],
+                            rename={
+                                '상품명_SM': '상품명', 
+                                SM_QTY_COL: f'수량({SM_QTY_COL.replace("잔량(","").replace(")","")})', 
+                                SM_WGT_COL: f'중량({SM_WGT_COL.replace("잔량(","").replace(")","")})'
+                            },
+                            hide_index=False, export_name=f"SM에만있는항목_{target_sheet_name}"
+                        )
 
                 if df_mismatches is not None and not df_mismatches.empty: 
                     with st.expander(f"수량/중량 불일치 항목 ({summary['mismatch_count']} 건)", expanded=True):
-                        df_mismatches_display = df_mismatches.rename(columns={
-                            '수량': '수량(ERP)', SM_QTY_COL: f'수량(SM)', 
-                            '중량': '중량(ERP)', SM_WGT_COL: f'중량(SM)'
-                        })
-                        display_cols_mismatch = ['상품코드', '상품명', '지점명', '수량(ERP)', f'수량(SM)', '수량차이', '중량(ERP)', f'중량(SM)', '중량차이']
-                        try:
-                            for col_diff in ['수량차이', '중량차이']:
-                                if col_diff in df_mismatches_display:
-                                    df_mismatches_display[col_diff] = pd.to_numeric(df_mismatches_display[col_diff], errors='coerce').map('{:,.2f}'.format)
-                        except Exception as e_format:
-                            st.caption(f"차이값 포맷팅 중 작은 오류 발생: {e_format}")
-                        st.dataframe(df_mismatches_display[[col for col in display_cols_mismatch if col in df_mismatches_display.columns]], use_container_width=True)
+                        # 차이값 서식은 전체 행이 아니라 표시되는 페이지에만 적용합니다.
+                        render_paginated_table(
+                            df_mismatches, key="mismatch_table",
+                            columns=['상품코드', '상품명', '지점명', '수량', SM_QTY_COL, '수량차이', '중량', SM_WGT_COL, '중량차이'],
+                            rename={
+                                '수량': '수량(ERP)', SM_QTY_COL: f'수량(SM)', 
+                                '중량': '중량(ERP)', SM_WGT_COL: f'중량(SM)'
+                            },
+                            formatters={'수량차이': '{:,.2f}', '중량차이': '{:,.2f}'},
+                            hide_index=False, export_name=f"수량중량불일치_{target_sheet_name}"
+                        )
 else:
-    st.info("분석할 날짜를 선택해주세요.")
\ No newline at end of file
+    st.info("분석할 날짜를 선택해주세요.")
+
+# --- 기간 일괄 대사 (불일치 추이) ---
+st.markdown("---")
+st.header("📈 기간 일괄 대사 (불일치 추이)")
+st.markdown("<small>기간 안에서 ERP/SM 두 파일 모두에 시트가 있는 날짜를 한꺼번에 대사하여, 지점별 일치율과 불일치/한쪽에만 있는 항목 수의 추이를 보여줍니다. 이미 대사한 날짜는 다시 계산하지 않습니다.</small>", unsafe_allow_html=True)
+
+batch_default_end = max_date_for_picker or datetime.date.today()
+batch_default_start = batch_default_end - datetime.timedelta(days=29)
+if min_date_for_picker and batch_default_start < min_date_for_picker:
+    batch_default_start = min_date_for_picker
+batch_col1, batch_col2 = st.columns(2)
+batch_start_date = batch_col1.date_input("시작일", batch_default_start, min_value=min_date_for_picker, max_value=max_date_for_picker, key="batch_start_date")
+batch_end_date = batch_col2.date_input("종료일", batch_default_end, min_value=min_date_for_picker, max_value=max_date_for_picker, key="batch_end_date")
+
+if st.button("기간 일괄 대사 실행", key="btn_run_batch_comparison"):
+    st.session_state.batch_comparison_range = (batch_start_date, batch_end_date)
+if st.session_state.get('batch_comparison_range') == (batch_start_date, batch_end_date):
+    if batch_start_date > batch_end_date:
+        st.error("시작일이 종료일보다 늦을 수 없습니다.")
+    elif (ERP_FILE_ID and ERP_FILE_ID.startswith("YOUR_")) or (SM_FILE_ID and SM_FILE_ID.startswith("YOUR_")):
+        st.error("ERP 또는 SM 파일 ID가 코드에 올바르게 설정되지 않았습니다. 코드 상단의 파일 ID를 확인해주세요.")
+    else:
+        with st.spinner("기간 내 날짜들을 대사하는 중입니다..."):
+            df_batch_trend, batch_errors = run_batch_comparison(drive_service, batch_start_date, batch_end_date)
+        if df_batch_trend is not None:
+            if df_batch_trend.empty:
+                st.info("선택한 기간에 ERP/SM 두 파일 모두에 있는 날짜 시트가 없습니다.")
+            else:
+                num_dates = df_batch_trend[BATCH_DATE_COL].nunique()
+                st.caption(f"대사한 날짜: {num_dates}일")
+                trend_metric = st.radio(
+                    "추이 항목", [MATCH_RATE_COL, MISMATCH_COUNT_COL, ONLY_ERP_COUNT_COL, ONLY_SM_COUNT_COL],
+                    horizontal=True, key="batch_trend_metric"
+                )
+                st.line_chart(df_batch_trend.pivot(index=BATCH_DATE_COL, columns=LOCATION_COL, values=trend_metric))
+                render_paginated_table(
+                    df_batch_trend, key="batch_trend_table", sort_by=BATCH_DATE_COL, ascending=False,
+                    date_cols=[BATCH_DATE_COL], formatters={MATCH_RATE_COL: '{:.2f}'}, export_name="기간일괄대사_추이"
+                )
+            if batch_errors:
+                with st.expander(f"대사하지 못한 날짜 ({len(batch_errors)}일)", expanded=False):
+                    for sheet_name, error in sorted(batch_errors.items()):
+                        st.write(f"- {sheet_name}: {error}")
@@ -8,7 +8,17 @@ import traceback
 # import numpy as np # 현재 코드에서 직접 사용되지 않음
 
 # common_utils.py 에서 공통 유틸리티 함수 가져오기
-from common_utils import download_excel_from_drive_as_bytes
+from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version
+from cache_warmer import attach_page_to_cache_warmer
+from log_store import load_log_rows
+from sheet_schemas import SALES_LOG_SCHEMA
+from frame_utils import combine_masks, compact_frame, render_memory_debug_panel, take_rows
+from display_utils import render_paginated_table
+from chart_utils import ROLLUP_FREQ_LABELS, choose_rollup_freq, downsample_frame
+from sales_analytics import (
+    CUSTOMER_DIM, PRODUCT_DIM, ROW_COUNT_COL, TREND_PCT_COL, TREND_SLOPE_COL,
+    build_customer_decline_table, build_sales_cube, rank_declines, rolling_decline_windows, window_column_names
+)
 
 # --- Google Drive 파일 ID 정의 ---
 # 사용자님이 제공해주신 실제 파일 ID를 사용합니다.
@@ -23,9 +33,11 @@ DATE_COL = '매출일자'
 AMOUNT_COL = '매출금액'
 WEIGHT_COL = '수량(Kg)'
 CUSTOMER_COL = '거래처명'
-PRODUCT_COL = '상  품  명' # 원본 파일의 상품명 컬럼 (공백 2칸 포함 가능성 있음)
+PRODUCT_COL = '상품명' # 원본 파일의 '상  품  명' 컬럼 (s-list 스키마가 표준 이름으로 바꿔 읽음)
 PRICE_COL = '매출단가'
 
+CHART_UNIT_OPTIONS = {'자동': None, '일별': 'D', '주별': 'W', '월별': 'M'} # 일별 추이 그래프 단위 ('자동'은 기간 길이로 결정)
+
 
 # --- Google Drive 서비스 객체 가져오기 ---
 retrieved_drive_service = st.session_state.get('drive_service')
@@ -39,21 +51,34 @@ else:
 drive_service = retrieved_drive_service
 
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None}) # drive_service 해시 방지
 def load_sales_data(_drive_service, file_id_sales, sheet_name):
     """매출 로그 데이터를 Google Drive에서 로드하고 기본 전처리를 수행합니다."""
+    file_version = get_drive_file_version(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_sales_data_for_version(_drive_service, file_id_sales, sheet_name, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e: 
+        st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드 중 예상 못한 오류: {e}")
+        # traceback.print_exc() # 디버깅 시 필요하면 주석 해제
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sales_data_for_version(_drive_service, file_id_sales, sheet_name, file_version):
+    """load_sales_data의 실제 로딩 함수입니다. 캐시 키로 쓴 file_version의 로그 행을 읽습니다."""
     if _drive_service is None:
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (매출 데이터 로딩)")
         return None
 
-    file_bytes_sales = download_excel_from_drive_as_bytes(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
-    if file_bytes_sales is None:
-        # download_excel_from_drive_as_bytes 함수 내에서 이미 st.error를 호출함
-        return None
-        
     try:
         required_cols = [DATE_COL, AMOUNT_COL, WEIGHT_COL, CUSTOMER_COL, PRODUCT_COL, PRICE_COL]
-        df = pd.read_excel(file_bytes_sales, sheet_name=sheet_name)
+        # 매출 로그는 log_store에 증분 적재된 것을 읽습니다 (새 버전에서는 추가된 행만 적재).
+        df = load_log_rows(_drive_service, file_id_sales, sheet_name, DATE_COL, file_name_for_error_msg=f"매출내역 ({sheet_name})", schema=SALES_LOG_SCHEMA.name, file_version=file_version)
+        if df is None:
+            # 다운로드 실패 시 오류 메시지는 common_utils에서 이미 표시함. 실패를 캐시하지 않도록 예외로 올려 보냅니다.
+            raise TransientLoadError(f"매출내역 ({sheet_name}) 읽기 실패")
         
         if not all(col in df.columns for col in required_cols):
             missing_cols = [col for col in required_cols if col not in df.columns]
@@ -62,11 +87,12 @@ def load_sales_data(_drive_service, file_id_sales, sheet_name):
             return None
             
         df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors='coerce')
-        df[AMOUNT_COL] = pd.to_numeric(df[AMOUNT_COL], errors='coerce').fillna(0)
-        df[WEIGHT_COL] = pd.to_numeric(df[WEIGHT_COL], errors='coerce').fillna(0)
-        df[PRICE_COL] = pd.to_numeric(df[PRICE_COL], errors='coerce').fillna(0)
-        df[CUSTOMER_COL] = df[CUSTOMER_COL].astype(str).str.strip()
-        df[PRODUCT_COL] = df[PRODUCT_COL].astype(str).str.strip() # 상품명 컬럼 공백 제거
+        # 금액/중량/단가는 스키마로 읽어 이미 숫자이고, 거래처명/상품명은 공백이 제거된 문자열입니다.
+        df[AMOUNT_COL] = df[AMOUNT_COL].fillna(0)
+        df[WEIGHT_COL] = df[WEIGHT_COL].fillna(0)
+        df[PRICE_COL] = df[PRICE_COL].fillna(0)
+        df[CUSTOMER_COL] = df[CUSTOMER_COL].fillna('')
+        df[PRODUCT_COL] = df[PRODUCT_COL].fillna('')
             
         original_rows = len(df)
         df.dropna(subset=[DATE_COL], inplace=True) # 날짜 누락 행 제거
@@ -76,18 +102,78 @@ def load_sales_data(_drive_service, file_id_sales, sheet_name):
         if df.empty:
             st.warning("전처리 후 남은 매출 데이터가 없습니다.")
             return pd.DataFrame() # 빈 DataFrame 반환
-        return df
+        # 결과는 모든 세션이 공유하므로 거래처명/상품명은 category로, 정수 값 금액/단가는 int32로 줄여 둡니다.
+        return compact_frame(df, label=f"매출내역 ({sheet_name})", category_cols=[CUSTOMER_COL, PRODUCT_COL])
     except ValueError as ve:
         if sheet_name and f"Worksheet named '{sheet_name}' not found" in str(ve): 
             st.error(f"오류: 매출 내역 파일 (ID: {file_id_sales})에 '{sheet_name}' 시트 없음")
         else: 
             st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드 중 값 오류: {ve}")
         return None
-    except Exception as e: 
-        st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드 중 예상 못한 오류: {e}")
-        # traceback.print_exc() # 디버깅 시 필요하면 주석 해제
+
+def load_sales_cube(_drive_service, file_id_sales, sheet_name):
+    """매출 데이터를 [일자 x 거래처 x 상품] 누적합 큐브로 만들어 반환합니다. 파일 버전별로 한 번만 만듭니다."""
+    file_version = get_drive_file_version(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_sales_cube_for_version(_drive_service, file_id_sales, sheet_name, file_version)
+    except TransientLoadError:
+        return None # 매출 데이터 로딩 오류는 load_sales_data에서 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"매출 집계 큐브 생성 중 예상 못한 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sales_cube_for_version(_drive_service, file_id_sales, sheet_name, file_version):
+    """load_sales_cube의 실제 집계 함수입니다. file_version은 캐시 키로만 사용됩니다."""
+    df_sales = _load_sales_data_for_version(_drive_service, file_id_sales, sheet_name, file_version)
+    if df_sales is None or df_sales.empty:
+        return None
+    return build_sales_cube(df_sales, DATE_COL, CUSTOMER_COL, PRODUCT_COL, AMOUNT_COL, WEIGHT_COL)
+
+def get_decline_windows(start_date, end_date):
+    """거래 감소 분석 비교 구간: 선택 기간 전반/후반 (2일 이상일 때) + 종료일 기준 최근 4주/30일/전년 동기."""
+    windows = []
+    period_duration_days = (end_date - start_date).days
+    if period_duration_days >= 1: # 최소 2일이어야 의미있는 비교 가능
+        period1_end_date = start_date + pd.Timedelta(days=period_duration_days // 2)
+        windows.append(('선택 기간 후반 vs 전반', period1_end_date + pd.Timedelta(days=1), end_date, start_date, period1_end_date))
+    return windows + rolling_decline_windows(end_date)
+
+def load_customer_decline_table(_drive_service, file_id_sales, sheet_name, start_date, end_date):
+    """모든 거래처의 비교 구간별 매출 변동표를 반환합니다. 파일 버전과 기간별로 한 번만 계산합니다."""
+    file_version = get_drive_file_version(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_customer_decline_table_for_version(_drive_service, file_id_sales, sheet_name, start_date, end_date, file_version)
+    except TransientLoadError:
+        return None # 매출 데이터 로딩 오류는 load_sales_data에서 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"거래처 감소 분석 표 계산 중 예상 못한 오류: {e}")
         return None
 
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_customer_decline_table_for_version(_drive_service, file_id_sales, sheet_name, start_date, end_date, file_version):
+    """load_customer_decline_table의 실제 계산 함수입니다. file_version은 캐시 키로만 사용됩니다."""
+    sales_cube = _load_sales_cube_for_version(_drive_service, file_id_sales, sheet_name, file_version)
+    if sales_cube is None or sales_cube.empty:
+        return None
+    return build_customer_decline_table(sales_cube, get_decline_windows(start_date, end_date), trend_end=end_date)
+
+def warm_sales_datasets(_drive_service):
+    """갱신기 작업: 매출 행/집계 큐브와 기본 기간(최근 90일)의 거래처 감소 표를 미리 만듭니다."""
+    load_sales_data(_drive_service, SALES_FILE_ID, SALES_SHEET_NAME)
+    sales_cube = load_sales_cube(_drive_service, SALES_FILE_ID, SALES_SHEET_NAME)
+    if sales_cube is None or sales_cube.empty: return
+    end_date = sales_cube.days[-1]
+    start_date = max(end_date - pd.Timedelta(days=89), sales_cube.days[0])
+    load_customer_decline_table(_drive_service, SALES_FILE_ID, SALES_SHEET_NAME, pd.Timestamp(start_date), pd.Timestamp(end_date))
+
+# 새 파일 버전이 게시되기 전에 기본 화면의 데이터가 준비되도록 갱신기에 등록합니다 (사이드바 신선도 표시 포함).
+attach_page_to_cache_warmer(drive_service, "page_sales_analysis", [(SALES_FILE_ID, warm_sales_datasets)])
+
 # --- Streamlit 페이지 구성 ---
 st.title("📈 매출 분석")
 st.markdown("---")
@@ -104,26 +190,32 @@ elif df_sales_loaded.empty:
     st.warning("처리할 매출 데이터가 없습니다 (파일은 읽었으나 내용이 비어있거나 모두 필터링됨).")
 else:
     st.success(f"매출 데이터 로드 및 기본 전처리 완료: {len(df_sales_loaded)} 행")
+    render_memory_debug_panel({f"매출내역 ({SALES_SHEET_NAME})": df_sales_loaded}) # 사이드바 디버그 패널 (체크 시 표시)
+    # 기간/검색 조건이 바뀌어도 전체 행을 다시 거르지 않도록, 모든 집계는 일자 누적합 큐브에서 읽습니다.
+    sales_cube = load_sales_cube(drive_service, SALES_FILE_ID, SALES_SHEET_NAME)
+    if sales_cube is None or sales_cube.empty:
+        st.warning("유효한 매출일자 데이터가 없어 분석할 수 없습니다.")
+        st.stop()
     today = pd.Timestamp.today().normalize()
     
-    min_data_date = df_sales_loaded[DATE_COL].min()
-    max_data_date = df_sales_loaded[DATE_COL].max()
+    min_data_date = sales_cube.days[0]
+    max_data_date = sales_cube.days[-1]
 
     date_range_col1, date_range_col2 = st.columns(2)
     with date_range_col1:
         start_date_input = st.date_input(
             "분석 시작일", 
-            value=max_data_date - pd.Timedelta(days=89) if not pd.isna(max_data_date) else today - pd.Timedelta(days=89),
-            min_value=min_data_date if not pd.isna(min_data_date) else None,
-            max_value=max_data_date if not pd.isna(max_data_date) else today,
+            value=max(max_data_date - pd.Timedelta(days=89), min_data_date),
+            min_value=min_data_date,
+            max_value=max_data_date,
             key="sales_start_date"
         )
     with date_range_col2:
         end_date_input = st.date_input(
             "분석 종료일", 
-            value=max_data_date if not pd.isna(max_data_date) else today,
-            min_value=start_date_input if start_date_input else (min_data_date if not pd.isna(min_data_date) else None),
-            max_value=max_data_date if not pd.isna(max_data_date) else today,
+            value=max_data_date,
+            min_value=start_date_input if start_date_input else min_data_date,
+            max_value=max_data_date,
             key="sales_end_date"
         )
     
@@ -132,50 +224,61 @@ else:
 
     st.info(f"선택된 분석 기간: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}")
     
-    df_filtered_global = df_sales_loaded[
-        (df_sales_loaded[DATE_COL] >= start_date) & 
-        (df_sales_loaded[DATE_COL] <= end_date)
-    ].copy()
+    period_total = sales_cube.total(start_date, end_date)
 
-    if df_filtered_global.empty:
+    if period_total[ROW_COUNT_COL] == 0:
         st.warning("선택된 기간 내에 해당하는 매출 데이터가 없습니다.")
     else:
         col1, col2 = st.columns([2, 3]) # 레이아웃 비율 조정
 
         with col2: # 오른쪽 컬럼: 검색 조건 및 상세 내역
             st.header("🔍 조건별 매출 상세 조회")
-            st.markdown("거래처명 또는 품목명(일부 또는 전체)을 입력하여 선택된 기간의 상세 매출 내역 및 관련 그래프를 조회합니다.")
+            st.markdown("거래처명 또는 품목명(일부 또는 전체, 초성 가능)을 입력하여 선택된 기간의 상세 매출 내역 및 관련 그래프를 조회합니다.")
             customer_input_raw = st.text_input("거래처명 검색:", key="sales_customer_input")
             product_input_raw = st.text_input("품목명 검색:", key="sales_product_input")
 
             customer_input = customer_input_raw.strip()
             product_input = product_input_raw.strip()
 
-            df_for_display_search = df_filtered_global.copy() # 검색을 위해 원본 필터된 데이터 복사
-            filter_active = False
+            # 검색은 행이 아니라 고유 거래처/품목 이름에서만 수행하고, 일치하는 키 번호로 큐브를 거릅니다.
+            customer_codes = None
+            product_codes = None
             active_filters = []
 
+            similar_name_notices = [] # 일치하는 이름이 없어 유사 이름으로 찾은 경우 안내
             if customer_input:
-                df_for_display_search = df_for_display_search[df_for_display_search[CUSTOMER_COL].str.contains(customer_input, case=False, na=False, regex=False)]
-                filter_active = True
-                active_filters.append(f"거래처: '{customer_input}'")
+                customer_codes, similar_customers = sales_cube.match_codes(CUSTOMER_DIM, customer_input)
+                active_filters.append(f"거래처: '{customer_input}'" + (" (유사 이름 결과)" if similar_customers else ""))
+                if similar_customers:
+                    similar_name_notices.append(f"일치하는 거래처명이 없어 비슷한 이름의 결과를 표시합니다: {', '.join(similar_customers)}")
             if product_input:
-                df_for_display_search = df_for_display_search[df_for_display_search[PRODUCT_COL].str.contains(product_input, case=False, na=False, regex=False)]
-                filter_active = True
-                active_filters.append(f"품목: '{product_input}'")
+                product_codes, similar_products = sales_cube.match_codes(PRODUCT_DIM, product_input)
+                active_filters.append(f"품목: '{product_input}'" + (" (유사 이름 결과)" if similar_products else ""))
+                if similar_products:
+                    similar_name_notices.append(f"일치하는 품목명이 없어 비슷한 이름의 결과를 표시합니다: {', '.join(similar_products)}")
+            filter_active = bool(active_filters)
             
             if filter_active:
+                # 건수/합계와 그래프는 큐브에서 읽고, 상세 표는 실제 매출 행(건별 매출단가 포함)을 공유 데이터에서 잘라 보여 줍니다.
+                # 조건 마스크는 큐브가 찾은 거래처/품목 이름으로 만들므로 큐브 집계와 같은 행을 가리킵니다.
+                detail_mask = combine_masks(
+                    ((df_sales_loaded[DATE_COL] >= start_date) & (df_sales_loaded[DATE_COL] < end_date + pd.Timedelta(days=1))).to_numpy(),
+                    df_sales_loaded[CUSTOMER_COL].isin(sales_cube.labels[CUSTOMER_DIM][customer_codes]).to_numpy() if customer_codes is not None else None,
+                    df_sales_loaded[PRODUCT_COL].isin(sales_cube.labels[PRODUCT_DIM][product_codes]).to_numpy() if product_codes is not None else None,
+                )
+                df_search_rows = take_rows(df_sales_loaded, detail_mask, [DATE_COL, CUSTOMER_COL, PRODUCT_COL, WEIGHT_COL, PRICE_COL, AMOUNT_COL])
                 st.markdown("---")
                 st.subheader(f"'{' / '.join(active_filters) if active_filters else '전체'}' 상세 검색 결과")
-                st.write(f"총 {len(df_for_display_search)} 건의 매출 내역이 검색되었습니다.")
-                if not df_for_display_search.empty:
-                    display_cols_detail = [DATE_COL, CUSTOMER_COL, PRODUCT_COL, WEIGHT_COL, PRICE_COL, AMOUNT_COL]
-                    valid_display_cols_detail = [col for col in display_cols_detail if col in df_for_display_search.columns]
-                    df_display_detail = df_for_display_search[valid_display_cols_detail].copy()
-                    
-                    df_display_detail[DATE_COL] = df_display_detail[DATE_COL].dt.strftime('%Y-%m-%d')
-                    df_display_detail.sort_values(by=DATE_COL, ascending=False, inplace=True)
-                    st.dataframe(df_display_detail, hide_index=True, use_container_width=True, height=300) # 높이 지정
+                for notice in similar_name_notices:
+                    st.caption(notice)
+                st.write(f"총 {len(df_search_rows)} 건의 매출 내역이 검색되었습니다.")
+                if not df_search_rows.empty:
+                    # 최신 일자 순으로 정렬 순서만 만들고, 날짜 문자열 변환과 표시는 현재 페이지 행에만 합니다.
+                    render_paginated_table(
+                        df_search_rows, key="sales_detail_table",
+                        sort_by=DATE_COL, ascending=False, date_cols=[DATE_COL],
+                        export_name="매출상세내역", height=300 # 높이 지정
+                    )
                 else:
                     st.info("해당 검색 조건에 맞는 상세 내역이 없습니다.")
             elif not customer_input_raw and not product_input_raw: # 검색어가 둘 다 입력되지 않았을 때만 안내
@@ -184,112 +287,70 @@ else:
             # --- 추가 기능: 최근 거래 감소 거래처 분석 ---
             st.markdown("---") 
             st.subheader("📉 최근 거래 감소 추세 분석 (선택 기간 기준)")
+            st.caption("선택 기간 전반/후반, 최근 4주, 최근 30일, 전년 동기를 모든 거래처에 대해 한 번에 비교합니다 (분석 종료일 기준).")
 
-            if df_filtered_global.empty: # 이 분석은 전체 선택 기간(df_filtered_global)을 사용
-                st.info("거래 감소 분석을 위한 데이터가 없습니다.")
+            decline_windows = get_decline_windows(start_date, end_date)
+            df_decline = load_customer_decline_table(drive_service, SALES_FILE_ID, SALES_SHEET_NAME, start_date, end_date)
+            if df_decline is None or df_decline.empty:
+                st.info("비교 구간에 매출이 발생한 거래처가 없어 거래 감소 추세를 분석할 수 없습니다.")
             else:
-                period_duration_days = (end_date - start_date).days
-                
-                if period_duration_days < 1: # 최소 2일이어야 의미있는 비교 가능 (0일 또는 음수 방지)
-                                             # 1일인 경우, num_days_period1 = 0, period1_end_date = start_date
-                                             # period2_start_date = start_date + 1 day. df_period2가 비게 됨.
-                    st.info("거래 감소 추세 분석을 위해서는 최소 2일 이상의 기간이 선택되어야 합니다.")
+                window_labels = [window[0] for window in decline_windows]
+                decline_opt_col1, decline_opt_col2 = st.columns(2)
+                with decline_opt_col1:
+                    selected_window = st.selectbox("비교 기준", window_labels, key="decline_window")
+                    min_previous_amount = st.number_input("이전 구간 최소 매출액(원)", min_value=0, value=0, step=100000, key="decline_min_previous")
+                with decline_opt_col2:
+                    max_change_pct = st.slider("변동률 기준 (이하만 표시, %)", min_value=-100, max_value=0, value=0, step=5, key="decline_max_change_pct")
+                    top_n = st.number_input("표시할 거래처 수 (상위 N)", min_value=1, value=50, step=10, key="decline_top_n")
+
+                for label, recent_start, recent_end, previous_start, previous_end in decline_windows:
+                    if label == selected_window:
+                        st.caption(f"이전: {previous_start.strftime('%Y-%m-%d')} ~ {previous_end.strftime('%Y-%m-%d')} / "
+                                   f"최근: {recent_start.strftime('%Y-%m-%d')} ~ {recent_end.strftime('%Y-%m-%d')}")
+
+                df_all_decreased = rank_declines(df_decline, selected_window, min_previous_amount, max_change_pct)
+                if df_all_decreased.empty:
+                    st.info("선택한 기준에서 매출이 감소한 거래처가 없습니다 (이전 구간에 거래가 있었던 거래처 기준).")
                 else:
-                    num_days_period1 = period_duration_days // 2 
-                    period1_end_date = start_date + pd.Timedelta(days=num_days_period1)
-                    period2_start_date = period1_end_date + pd.Timedelta(days=1)
-
-                    # 기간2가 비정상적으로 설정되는 것 방지 (예: period2_start_date > end_date)
-                    if period2_start_date > end_date :
-                         df_period1 = df_filtered_global.copy() # 전체 기간을 period1로 간주
-                         df_period2 = pd.DataFrame(columns=df_filtered_global.columns) # period2는 빈 df
-                         st.caption(f"분석 기간 1: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')} (전체 기간)")
-                         st.caption(f"분석 기간 2: 데이터 없음 (기간이 짧아 분할 불가)")
-                    else:
-                        df_period1 = df_filtered_global[df_filtered_global[DATE_COL] <= period1_end_date]
-                        df_period2 = df_filtered_global[df_filtered_global[DATE_COL] >= period2_start_date]
-                        st.caption(f"분석 기간 1 (이전): {start_date.strftime('%Y-%m-%d')} ~ {period1_end_date.strftime('%Y-%m-%d')}")
-                        st.caption(f"분석 기간 2 (최근): {period2_start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}")
-
-
-                    if df_period1.empty and df_period2.empty :
-                         st.info("선택된 기간을 나눈 각 하위 기간에 데이터가 없습니다.")
-                    # period1에만 데이터가 있거나, period2에만 데이터가 있는 경우도 고려해야 함
-                    # 여기서는 period1에 데이터가 있는 것을 기준으로 함
-                    elif df_period1.empty:
-                        st.info("분석 기간 1 (이전 기간)에 매출 데이터가 없어 비교할 수 없습니다.")
-                    else:
-                        sales_p1 = df_period1.groupby(CUSTOMER_COL)[AMOUNT_COL].sum().reset_index()
-                        sales_p1.columns = [CUSTOMER_COL, '기간1_매출액']
-                        
-                        if df_period2.empty: # 기간2에 데이터가 아예 없는 경우
-                            sales_p2 = pd.DataFrame(columns=[CUSTOMER_COL, '기간2_매출액'])
-                        else:
-                            sales_p2 = df_period2.groupby(CUSTOMER_COL)[AMOUNT_COL].sum().reset_index()
-                            sales_p2.columns = [CUSTOMER_COL, '기간2_매출액']
-
-                        merged_sales = pd.merge(sales_p1, sales_p2, on=CUSTOMER_COL, how='left').fillna(0)
-                        merged_sales = merged_sales[merged_sales['기간1_매출액'] > 0] # 이전 기간에 매출이 있었던 거래처
-
-                        if merged_sales.empty:
-                            st.info("이전 기간에 매출이 발생한 거래처가 없거나, 비교할 데이터가 없습니다.")
-                        else:
-                            merged_sales['매출변동액'] = merged_sales['기간2_매출액'] - merged_sales['기간1_매출액']
-                            # 매출변동률 계산 (기간1_매출액이 0인 경우 방지 - 이미 위에서 필터링)
-                            merged_sales['매출변동률(%)'] = ((merged_sales['매출변동액'] / merged_sales['기간1_매출액']) * 100).round(2)
-                            
-                            decreased_customers = merged_sales[merged_sales['매출변동액'] < 0].copy()
-                            decreased_customers_sorted = decreased_customers.sort_values(by='매출변동액', ascending=True)
-
-                            if decreased_customers_sorted.empty:
-                                st.info("선택된 기간 동안 매출이 감소한 거래처가 없습니다 (이전 기간에 거래가 있었던 거래처 기준).")
-                            else:
-                                st.write(f"총 {len(decreased_customers_sorted)} 곳의 거래처에서 최근 거래가 감소했습니다.")
-                                
-                                decreased_customers_display = decreased_customers_sorted[[
-                                    CUSTOMER_COL, '기간1_매출액', '기간2_매출액', '매출변동액', '매출변동률(%)'
-                                ]].rename(columns={
-                                    CUSTOMER_COL: '거래처명',
-                                    '기간1_매출액': '이전 기간 매출액',
-                                    '기간2_매출액': '최근 기간 매출액',
-                                    '매출변동액': '매출 변동액',
-                                    '매출변동률(%)': '매출 변동률 (%)'
-                                })
-                                
-                                # 숫자 포맷팅 (예시)
-                                formatters = {
-                                    '이전 기간 매출액': '{:,.0f}',
-                                    '최근 기간 매출액': '{:,.0f}',
-                                    '매출 변동액': '{:,.0f}',
-                                    '매출 변동률 (%)': '{:.2f}%'
-                                }
-                                st.dataframe(
-                                    decreased_customers_display.style.format(formatters),
-                                    hide_index=True, 
-                                    use_container_width=True
-                                )
-                                
-                                if not decreased_customers_display.empty:
-                                    st.write("---")
-                                    st.write("**매출 감소액 Top 5 거래처**")
-                                    top_n_decreased = decreased_customers_display.nsmallest(5, '매출 변동액')
-                                    
-                                    if not top_n_decreased.empty:
-                                        chart_data = top_n_decreased.set_index('거래처명')[['매출 변동액']]
-                                        st.bar_chart(chart_data)
-                                    else:
-                                        st.info("매출 감소액 Top 5를 표시할 데이터가 충분하지 않습니다.")
+                    st.write(f"총 {len(df_all_decreased)} 곳의 거래처에서 거래가 감소했습니다. (감소액 상위 {min(int(top_n), len(df_all_decreased))} 곳 표시)")
+                    df_top_decreased = df_all_decreased.head(int(top_n))
+                    previous_col, recent_col, change_col, change_pct_col = window_column_names(selected_window)
+                    # 다른 비교 구간의 변동률과 주간 추세도 함께 보여 줍니다.
+                    other_pct_cols = [window_column_names(label)[3] for label in window_labels if label != selected_window]
+                    decreased_customers_display = df_top_decreased[
+                        [previous_col, recent_col, change_col, change_pct_col] + other_pct_cols + [TREND_SLOPE_COL, TREND_PCT_COL]
+                    ].rename(columns={
+                        previous_col: '이전 기간 매출액',
+                        recent_col: '최근 기간 매출액',
+                        change_col: '매출 변동액',
+                        change_pct_col: '매출 변동률 (%)'
+                    }).rename_axis('거래처명').reset_index()
+
+                    formatters = {
+                        '이전 기간 매출액': '{:,.0f}',
+                        '최근 기간 매출액': '{:,.0f}',
+                        '매출 변동액': '{:,.0f}',
+                        '매출 변동률 (%)': '{:.2f}%',
+                        TREND_SLOPE_COL: '{:,.0f}',
+                        TREND_PCT_COL: '{:.2f}%',
+                        **{col: '{:.2f}%' for col in other_pct_cols}
+                    }
+                    st.dataframe(
+                        decreased_customers_display.style.format(formatters, na_rep='-'),
+                        hide_index=True, 
+                        use_container_width=True
+                    )
+                    
+                    st.write("---")
+                    st.write("**매출 감소액 Top 5 거래처**")
+                    top_n_decreased = decreased_customers_display.nsmallest(5, '매출 변동액')
+                    chart_data = top_n_decreased.set_index('거래처명')[['매출 변동액']]
+                    st.bar_chart(chart_data)
         # --- col2 끝 ---
 
         with col1: # 왼쪽 컬럼: 그래프 표시
             graph_title_suffix = ""
-            # 그래프를 그릴 때 사용할 데이터프레임: 검색 필터가 적용된 df_for_display_search 또는 전체 df_filtered_global
-            # 현재는 검색 조건이 입력되었을 때만 df_for_display_search를 사용하고, 아니면 df_filtered_global을 사용하도록 되어야 함
-            # 이 부분을 명확히 하기 위해, 그래프용 데이터프레임을 명시적으로 결정
-            
-            df_for_graph = df_filtered_global # 기본은 전체 기간 데이터
-            if filter_active: # 검색어가 하나라도 입력되었다면
-                df_for_graph = df_for_display_search # 검색 결과 데이터 사용
+            if filter_active: # 검색어가 하나라도 입력되었다면 검색 조건의 일별 합계를 사용
                 graph_title_suffix = f" ({', '.join(active_filters)})"
             
             st.header(f"📊 일별 매출 추이{graph_title_suffix}")
@@ -298,35 +359,46 @@ else:
             else:
                 st.markdown(f"검색 조건에 따른 선택된 기간의 일별 매출 금액과 판매 중량(Kg) 추세입니다.")
 
-            if df_for_graph.empty: # 그래프용 데이터가 비었는지 확인
+            # 일별 합계는 큐브에서 한 번만 꺼내 그래프와 요약 표가 함께 사용합니다.
+            daily_summary = sales_cube.daily_totals(start_date, end_date, customer_codes, product_codes)
+            days_with_sales = daily_summary.index[daily_summary[ROW_COUNT_COL] > 0]
+            if days_with_sales.empty: # 그래프용 데이터가 비었는지 확인
                 st.warning("선택된 조건에 해당하는 매출 데이터가 없어 그래프를 표시할 수 없습니다.")
             else:
-                daily_summary = df_for_graph.groupby(pd.Grouper(key=DATE_COL, freq='D'))[[AMOUNT_COL, WEIGHT_COL]].sum()
+                # 기존 일 단위 묶음과 같이 첫 거래일 ~ 마지막 거래일 구간만 사용합니다.
+                daily_summary = daily_summary.loc[days_with_sales[0]:days_with_sales[-1], [AMOUNT_COL, WEIGHT_COL]]
                 daily_summary_for_chart = daily_summary[~((daily_summary[AMOUNT_COL] == 0) & (daily_summary[WEIGHT_COL] == 0))]
                 
                 if daily_summary_for_chart.empty:
                     st.write("그래프에 표시할 데이터가 없습니다 (모든 날짜의 합계가 0이거나 데이터 없음).")
                 else:
-                    daily_summary_for_chart = daily_summary_for_chart.copy() 
-                    daily_summary_for_chart.rename(columns={AMOUNT_COL: '매출 금액(원)', WEIGHT_COL: f'판매 중량({WEIGHT_COL})'}, inplace=True)
+                    # 기간이 길면 큐브의 주별/월별 합계로 바꾸고, 일별로 볼 때는 그래프 폭에 맞게 점 수를 줄여 보냅니다.
+                    chart_unit = st.radio("그래프 단위", list(CHART_UNIT_OPTIONS), horizontal=True, key="sales_chart_unit")
+                    chart_freq = CHART_UNIT_OPTIONS[chart_unit] or choose_rollup_freq(days_with_sales[0], days_with_sales[-1])
+                    if chart_freq == 'D':
+                        chart_data = downsample_frame(daily_summary_for_chart)
+                        if len(chart_data) < len(daily_summary_for_chart):
+                            st.caption(f"그래프 표시 점 수를 {len(daily_summary_for_chart):,}개에서 {len(chart_data):,}개로 줄였습니다 (추세 모양 유지).")
+                    else:
+                        chart_data = sales_cube.period_totals(days_with_sales[0], days_with_sales[-1], chart_freq, customer_codes, product_codes)[[AMOUNT_COL, WEIGHT_COL]]
+                        chart_data = downsample_frame(chart_data)
+                        st.caption(f"{ROLLUP_FREQ_LABELS[chart_freq]} 합계로 표시합니다 (각 주/월의 시작일 기준).")
+                    chart_data = chart_data.rename(columns={AMOUNT_COL: '매출 금액(원)', WEIGHT_COL: f'판매 중량({WEIGHT_COL})'})
 
                     st.subheader("금액 (원)")
-                    st.line_chart(daily_summary_for_chart[['매출 금액(원)']], use_container_width=True)
+                    st.line_chart(chart_data[['매출 금액(원)']], use_container_width=True)
 
                     st.subheader(f"중량 ({WEIGHT_COL})") 
-                    st.line_chart(daily_summary_for_chart[[f'판매 중량({WEIGHT_COL})']], use_container_width=True)
+                    st.line_chart(chart_data[[f'판매 중량({WEIGHT_COL})']], use_container_width=True)
 
                     with st.expander("선택 조건 일별 요약 데이터 보기"):
-                        daily_summary_table_data = df_for_graph.groupby(pd.Grouper(key=DATE_COL, freq='D'))[[AMOUNT_COL, WEIGHT_COL]].sum().reset_index()
-                        if daily_summary_table_data.empty:
-                            st.write("요약할 데이터가 없습니다.")
-                        else:
-                            weekday_map = {0: '월', 1: '화', 2: '수', 3: '목', 4: '금', 5: '토', 6: '일'}
-                            daily_summary_table_data['요일'] = daily_summary_table_data[DATE_COL].dt.dayofweek.map(weekday_map)
-                            daily_summary_table_data[DATE_COL] = daily_summary_table_data[DATE_COL].dt.strftime('%Y-%m-%d')
-                            daily_summary_table_data.rename(columns={AMOUNT_COL: '매출 금액(원)', WEIGHT_COL: f'판매 중량({WEIGHT_COL})'}, inplace=True)
-                            
-                            display_columns = [DATE_COL, '요일', '매출 금액(원)', f'판매 중량({WEIGHT_COL})']
-                            st.dataframe(daily_summary_table_data[display_columns], use_container_width=True, hide_index=True)
+                        daily_summary_table_data = daily_summary.reset_index()
+                        weekday_map = {0: '월', 1: '화', 2: '수', 3: '목', 4: '금', 5: '토', 6: '일'}
+                        daily_summary_table_data['요일'] = daily_summary_table_data[DATE_COL].dt.dayofweek.map(weekday_map)
+                        daily_summary_table_data[DATE_COL] = daily_summary_table_data[DATE_COL].dt.strftime('%Y-%m-%d')
+                        daily_summary_table_data.rename(columns={AMOUNT_COL: '매출 금액(원)', WEIGHT_COL: f'판매 중량({WEIGHT_COL})'}, inplace=True)
+                        
+                        display_columns = [DATE_COL, '요일', '매출 금액(원)', f'판매 중량({WEIGHT_COL})']
+                        st.dataframe(daily_summary_table_data[display_columns], use_container_width=True, hide_index=True)
         # --- col1 끝 ---
 # --- else (df_sales_loaded is not None and not df_sales_loaded.empty) 끝 ---
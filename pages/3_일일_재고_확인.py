@@ -11,8 +11,18 @@ import numpy as np # compare_inventories 함수에서 사용되었던 것처럼,
 import io # io.BytesIO 사용
 
 # common_utils.py 에서 공통 유틸리티 함수 가져오기
-from common_utils import download_excel_from_drive_as_bytes
-# get_all_available_sheet_dates_from_bytes 함수는 이 파일의 find_latest_sheet와 유사/대체 가능
+from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version, get_excel_sheet_names, read_excel_sheet
+# 시트 목록과 시트 데이터는 공유 통합문서 레지스트리를 통해 파일 버전별로 한 번만 읽습니다.
+from cache_warmer import attach_page_to_cache_warmer
+from sheet_schemas import SM_SNAPSHOT_SCHEMA
+from frame_utils import combine_masks, compact_frame, render_memory_debug_panel, take_rows
+from display_utils import render_paginated_table
+from sm_lot_events import (
+    EVENT_DATE_COL, EVENT_PREV_DATE_COL, EVENT_TYPE_COL, EVENT_TYPES, EVENT_OPENING, LOT_RECEIPT_DATE_COL,
+    LIFECYCLE_FIRST_SEEN_COL, LIFECYCLE_LAST_SEEN_COL, LIFECYCLE_EMPTIED_COL, LIFECYCLE_DAYS_COL,
+    TURNOVER_EMPTIED_LOTS_COL, TURNOVER_AVG_DAYS_COL, TURNOVER_OPEN_AGE_COL,
+    load_lot_events, load_opening_lots, summarize_lot_lifecycles, summarize_product_turnover
+)
 
 # --- Google Drive 파일 ID 정의 ---
 # 사용자님이 제공해주신 실제 파일 ID를 사용합니다.
@@ -38,6 +48,8 @@ REQUIRED_COLS_FOR_PAGE = [RECEIPT_NUMBER_COL, PROD_CODE_COL, PROD_NAME_COL, BRAN
                           INITIAL_QTY_BOX_COL, INITIAL_QTY_KG_COL, 
                           REMAINING_DAYS_COL]
 
+LOT_EVENT_DEFAULT_DAYS = 30 # 로트 이동 이력 기본 조회 기간
+
 KEYWORD_REFRIGERATED = "냉장"
 THRESHOLD_REFRIGERATED = 21
 THRESHOLD_OTHER = 90
@@ -55,49 +67,57 @@ drive_service = retrieved_drive_service
 
 # --- 함수 정의 (Google Drive 연동으로 수정) ---
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
+# 시트 목록은 공유 통합문서 레지스트리에 파일 버전별로 캐시되므로 별도 캐시를 두지 않습니다.
 def find_latest_sheet(_drive_service, file_id_sm):
     """Google Drive의 Excel 파일에서 YYYYMMDD 형식의 가장 최신 날짜 시트 이름을 찾습니다."""
     if _drive_service is None:
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (최신 시트 검색)")
         return None
 
-    file_bytes_sm = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, "SM재고현황 (최신 시트 검색용)")
-    if file_bytes_sm is None:
-        return None # 오류 메시지는 download 함수에서 이미 표시됨
+    sheet_names = get_excel_sheet_names(_drive_service, file_id_sm, "SM재고현황 (최신 시트 검색용)")
+    if sheet_names is None:
+        return None # 오류 메시지는 get_excel_sheet_names 함수에서 이미 표시됨
         
     try:
-        with pd.ExcelFile(file_bytes_sm) as xls:
-            sheet_names = xls.sheet_names
-            # YYYYMMDD 형식의 시트 이름을 찾습니다. (예: 20230521)
-            date_sheets = [name for name in sheet_names if len(name) == 8 and name.isdigit()]
-            if not date_sheets: 
-                st.error(f"오류: SM재고현황 파일 (ID: {file_id_sm})에 YYYYMMDD 형식 시트 없음")
-                return None
-            latest_sheet = max(date_sheets)
-            return latest_sheet
+        # YYYYMMDD 형식의 시트 이름을 찾습니다. (예: 20230521)
+        date_sheets = [name for name in sheet_names if len(name) == 8 and name.isdigit()]
+        if not date_sheets: 
+            st.error(f"오류: SM재고현황 파일 (ID: {file_id_sm})에 YYYYMMDD 형식 시트 없음")
+            return None
+        latest_sheet = max(date_sheets)
+        return latest_sheet
     except Exception as e: 
         st.error(f"SM재고현황 파일 (ID: {file_id_sm}) 시트 목록 읽기 오류: {e}")
         return None
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def load_sm_sheet_for_daily_check(_drive_service, file_id_sm, sheet_name):
     """일일 확인용 SM 재고 시트를 Google Drive에서 로드하고 필요한 컬럼 확인 및 기본 처리합니다."""
-    if _drive_service is None:
-        st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (일일 재고 데이터 로딩)")
+    file_version = get_drive_file_version(_drive_service, file_id_sm, f"SM재고현황 ({sheet_name})")
+    if file_version is None:
+        return None
+    try:
+        return _load_sm_sheet_for_daily_check_for_version(_drive_service, file_id_sm, sheet_name, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e: 
+        st.error(f"SM 시트 (ID: {file_id_sm}, 시트: '{sheet_name}') 로드 중 예상 못한 오류: {e}")
+        # traceback.print_exc() # 디버깅 시 상세 오류 출력
         return None
 
-    file_bytes_sm = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, f"SM재고현황 ({sheet_name})")
-    if file_bytes_sm is None:
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sm_sheet_for_daily_check_for_version(_drive_service, file_id_sm, sheet_name, file_version):
+    """load_sm_sheet_for_daily_check의 실제 로딩 함수입니다. 다운로드 실패는 TransientLoadError로 올려 보내 캐시하지 않습니다."""
+    if _drive_service is None:
+        st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (일일 재고 데이터 로딩)")
         return None
 
     try:
-        # 메모리 최적화 제안: 만약 Excel 파일에 불필요한 컬럼이 많다면,
-        # usecols 파라미터를 사용하여 필요한 컬럼만 로드하는 것을 고려할 수 있습니다.
-        # 예: df = pd.read_excel(file_bytes_sm, sheet_name=sheet_name, usecols=REQUIRED_COLS_FOR_PAGE)
-        # 단, REQUIRED_COLS_FOR_PAGE에 없는 컬럼을 참조하면 오류가 발생하므로 주의해야 합니다.
-        # 현재 로직은 모든 컬럼을 읽은 후, 필요한 컬럼이 있는지 확인하고 없으면 생성/채우는 방식입니다.
-        df = pd.read_excel(file_bytes_sm, sheet_name=sheet_name)
+        # SM 스냅샷 스키마(sheet_schemas.SM_SNAPSHOT_SCHEMA)의 컬럼만 읽습니다 (usecols).
+        # 스키마에 없는 컬럼은 읽히지 않으므로, 이 페이지에서 새 컬럼을 쓰려면 스키마에 먼저 추가해야 합니다.
+        # 필요한 컬럼이 시트에 없으면 아래에서 생성/채우거나 오류를 표시합니다.
+        df = read_excel_sheet(_drive_service, file_id_sm, sheet_name, f"SM재고현황 ({sheet_name})", schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+        if df is None:
+            raise TransientLoadError(f"SM재고현황 ({sheet_name}) 다운로드 실패")
 
         # 필수 컬럼 존재 여부 확인 및 처리
         missing_cols = [col for col in REQUIRED_COLS_FOR_PAGE if col not in df.columns]
@@ -129,11 +149,12 @@ def load_sm_sheet_for_daily_check(_drive_service, file_id_sm, sheet_name):
                 st.write(f"사용 가능한 컬럼: {df.columns.tolist()}")
                 return None
             
-        df[RECEIPT_NUMBER_COL] = df.get(RECEIPT_NUMBER_COL, pd.Series(dtype='str')).fillna('').astype(str).str.strip()
-        df[PROD_CODE_COL] = df[PROD_CODE_COL].fillna('').astype(str).str.replace(r'\.0$', '', regex=True)
-        df[PROD_NAME_COL] = df[PROD_NAME_COL].astype(str).str.strip()
-        df[BRANCH_COL] = df[BRANCH_COL].astype(str).str.strip()
-        df[EXP_DATE_COL] = df[EXP_DATE_COL].fillna('').astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+        # 번호/상품코드/상품명/지점명/소비기한은 스키마로 읽어 이미 공백이 제거된 문자열입니다 ('.0' 없음).
+        df[RECEIPT_NUMBER_COL] = df[RECEIPT_NUMBER_COL].fillna('')
+        df[PROD_CODE_COL] = df[PROD_CODE_COL].fillna('')
+        df[PROD_NAME_COL] = df[PROD_NAME_COL].fillna('')
+        df[BRANCH_COL] = df[BRANCH_COL].fillna('')
+        df[EXP_DATE_COL] = df[EXP_DATE_COL].fillna('')
         df[RECEIPT_DATE_COL] = pd.to_datetime(df[RECEIPT_DATE_COL], errors='coerce')
         
         df[INITIAL_QTY_BOX_COL] = pd.to_numeric(df.get(INITIAL_QTY_BOX_COL, 0), errors='coerce').fillna(0)
@@ -146,23 +167,52 @@ def load_sm_sheet_for_daily_check(_drive_service, file_id_sm, sheet_name):
         df[QTY_COL] = pd.to_numeric(df[QTY_COL], errors='coerce').fillna(0)
         df[WGT_COL] = pd.to_numeric(df[WGT_COL], errors='coerce').fillna(0)
 
-        # 메모리 최적화 제안: 데이터 로드 및 기본 처리 후,
-        # 문자열 컬럼 중 고유값이 적은 경우 (예: 상품명, 지점명 등) category 타입으로 변경하면 메모리 절약 가능
-        # 예: df[PROD_NAME_COL] = df[PROD_NAME_COL].astype('category')
-        # df[BRANCH_COL] = df[BRANCH_COL].astype('category')
-        # 숫자 컬럼도 가능한 경우 더 작은 타입으로 변경 (pd.to_numeric의 downcast 옵션 활용)
-
-        return df
+        # 결과는 모든 세션이 공유하므로 상품명/지점명/상품코드는 category로, 정수 값 수량은 int32로 줄여 둡니다.
+        return compact_frame(df, label=f"SM재고현황 ({sheet_name})", category_cols=[PROD_CODE_COL, PROD_NAME_COL, BRANCH_COL])
     except ValueError as ve:
         if sheet_name and f"Worksheet named '{sheet_name}' not found" in str(ve): 
             st.error(f"오류: SM 파일 (ID: {file_id_sm})에 '{sheet_name}' 시트 없음")
         else: 
             st.error(f"SM 데이터 (ID: {file_id_sm}, 시트: {sheet_name}) 로드/처리 중 값 오류: {ve}")
         return None
-    except Exception as e: 
-        st.error(f"SM 시트 (ID: {file_id_sm}, 시트: '{sheet_name}') 로드 중 예상 못한 오류: {e}")
-        # traceback.print_exc() # 디버깅 시 상세 오류 출력
+
+def load_lot_event_views(_drive_service, file_id_sm, start_date, end_date):
+    """기간의 로트 이동 이벤트와, 이벤트로 계산한 로트 수명/품목별 회전 표를 반환합니다. 실패 시 None."""
+    file_version = get_drive_file_version(_drive_service, file_id_sm, "SM재고현황 (로트 이동 이력)")
+    if file_version is None:
         return None
+    try:
+        return _load_lot_event_views_for_version(_drive_service, file_id_sm, start_date, end_date, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"로트 이동 이력 처리 중 예상 못한 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_lot_event_views_for_version(_drive_service, file_id_sm, start_date, end_date, file_version):
+    """load_lot_event_views의 실제 로딩 함수입니다. 이벤트는 시트 쌍마다 한 번만 계산되어 sm_lot_events에 보관되며, 시트는 캐시 키로 쓴 file_version에서 읽습니다."""
+    df_events = load_lot_events(_drive_service, file_id_sm, start_date, end_date, "SM재고현황 (로트 이동 이력)", file_version)
+    if df_events is None:
+        raise TransientLoadError("로트 이동 이벤트를 만들지 못했습니다.")
+    # 기간 내내 변동 없이 보유한 로트도 수명/회전에 들어가도록, 기간 직전 시트의 로트 잔량을 시작 상태로 씁니다.
+    opening = load_opening_lots(_drive_service, file_id_sm, start_date, "SM재고현황 (로트 이동 이력)", file_version)
+    if opening is None:
+        raise TransientLoadError("기초 로트 스냅샷을 읽지 못했습니다.")
+    opening_date, df_opening_lots = opening
+    df_lifecycle = summarize_lot_lifecycles(df_events, as_of_date=end_date, df_opening_lots=df_opening_lots, opening_date=opening_date)
+    return df_events, df_lifecycle, summarize_product_turnover(df_lifecycle)
+
+def warm_daily_check_datasets(_drive_service):
+    """갱신기 작업: 최신 날짜 시트의 점검 데이터와 기본 기간의 로트 이동 이력을 미리 만듭니다."""
+    latest_sheet_name = find_latest_sheet(_drive_service, SM_FILE_ID)
+    if not latest_sheet_name: return
+    load_sm_sheet_for_daily_check(_drive_service, SM_FILE_ID, latest_sheet_name)
+    lot_end_date = datetime.datetime.strptime(latest_sheet_name, "%Y%m%d").date()
+    load_lot_event_views(_drive_service, SM_FILE_ID, lot_end_date - datetime.timedelta(days=LOT_EVENT_DEFAULT_DAYS - 1), lot_end_date)
+
+# 새 파일 버전이 게시되기 전에 기본 화면의 데이터가 준비되도록 갱신기에 등록합니다 (사이드바 신선도 표시 포함).
+attach_page_to_cache_warmer(drive_service, "page_daily_check", [(SM_FILE_ID, warm_daily_check_datasets)])
 
 # --- Streamlit 페이지 구성 ---
 # st.set_page_config(page_title="일일 재고 확인", layout="wide") # 메인 앱에서 한번만 호출
@@ -183,7 +233,7 @@ if latest_sheet_name:
 
     if df_sm_latest_raw is not None and not df_sm_latest_raw.empty:
         st.success(f"데이터 로드 및 기본 처리 완료: {len(df_sm_latest_raw)} 행")
-        # st.info(f"메모리 사용량: {df_sm_latest_raw.memory_usage(deep=True).sum() / (1024*1024):.2f} MB") # 디버깅용 메모리 사용량 확인
+        render_memory_debug_panel({f"SM재고현황 ({latest_sheet_name})": df_sm_latest_raw}) # 사이드바 디버그 패널 (체크 시 표시)
         st.markdown("---")
         col1, col2 = st.columns([1, 2]) # 레이아웃 비율
 
@@ -193,12 +243,12 @@ if latest_sheet_name:
                 # 소비기한이 비어있거나, 'nan', 'NaT', 'None', 'nat' 문자열이거나, pd.isna로 True인 경우 필터링
                 missing_exp_date_filter = df_sm_latest_raw[EXP_DATE_COL].astype(str).str.strip().isin(['', 'nan', 'NaT', 'None', 'nat']) | \
                                           pd.isna(df_sm_latest_raw[EXP_DATE_COL])
-                # .copy()는 SettingWithCopyWarning을 피하고 이후 수정에 안전하지만, 큰 데이터프레임에서는 메모리를 추가로 사용합니다.
-                missing_items = df_sm_latest_raw[missing_exp_date_filter].copy()
-                st.subheader(f"미입력 ({len(missing_items)} 건)")
-                if not missing_items.empty:
+                # 전체를 복사하지 않고 마스크에 해당하는 행의 표시 컬럼만 한 번에 잘라냅니다.
+                missing_count = int(missing_exp_date_filter.sum())
+                st.subheader(f"미입력 ({missing_count} 건)")
+                if missing_count > 0:
                     display_cols_missing = [RECEIPT_NUMBER_COL, PROD_CODE_COL, PROD_NAME_COL, RECEIPT_DATE_COL, BRANCH_COL]
-                    missing_items_display = missing_items[[col for col in display_cols_missing if col in missing_items.columns]].copy()
+                    missing_items_display = take_rows(df_sm_latest_raw, missing_exp_date_filter, display_cols_missing)
                     if RECEIPT_DATE_COL in missing_items_display:
                         missing_items_display[RECEIPT_DATE_COL] = pd.to_datetime(missing_items_display[RECEIPT_DATE_COL]).dt.strftime('%Y-%m-%d').fillna('')
                     missing_items_display.rename(columns={RECEIPT_NUMBER_COL: '입고번호'}, inplace=True)
@@ -216,27 +266,26 @@ if latest_sheet_name:
                 if REMAINING_DAYS_COL not in df_sm_latest_raw.columns:
                     st.warning(f"'{REMAINING_DAYS_COL}' 컬럼이 없어 소비기한 임박 품목을 확인할 수 없습니다.")
                 else:
-                    # .copy() 사용: 원본 df_sm_latest_raw 변경 방지
-                    df_check = df_sm_latest_raw.dropna(subset=[REMAINING_DAYS_COL]).copy()
-                    df_check[REMAINING_DAYS_COL] = pd.to_numeric(df_check[REMAINING_DAYS_COL], errors='coerce')
-                    df_check.dropna(subset=[REMAINING_DAYS_COL], inplace=True) 
-                    
-                    if not df_check.empty:
-                        df_check[REMAINING_DAYS_COL] = df_check[REMAINING_DAYS_COL].astype(int)
-
-                        cond1 = (df_check[PROD_NAME_COL].str.contains(KEYWORD_REFRIGERATED, na=False)) & \
-                                (df_check[REMAINING_DAYS_COL] <= THRESHOLD_REFRIGERATED)
-                        cond2 = (~df_check[PROD_NAME_COL].str.contains(KEYWORD_REFRIGERATED, na=False)) & \
-                                (df_check[REMAINING_DAYS_COL] <= THRESHOLD_OTHER)
-                        # .copy() 사용
-                        imminent_items = df_check[cond1 | cond2].copy()
-
-                        st.subheader(f"임박 ({len(imminent_items)} 건)")
+                    # 원본(공유 데이터)은 복사하지 않고 마스크로만 조건을 계산한 뒤, 해당 행의 표시 컬럼만 잘라냅니다.
+                    remaining_days = pd.to_numeric(df_sm_latest_raw[REMAINING_DAYS_COL], errors='coerce')
+                    has_remaining_days = remaining_days.notna()
+
+                    if has_remaining_days.any():
+                        remaining_days = np.trunc(remaining_days) # 기존 astype(int)와 같이 소수점 이하 버림
+                        is_refrigerated = df_sm_latest_raw[PROD_NAME_COL].str.contains(KEYWORD_REFRIGERATED, na=False)
+                        cond1 = is_refrigerated & (remaining_days <= THRESHOLD_REFRIGERATED)
+                        cond2 = ~is_refrigerated & (remaining_days <= THRESHOLD_OTHER)
+                        imminent_mask = combine_masks(has_remaining_days, cond1 | cond2)
+                        imminent_count = int(imminent_mask.sum())
+
+                        st.subheader(f"임박 ({imminent_count} 건)")
                         st.markdown(f"- `{KEYWORD_REFRIGERATED}` 포함: **{THRESHOLD_REFRIGERATED}일 이하** / 나머지: **{THRESHOLD_OTHER}일 이하**")
 
-                        if not imminent_items.empty:
+                        if imminent_count > 0:
                             display_cols_imminent = [PROD_CODE_COL, PROD_NAME_COL, BRANCH_COL, REMAINING_DAYS_COL, EXP_DATE_COL, QTY_COL, WGT_COL]
-                            imminent_items_display = imminent_items[[col for col in display_cols_imminent if col in imminent_items.columns]].sort_values(by=REMAINING_DAYS_COL)
+                            imminent_items_display = take_rows(df_sm_latest_raw, imminent_mask, display_cols_imminent)
+                            imminent_items_display[REMAINING_DAYS_COL] = remaining_days[imminent_mask].astype(int).to_numpy()
+                            imminent_items_display = imminent_items_display.sort_values(by=REMAINING_DAYS_COL)
                             
                             def highlight_refrigerated_text_styler(val):
                                 style = 'color: red; font-weight: bold;' if isinstance(val, str) and KEYWORD_REFRIGERATED in val else ''
@@ -268,11 +317,9 @@ if latest_sheet_name:
             if RECEIPT_DATE_COL not in df_sm_latest_raw.columns:
                 st.warning(f"'{RECEIPT_DATE_COL}' 컬럼이 없어 장기 재고 현황을 확인할 수 없습니다.")
             else:
-                # .copy() 사용
-                df_long_term_check = df_sm_latest_raw.copy()
-                df_long_term_check = df_long_term_check[pd.notna(df_long_term_check[RECEIPT_DATE_COL])]
+                has_receipt_date = df_sm_latest_raw[RECEIPT_DATE_COL].notna()
 
-                if not df_long_term_check.empty:
+                if has_receipt_date.any():
                     # today_dt = datetime.date.today() # 이 방식은 Streamlit 캐싱과 함께 실행 시점에 따라 기준일이 달라질 수 있음
                     # 시트 이름 (YYYYMMDD)을 기준으로 오늘 날짜를 설정하는 것이 더 일관적일 수 있습니다.
                     # 여기서는 기존 로직을 유지하되, 매우 큰 시간차가 있는 과거 데이터 조회 시 인지 필요.
@@ -283,37 +330,37 @@ if latest_sheet_name:
                     today_dt = datetime.date.today() # 현재 날짜 기준
                     three_months_ago = today_dt - relativedelta(months=3)
                     
-                    # .copy() 사용
-                    long_term_items = df_long_term_check[
-                        (df_long_term_check[RECEIPT_DATE_COL].dt.date < three_months_ago) & 
-                        ((df_long_term_check[QTY_COL] > 0) | (df_long_term_check[WGT_COL] > 0))
-                    ].copy()
-
-                    st.subheader(f"3개월 이상 경과 재고 ({len(long_term_items)} 건)")
-                    if not long_term_items.empty:
+                    # 원본 전체를 복사하지 않고 조건 마스크에 해당하는 행의 표시 컬럼만 잘라냅니다.
+                    long_term_mask = combine_masks(
+                        has_receipt_date,
+                        df_sm_latest_raw[RECEIPT_DATE_COL] < pd.Timestamp(three_months_ago),
+                        (df_sm_latest_raw[QTY_COL] > 0) | (df_sm_latest_raw[WGT_COL] > 0)
+                    )
+                    long_term_count = int(long_term_mask.sum())
+
+                    st.subheader(f"3개월 이상 경과 재고 ({long_term_count} 건)")
+                    if long_term_count > 0:
                         display_cols_long_term = [RECEIPT_NUMBER_COL, PROD_CODE_COL, PROD_NAME_COL, BRANCH_COL, RECEIPT_DATE_COL, 
                                                   QTY_COL, WGT_COL, INITIAL_QTY_BOX_COL, INITIAL_QTY_KG_COL] 
                         
-                        long_term_items_display = long_term_items[[col for col in display_cols_long_term if col in long_term_items.columns]].sort_values(by=RECEIPT_DATE_COL)
-                        
-                        if RECEIPT_DATE_COL in long_term_items_display:
-                            long_term_items_display[RECEIPT_DATE_COL] = pd.to_datetime(long_term_items_display[RECEIPT_DATE_COL]).dt.strftime('%Y-%m-%d').fillna('')
+                        long_term_items = take_rows(df_sm_latest_raw, long_term_mask, display_cols_long_term)
                         
-                        long_term_items_display.rename(columns={
-                            INITIAL_QTY_BOX_COL: '입고당시(Box)',
-                            INITIAL_QTY_KG_COL: '입고당시(Kg)',
-                            RECEIPT_NUMBER_COL: '입고번호' 
-                        }, inplace=True)
-                        
-                        st.dataframe(
-                            long_term_items_display.style.format({
+                        # 입고일자 순 정렬 순서만 만들고, 날짜 문자열 변환/이름 변경/서식은 현재 페이지 행에만 적용합니다.
+                        render_paginated_table(
+                            long_term_items, key="long_term_stock_table",
+                            sort_by=RECEIPT_DATE_COL, date_cols=[RECEIPT_DATE_COL],
+                            rename={
+                                INITIAL_QTY_BOX_COL: '입고당시(Box)',
+                                INITIAL_QTY_KG_COL: '입고당시(Kg)',
+                                RECEIPT_NUMBER_COL: '입고번호' 
+                            },
+                            formatters={
                                 WGT_COL: "{:,.2f}", 
                                 QTY_COL: "{:,.0f}", 
                                 '입고당시(Box)': "{:,.0f}",
                                 '입고당시(Kg)': "{:,.2f}"
-                            }),
-                            hide_index=True,
-                            use_container_width=True
+                            },
+                            export_name=f"장기재고_{latest_sheet_name}"
                         )
                     else:
                         st.success("✅ 입고 3개월 경과 재고 없음")
@@ -330,3 +377,52 @@ if latest_sheet_name:
 else:
     st.error(f"SM재고현황 파일 (ID: {SM_FILE_ID})에서 최신 날짜 시트를 찾을 수 없습니다.")
 
+# --- 입고번호(로트) 이동 이력 ---
+if latest_sheet_name:
+    st.markdown("---")
+    st.header("🔄 입고번호(로트) 이동 이력")
+    st.markdown("<small>연속한 날짜 시트를 입고번호·상품코드별로 비교한 이벤트(입고/부분출고/소진/수량정정)입니다. 새 시트가 추가되면 직전 시트와의 비교만 새로 계산합니다.</small>", unsafe_allow_html=True)
+    lot_end_date = datetime.datetime.strptime(latest_sheet_name, "%Y%m%d").date()
+    lot_days = st.number_input("조회 기간 (일)", min_value=1, max_value=366, value=LOT_EVENT_DEFAULT_DAYS, step=1, key="lot_event_days")
+    lot_start_date = lot_end_date - datetime.timedelta(days=int(lot_days) - 1)
+
+    with st.spinner("로트 이동 이력을 계산하는 중입니다..."):
+        lot_views = load_lot_event_views(drive_service, SM_FILE_ID, lot_start_date, lot_end_date)
+    if lot_views is None:
+        st.error("로트 이동 이력을 만들지 못했습니다.")
+    else:
+        df_lot_events, df_lot_lifecycle, df_lot_turnover = lot_views
+        if df_lot_events.empty:
+            st.info(f"{lot_start_date.strftime('%Y-%m-%d')} ~ {lot_end_date.strftime('%Y-%m-%d')} 기간에 로트 이동 이벤트가 없습니다.")
+        else:
+            event_counts = df_lot_events[EVENT_TYPE_COL].value_counts()
+            count_cols = st.columns(len(EVENT_TYPES))
+            for count_col, event_type in zip(count_cols, EVENT_TYPES):
+                count_col.metric(event_type, f"{int(event_counts.get(event_type, 0)):,}")
+            st.bar_chart(df_lot_events.groupby([EVENT_DATE_COL, EVENT_TYPE_COL]).size().unstack(fill_value=0))
+
+            selected_event_types = st.multiselect("표시할 이벤트", EVENT_TYPES, default=[t for t in EVENT_TYPES if t != EVENT_OPENING], key="lot_event_types")
+            render_paginated_table(
+                df_lot_events[df_lot_events[EVENT_TYPE_COL].isin(selected_event_types)], key="lot_event_table",
+                sort_by=EVENT_DATE_COL, ascending=False, date_cols=[EVENT_DATE_COL, EVENT_PREV_DATE_COL, LOT_RECEIPT_DATE_COL],
+                rename={RECEIPT_NUMBER_COL: '입고번호'},
+                formatters={'변동(박스)': "{:,.0f}", '변동(Kg)': "{:,.2f}", QTY_COL: "{:,.0f}", WGT_COL: "{:,.2f}"},
+                export_name=f"로트이동이력_{lot_start_date.strftime('%Y%m%d')}_{lot_end_date.strftime('%Y%m%d')}"
+            )
+
+        if not df_lot_lifecycle.empty:
+            st.caption("로트 수명/품목별 회전은 기간 직전 시트에 있던 로트와 기간 안에 변동이 있던 로트를 모두 포함합니다 (기간 내내 변동 없는 보유 로트 포함).")
+            with st.expander(f"로트 수명 ({len(df_lot_lifecycle):,} 로트)", expanded=False):
+                render_paginated_table(
+                    df_lot_lifecycle, key="lot_lifecycle_table", sort_by=LIFECYCLE_DAYS_COL, ascending=False,
+                    date_cols=[LOT_RECEIPT_DATE_COL, LIFECYCLE_FIRST_SEEN_COL, LIFECYCLE_LAST_SEEN_COL, LIFECYCLE_EMPTIED_COL],
+                    rename={RECEIPT_NUMBER_COL: '입고번호'},
+                    formatters={QTY_COL: "{:,.0f}", WGT_COL: "{:,.2f}", '최초 잔량(박스)': "{:,.0f}", '최초 잔량(Kg)': "{:,.2f}"},
+                    export_name=f"로트수명_{lot_end_date.strftime('%Y%m%d')}"
+                )
+            with st.expander(f"품목별 회전 ({len(df_lot_turnover):,} 품목)", expanded=False):
+                render_paginated_table(
+                    df_lot_turnover, key="lot_turnover_table", sort_by=TURNOVER_EMPTIED_LOTS_COL, ascending=False,
+                    formatters={TURNOVER_AVG_DAYS_COL: "{:,.1f}", TURNOVER_OPEN_AGE_COL: "{:,.1f}"},
+                    export_name=f"품목별로트회전_{lot_end_date.strftime('%Y%m%d')}"
+                )
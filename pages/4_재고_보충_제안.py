@@ -9,7 +9,13 @@ import traceback
 import plotly.express as px # 그래프 생성을 위해 plotly 추가
 
 # common_utils.py 에서 공통 유틸리티 함수 가져오기
-from common_utils import download_excel_from_drive_as_bytes, get_all_available_sheet_dates_from_bytes
+from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version, get_available_sheet_dates, read_excel_sheet
+from cache_warmer import attach_page_to_cache_warmer
+from sheet_schemas import SALES_LOG_SCHEMA, SM_SNAPSHOT_SCHEMA
+from sm_history import get_sm_product_history
+from log_store import get_log_max_date, load_log_rows
+from search_index import SearchIndex
+from chart_utils import downsample_frame
 
 # --- Google Drive 파일 ID 정의 ---
 SALES_FILE_ID = "1h-V7kIoInXgGLll7YBW5V_uZdF3Q1PdY"  # 매출내역 파일 ID
@@ -22,7 +28,7 @@ SALES_DATA_SHEET_NAME = 's-list' # 매출내역 파일의 시트 이름
 # 컬럼명 상수
 SALES_DATE_COL = '매출일자'
 SALES_PROD_CODE_COL = '상품코드'
-SALES_PROD_NAME_COL = '상  품  명' # 원본 엑셀의 컬럼명에 맞춤 (공백 주의)
+SALES_PROD_NAME_COL = '상품명' # 원본 엑셀의 '상  품  명' 컬럼 (s-list 스키마가 표준 이름으로 바꿔 읽음)
 SALES_QTY_BOX_COL = '수량(Box)'
 SALES_QTY_KG_COL = '수량(Kg)'
 SALES_LOCATION_COL = '지점명'
@@ -33,6 +39,8 @@ CURRENT_STOCK_QTY_COL = '잔량(박스)'
 CURRENT_STOCK_WGT_COL = '잔량(Kg)'
 CURRENT_STOCK_LOCATION_COL = '지점명'
 
+PRODUCT_SEARCH_LIMIT = 50 # 품목 검색 결과 최대 표시 수 (순위 순)
+
 # --- Google Drive 서비스 객체 가져오기 ---
 retrieved_drive_service = st.session_state.get('drive_service')
 page_title_for_debug = "재고 보충 제안 페이지"
@@ -44,7 +52,6 @@ else:
 
 drive_service = retrieved_drive_service
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def load_sales_history_and_filter_3m(_drive_service, file_id_sales, sheet_name, num_months=3):
     """
     지정된 Google Drive 파일/시트에서 전체 매출 데이터를 로드하고,
@@ -52,19 +59,43 @@ def load_sales_history_and_filter_3m(_drive_service, file_id_sales, sheet_name,
     [상품코드, 상품명, 지점명]별 총 출고량 및 매출 발생일 수를 반환합니다.
     num_months 파라미터는 월평균 계산의 기준이 됩니다.
     """
-    if _drive_service is None:
-        st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (매출 데이터 로딩)")
+    file_version = get_drive_file_version(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
+    if file_version is None:
+        return pd.DataFrame()
+    try:
+        return _load_sales_history_and_filter_3m_for_version(_drive_service, file_id_sales, sheet_name, num_months, file_version)
+    except TransientLoadError:
+        return pd.DataFrame() # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
+        st.error(traceback.format_exc())
         return pd.DataFrame()
 
-    file_bytes_sales = download_excel_from_drive_as_bytes(_drive_service, file_id_sales, f"매출내역 ({sheet_name})")
-    if file_bytes_sales is None:
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sales_history_and_filter_3m_for_version(_drive_service, file_id_sales, sheet_name, num_months, file_version):
+    """
+    load_sales_history_and_filter_3m의 실제 로딩 함수입니다. 캐시 키로 쓴 file_version의 로그 행을 읽습니다.
+    로그를 읽지 못하면 TransientLoadError를 올려 보내 빈 결과를 캐시하지 않습니다.
+    """
+    if _drive_service is None:
+        st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (매출 데이터 로딩)")
         return pd.DataFrame()
 
     try:
         required_cols = [SALES_DATE_COL, SALES_PROD_CODE_COL, SALES_PROD_NAME_COL,
                          SALES_QTY_BOX_COL, SALES_QTY_KG_COL, SALES_LOCATION_COL]
 
-        df = pd.read_excel(file_bytes_sales, sheet_name=sheet_name)
+        # 마지막 매출일자는 log_store의 워터마크를 사용하고, 분석 기간(90일)에 걸친 월 파티션만 읽습니다.
+        max_log_date = get_log_max_date(_drive_service, file_id_sales, sheet_name, SALES_DATE_COL, file_name_for_error_msg=f"매출내역 ({sheet_name})", schema=SALES_LOG_SCHEMA.name, file_version=file_version)
+        if max_log_date is None:
+            # 읽기 실패와 날짜 없음을 구분할 수 없으므로 결과를 캐시하지 않습니다.
+            st.warning(f"매출내역 파일 (ID: {file_id_sales}, 시트: {sheet_name})에 유효한 날짜 데이터가 없습니다.")
+            raise TransientLoadError(f"매출내역 ({sheet_name}) 워터마크 없음")
+        df = load_log_rows(_drive_service, file_id_sales, sheet_name, SALES_DATE_COL,
+                           max_log_date - datetime.timedelta(days=89), max_log_date,
+                           file_name_for_error_msg=f"매출내역 ({sheet_name})", schema=SALES_LOG_SCHEMA.name, file_version=file_version)
+        if df is None:
+            raise TransientLoadError(f"매출내역 ({sheet_name}) 읽기 실패")
 
         if not all(col in df.columns for col in required_cols):
             missing_cols = [col for col in required_cols if col not in df.columns]
@@ -79,11 +110,12 @@ def load_sales_history_and_filter_3m(_drive_service, file_id_sales, sheet_name,
             st.warning(f"매출내역 파일 (ID: {file_id_sales}, 시트: {sheet_name})에 유효한 날짜 데이터가 없습니다.")
             return pd.DataFrame()
 
-        df[SALES_PROD_CODE_COL] = df[SALES_PROD_CODE_COL].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        df[SALES_PROD_NAME_COL] = df[SALES_PROD_NAME_COL].astype(str).str.strip()
-        df[SALES_LOCATION_COL] = df[SALES_LOCATION_COL].astype(str).str.strip()
-        df[SALES_QTY_BOX_COL] = pd.to_numeric(df[SALES_QTY_BOX_COL], errors='coerce').fillna(0)
-        df[SALES_QTY_KG_COL] = pd.to_numeric(df[SALES_QTY_KG_COL], errors='coerce').fillna(0)
+        # 상품코드/상품명/지점명은 스키마로 읽어 이미 공백이 제거된 문자열이고 ('.0' 없음), 수량은 숫자입니다.
+        df[SALES_PROD_CODE_COL] = df[SALES_PROD_CODE_COL].fillna('')
+        df[SALES_PROD_NAME_COL] = df[SALES_PROD_NAME_COL].fillna('')
+        df[SALES_LOCATION_COL] = df[SALES_LOCATION_COL].fillna('')
+        df[SALES_QTY_BOX_COL] = df[SALES_QTY_BOX_COL].fillna(0)
+        df[SALES_QTY_KG_COL] = df[SALES_QTY_KG_COL].fillna(0)
 
         max_sales_date = df[SALES_DATE_COL].max()
         if pd.isna(max_sales_date):
@@ -119,38 +151,44 @@ def load_sales_history_and_filter_3m(_drive_service, file_id_sales, sheet_name,
         else:
             st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드 중 값 오류: {ve}")
         return pd.DataFrame()
+
+def load_current_stock_data(_drive_service, file_id_sm):
+    """SM재고현황 파일의 최신 날짜 시트에서 현재고 데이터를 로드합니다."""
+    file_version = get_drive_file_version(_drive_service, file_id_sm, "SM재고현황 (현재고 조회용)")
+    if file_version is None:
+        return pd.DataFrame()
+    try:
+        return _load_current_stock_data_for_version(_drive_service, file_id_sm, file_version)
+    except TransientLoadError:
+        return pd.DataFrame() # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
     except Exception as e:
-        st.error(f"매출 데이터 (ID: {file_id_sales}, 시트: {sheet_name}) 로드/처리 중 예상 못한 오류: {e}")
+        st.error(f"현재고 데이터 (ID: {file_id_sm}) 로드/처리 중 예외 발생: {e}")
         st.error(traceback.format_exc())
         return pd.DataFrame()
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
-def load_current_stock_data(_drive_service, file_id_sm):
-    """SM재고현황 파일의 최신 날짜 시트에서 현재고 데이터를 로드합니다."""
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_current_stock_data_for_version(_drive_service, file_id_sm, file_version):
+    """load_current_stock_data의 실제 로딩 함수입니다. 시트 목록/시트를 읽지 못하면 TransientLoadError를 올려 보냅니다."""
     if _drive_service is None:
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (현재고 데이터 로딩)")
         return pd.DataFrame()
 
-    sm_file_bytes = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, "SM재고현황 (현재고 조회용)")
-    if not sm_file_bytes:
-        return pd.DataFrame()
-
-    available_sm_dates = get_all_available_sheet_dates_from_bytes(sm_file_bytes, "SM재고현황 (현재고 조회용)")
+    available_sm_dates = get_available_sheet_dates(_drive_service, file_id_sm, "SM재고현황 (현재고 조회용)")
     if not available_sm_dates:
         st.warning(f"SM재고현황 파일 (ID: {file_id_sm})에서 사용 가능한 재고 데이터 시트를 찾을 수 없습니다.")
-        return pd.DataFrame()
+        raise TransientLoadError("SM재고현황 시트 목록 없음")
 
     latest_date_obj = available_sm_dates[0]
     latest_date_str = latest_date_obj.strftime("%Y%m%d")
     st.info(f"현재고 기준일: {latest_date_obj.strftime('%Y-%m-%d')} (시트: {latest_date_str})")
 
     try:
-        sm_file_bytes.seek(0)
-        df_stock_raw = pd.read_excel(sm_file_bytes, sheet_name=latest_date_str)
+        df_stock_raw = read_excel_sheet(_drive_service, file_id_sm, latest_date_str, "SM재고현황 (현재고 조회용)", schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+        if df_stock_raw is None:
+            raise TransientLoadError(f"SM재고현황 ({latest_date_str}) 다운로드 실패")
 
         required_stock_cols = [CURRENT_STOCK_PROD_CODE_COL, CURRENT_STOCK_PROD_NAME_COL,
                                CURRENT_STOCK_QTY_COL, CURRENT_STOCK_WGT_COL, CURRENT_STOCK_LOCATION_COL]
-        df_stock_raw.rename(columns={'상 품 명': '상품명'}, inplace=True)
 
         if not all(col in df_stock_raw.columns for col in required_stock_cols):
             missing = [col for col in required_stock_cols if col not in df_stock_raw.columns]
@@ -158,11 +196,12 @@ def load_current_stock_data(_drive_service, file_id_sm):
             st.error("코드 상단의 현재고 관련 상수(CURRENT_STOCK_..._COL)와 실제 엑셀 파일의 컬럼명을 확인해주세요.")
             return pd.DataFrame()
 
-        df_stock_raw[CURRENT_STOCK_PROD_CODE_COL] = df_stock_raw[CURRENT_STOCK_PROD_CODE_COL].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        df_stock_raw[CURRENT_STOCK_PROD_NAME_COL] = df_stock_raw[CURRENT_STOCK_PROD_NAME_COL].astype(str).str.strip()
-        df_stock_raw[CURRENT_STOCK_LOCATION_COL] = df_stock_raw[CURRENT_STOCK_LOCATION_COL].astype(str).str.strip()
-        df_stock_raw[CURRENT_STOCK_QTY_COL] = pd.to_numeric(df_stock_raw[CURRENT_STOCK_QTY_COL], errors='coerce').fillna(0)
-        df_stock_raw[CURRENT_STOCK_WGT_COL] = pd.to_numeric(df_stock_raw[CURRENT_STOCK_WGT_COL], errors='coerce').fillna(0)
+        # 상품코드/상품명/지점명은 스키마로 읽어 이미 공백이 제거된 문자열이고 ('.0' 없음), 잔량은 숫자입니다.
+        df_stock_raw[CURRENT_STOCK_PROD_CODE_COL] = df_stock_raw[CURRENT_STOCK_PROD_CODE_COL].fillna('')
+        df_stock_raw[CURRENT_STOCK_PROD_NAME_COL] = df_stock_raw[CURRENT_STOCK_PROD_NAME_COL].fillna('')
+        df_stock_raw[CURRENT_STOCK_LOCATION_COL] = df_stock_raw[CURRENT_STOCK_LOCATION_COL].fillna('')
+        df_stock_raw[CURRENT_STOCK_QTY_COL] = df_stock_raw[CURRENT_STOCK_QTY_COL].fillna(0)
+        df_stock_raw[CURRENT_STOCK_WGT_COL] = df_stock_raw[CURRENT_STOCK_WGT_COL].fillna(0)
 
         current_stock_by_item_loc = df_stock_raw.groupby(
             [CURRENT_STOCK_PROD_CODE_COL, CURRENT_STOCK_PROD_NAME_COL, CURRENT_STOCK_LOCATION_COL],
@@ -182,79 +221,87 @@ def load_current_stock_data(_drive_service, file_id_sm):
         else:
             st.error(f"현재고 데이터 (ID: {file_id_sm}, 시트: {latest_date_str}) 로드 중 값 오류: {ve}")
         return pd.DataFrame()
-    except Exception as e:
-        st.error(f"현재고 데이터 (ID: {file_id_sm}, 시트: {latest_date_str}) 로드/처리 중 예외 발생: {e}")
-        st.error(traceback.format_exc())
-        return pd.DataFrame()
 
 # --- 재고 추이 분석을 위한 함수들 ---
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def find_matching_products(_drive_service, file_id_sm, search_term):
     """가장 최신 재고 시트에서 검색어와 일치하는 모든 품목 리스트를 찾습니다."""
-    if _drive_service is None: return []
-    sm_file_bytes = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, "SM재고현황 (품목 검색용)")
-    if not sm_file_bytes: return []
+    file_version = get_drive_file_version(_drive_service, file_id_sm, "SM재고현황 (품목 검색용)")
+    if file_version is None:
+        return []
+    try:
+        product_search = _load_product_search_index_for_version(_drive_service, file_id_sm, file_version)
+    except TransientLoadError:
+        return [] # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"품목 검색 색인 (ID: {file_id_sm}) 생성 중 오류: {e}")
+        return []
+    if product_search is None:
+        return []
+    df_products, code_index, name_index = product_search
 
-    available_sm_dates = get_all_available_sheet_dates_from_bytes(sm_file_bytes, "SM재고현황 (품목 검색용)")
-    if not available_sm_dates: return []
+    # 숫자만 입력하면 상품코드 일치(없으면 상품코드 앞자리 일치), 그 외에는 상품명 검색(부분 일치/초성/유사)의 순위대로 찾습니다.
+    if search_term.isdigit():
+        match_rows = code_index.rows_for_ids(code_index.exact_ids(search_term))
+        if not len(match_rows):
+            match_rows = code_index.match_rows(search_term, prefix=True)
+    else:
+        match_rows = name_index.search_rows(search_term, limit=PRODUCT_SEARCH_LIMIT)
+    return list(df_products.iloc[match_rows].itertuples(index=False, name=None))
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_product_search_index_for_version(_drive_service, file_id_sm, file_version):
+    """
+    최신 재고 시트의 고유 (상품코드, 상품명) 목록과 상품코드/상품명 검색 색인을 만듭니다.
+    파일 버전별로 한 번만 만들며, 검색어가 바뀌어도 시트를 다시 읽지 않습니다.
+    시트 목록/시트를 읽지 못하면 TransientLoadError를 올려 보내 실패를 캐시하지 않습니다.
+    """
+    if _drive_service is None: return None
+    available_sm_dates = get_available_sheet_dates(_drive_service, file_id_sm, "SM재고현황 (품목 검색용)")
+    if not available_sm_dates:
+        raise TransientLoadError("SM재고현황 시트 목록 없음")
     
     latest_date_str = available_sm_dates[0].strftime("%Y%m%d")
-    try:
-        sm_file_bytes.seek(0)
-        df = pd.read_excel(sm_file_bytes, sheet_name=latest_date_str)
-        df.rename(columns={'상 품 명': '상품명'}, inplace=True) # 컬럼명 오타 대응
+    # '상 품 명' 같은 컬럼명 표기 차이는 스키마의 별칭으로 처리됩니다.
+    df = read_excel_sheet(_drive_service, file_id_sm, latest_date_str, "SM재고현황 (품목 검색용)", schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+    if df is None:
+        raise TransientLoadError(f"SM재고현황 ({latest_date_str}) 다운로드 실패")
+
+    df_products = pd.DataFrame({
+        CURRENT_STOCK_PROD_CODE_COL: df[CURRENT_STOCK_PROD_CODE_COL].fillna(''),
+        CURRENT_STOCK_PROD_NAME_COL: df[CURRENT_STOCK_PROD_NAME_COL].fillna(''),
+    }).drop_duplicates(ignore_index=True)
+    return (df_products,
+            SearchIndex(df_products[CURRENT_STOCK_PROD_CODE_COL]),
+            SearchIndex(df_products[CURRENT_STOCK_PROD_NAME_COL]))
 
-        df[CURRENT_STOCK_PROD_CODE_COL] = df[CURRENT_STOCK_PROD_CODE_COL].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        df[CURRENT_STOCK_PROD_NAME_COL] = df[CURRENT_STOCK_PROD_NAME_COL].astype(str).str.strip()
-        
-        if search_term.isdigit():
-            matches = df[df[CURRENT_STOCK_PROD_CODE_COL] == search_term]
-        else:
-            matches = df[df[CURRENT_STOCK_PROD_NAME_COL].str.contains(search_term, na=False)]
-        
-        if matches.empty:
-            return []
-            
-        unique_products = matches[[CURRENT_STOCK_PROD_CODE_COL, CURRENT_STOCK_PROD_NAME_COL]].drop_duplicates().values.tolist()
-        return [tuple(prod) for prod in unique_products]
-    except Exception:
-        return []
-
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def get_stock_history_for_item_by_code(_drive_service, file_id_sm, product_code):
-    """특정 '상품코드'를 기준으로 90일간의 재고 추이를 가져옵니다."""
+    """
+    특정 '상품코드'를 기준으로 90일간의 재고 추이를 가져옵니다.
+    일자별 시트는 sm_history 이력 저장소에 한 번씩만 변환되어 있으므로, 조회는 품목 색인에서 잘라내기만 합니다.
+    """
     if not _drive_service or not product_code:
         return pd.DataFrame()
+    today = datetime.datetime.now().date()
+    ninety_days_ago = today - datetime.timedelta(days=90)
+    return get_sm_product_history(_drive_service, file_id_sm, product_code, ninety_days_ago, today, "SM재고현황 (재고 추이 조회용)")
 
-    sm_file_bytes = download_excel_from_drive_as_bytes(_drive_service, file_id_sm, "SM재고현황 (재고 추이 조회용)")
-    if not sm_file_bytes: return pd.DataFrame()
-    
-    try:
-        xls = pd.ExcelFile(sm_file_bytes)
-        all_sheets = xls.sheet_names
-        sheet_dates = sorted([datetime.datetime.strptime(s, "%Y%m%d") for s in all_sheets if s.isdigit()], reverse=True)
-        
-        today = datetime.datetime.now().date()
-        ninety_days_ago = today - datetime.timedelta(days=90)
-        relevant_sheets = [dt.strftime("%Y%m%d") for dt in sheet_dates if ninety_days_ago <= dt.date() <= today]
-
-        history = []
-        for sheet_name in relevant_sheets:
-            df_stock_raw = pd.read_excel(xls, sheet_name=sheet_name)
-            df_stock_raw.rename(columns={'상 품 명': '상품명'}, inplace=True)
-            df_stock_raw[CURRENT_STOCK_PROD_CODE_COL] = df_stock_raw[CURRENT_STOCK_PROD_CODE_COL].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-            df_stock_raw[CURRENT_STOCK_QTY_COL] = pd.to_numeric(df_stock_raw[CURRENT_STOCK_QTY_COL], errors='coerce').fillna(0)
-            
-            filtered_df = df_stock_raw[df_stock_raw[CURRENT_STOCK_PROD_CODE_COL] == product_code]
-            total_stock = filtered_df[CURRENT_STOCK_QTY_COL].sum()
-            sheet_date = datetime.datetime.strptime(sheet_name, "%Y%m%d").date()
-            history.append({'일자': sheet_date, '재고량(박스)': total_stock})
-
-        if not history: return pd.DataFrame()
-        return pd.DataFrame(history).sort_values(by='일자').reset_index(drop=True)
-    except Exception:
-        return pd.DataFrame()
+
+def warm_replenishment_sales_datasets(_drive_service):
+    """갱신기 작업: 기본 분석 기간(3개월)의 매출 이력을 미리 만듭니다."""
+    load_sales_history_and_filter_3m(_drive_service, SALES_FILE_ID, SALES_DATA_SHEET_NAME, num_months=3)
+
+def warm_replenishment_stock_datasets(_drive_service):
+    """갱신기 작업: 현재고 표와 품목 검색 색인을 미리 만듭니다."""
+    load_current_stock_data(_drive_service, SM_FILE_ID)
+    file_version = get_drive_file_version(_drive_service, SM_FILE_ID, "SM재고현황 (품목 검색용)")
+    if file_version is not None:
+        _load_product_search_index_for_version(_drive_service, SM_FILE_ID, file_version)
+
+# 새 파일 버전이 게시되기 전에 기본 화면의 데이터가 준비되도록 갱신기에 등록합니다 (사이드바 신선도 표시 포함).
+attach_page_to_cache_warmer(drive_service, "page_replenishment", [
+    (SALES_FILE_ID, warm_replenishment_sales_datasets), (SM_FILE_ID, warm_replenishment_stock_datasets)
+])
 
 
 # --- Streamlit 페이지 UI 및 로직 ---
@@ -299,8 +346,6 @@ else:
             SALES_PROD_NAME_COL: '상품명',
             SALES_LOCATION_COL: '지점명'
         })
-        df_avg_monthly_sales_to_use['상품코드'] = df_avg_monthly_sales_to_use['상품코드'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        df_avg_monthly_sales_to_use['지점명'] = df_avg_monthly_sales_to_use['지점명'].astype(str).str.strip()
         df_avg_monthly_sales_to_use = df_avg_monthly_sales_to_use[['상품코드', '상품명', '지점명', '월평균 출고량(박스)', '월평균 출고량(Kg)', '월평균 출고일수']]
 
         df_current_stock_report = df_current_stock.rename(columns={
@@ -310,8 +355,6 @@ else:
             'CurrentQty': '잔량(박스)',
             'CurrentWgt': '잔량(Kg)'
         })
-        df_current_stock_report['상품코드'] = df_current_stock_report['상품코드'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        df_current_stock_report['지점명'] = df_current_stock_report['지점명'].astype(str).str.strip()
         df_current_stock_report = df_current_stock_report[['상품코드', '지점명', '상품명', '잔량(박스)', '잔량(Kg)']]
 
         df_report = pd.merge(
@@ -353,13 +396,6 @@ else:
             
             df_display = df_report_final.copy() 
 
-            if '상품코드' in df_display.columns:
-                try: 
-                    df_display['상품코드'] = df_display['상품코드'].astype(str).str.replace(r'\.0$', '', regex=True)
-                except Exception as e_strip:
-                    st.warning(f"상품코드 문자열 변환 중 경미한 오류: {e_strip}")
-                    df_display['상품코드'] = df_display['상품코드'].astype(str) 
-
             cols_to_make_int_for_display = ['월평균 출고량(박스)', '필요수량(박스)', '잔량(박스)']
             for col in cols_to_make_int_for_display:
                 if col in df_display.columns:
@@ -469,9 +505,9 @@ if st.session_state.selected_product:
         # 1. 1주일간의 일별 재고 변동 (표)
         st.subheader("🗓️ 최근 1주일 재고 변동")
         one_week_ago = datetime.datetime.now().date() - datetime.timedelta(days=7)
-        history_df['일자_dt'] = pd.to_datetime(history_df['일자']).dt.date
+        history_dates = pd.to_datetime(history_df['일자']).dt.date
         
-        weekly_df = history_df[history_df['일자_dt'] > one_week_ago].copy()
+        weekly_df = history_df[history_dates > one_week_ago].copy()
         weekly_df['일자'] = weekly_df['일자'].apply(lambda x: x.strftime('%Y-%m-%d (%a)'))
         
         st.dataframe(
@@ -482,7 +518,9 @@ if st.session_state.selected_product:
         # 2. 3개월 동안의 재고 변동 (그래프)
         st.subheader("📈 최근 3개월 재고 변동 그래프")
         
-        fig = px.line(history_df, x='일자', y='재고량(박스)', title=f'{p_name} 재고 변동 추이 (90일)', markers=True)
+        # 조회 기간이 길어져도 그래프 폭보다 많은 점은 보내지 않습니다 (90일 이하는 그대로).
+        history_chart_df = downsample_frame(history_df.set_index('일자')[['재고량(박스)']]).reset_index()
+        fig = px.line(history_chart_df, x='일자', y='재고량(박스)', title=f'{p_name} 재고 변동 추이 (90일)', markers=True)
         fig.update_layout(
             xaxis_title='일자',
             yaxis_title='재고량(박스)',
@@ -11,7 +11,10 @@ from datetime import datetime
 # common_utils.py 에서 공통 유틸리티 함수 가져오기
 # DATA_FOLDER는 더 이상 common_utils에서 가져오지 않음 (로컬 경로 의존성 제거)
 try:
-    from common_utils import download_excel_from_drive_as_bytes
+    from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version, read_excel_sheet
+    from sheet_schemas import CUSTOMER_SCHEMA
+    from search_index import MATCH_FUZZY, build_search_indexes
+    from cache_warmer import attach_page_to_cache_warmer
     COMMON_UTILS_LOADED = True
 except ImportError:
     st.error("오류: common_utils.py 파일을 찾을 수 없거나, 해당 파일에서 필요한 함수를 가져올 수 없습니다.")
@@ -31,6 +34,7 @@ CUSTOMER_DATA_FILE_ID = "1t1ORfuuHfW3VZ0yXTiIaaBgHzYF8MDwd" # 거래처주소업
 REQUIRED_EXCEL_COLS = ['거래처명', '주소', '위도', '경도', '담당자']
 MANAGER_COL = '담당자' 
 REFRIGERATED_WAREHOUSE_KEYWORD = "냉창" 
+CUSTOMER_SEARCH_COLS = ['거래처명', '주소'] # 사이드바 검색용 색인을 만드는 컬럼
 
 # --- Google Drive 서비스 객체 가져오기 ---
 retrieved_drive_service = st.session_state.get('drive_service')
@@ -53,9 +57,33 @@ def get_last_update_display():
         return f"업로드 처리: {st.session_state['map_data_last_upload_processed_time']} (현재 세션만 적용)"
     return "정보 없음 (또는 메인에서 로드 필요)"
 
-@st.cache_data(ttl=300, hash_funcs={"googleapiclient.discovery.Resource": lambda _: None})
 def load_customer_data(_drive_service, file_id_customer):
-    """거래처 데이터를 Google Drive에서 로드하고 기본 전처리를 수행합니다."""
+    """
+    거래처 데이터를 Google Drive에서 로드하고 기본 전처리를 수행합니다.
+    (DataFrame, {컬럼: SearchIndex}) 를 반환하며, 색인의 행 위치는 함께 반환된 DataFrame 기준입니다. 실패 시 (None, {}).
+    """
+    file_version = get_drive_file_version(_drive_service, file_id_customer, "거래처주소데이터")
+    if file_version is None:
+        return None, {}
+    try:
+        return _load_customer_data_for_version(_drive_service, file_id_customer, file_version)
+    except TransientLoadError:
+        return None, {} # 오류 메시지는 read_excel_sheet 함수에서 표시 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"거래처 데이터 (ID: {file_id_customer}) 로드 중 오류 발생: {e}")
+        return None, {}
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_customer_data_for_version(_drive_service, file_id_customer, file_version):
+    """
+    load_customer_data의 실제 로딩 함수입니다. 데이터와 검색 색인을 같은 버전의 한 캐시 항목으로 만들어
+    색인의 행 위치가 항상 같은 DataFrame을 가리키도록 합니다.
+    """
+    df = _read_customer_data(_drive_service, file_id_customer, file_version)
+    return df, build_search_indexes(df, CUSTOMER_SEARCH_COLS)
+
+def _read_customer_data(_drive_service, file_id_customer, file_version):
+    """거래처 시트를 읽어 전처리합니다. 다운로드 실패는 TransientLoadError로 올려 보내 캐시하지 않습니다."""
     if not COMMON_UTILS_LOADED: # common_utils 로드 실패 시
         st.error("필수 유틸리티(common_utils.py) 로드 실패로 데이터를 가져올 수 없습니다.")
         return None
@@ -64,52 +92,47 @@ def load_customer_data(_drive_service, file_id_customer):
         st.error("오류: Google Drive 서비스가 초기화되지 않았습니다. (거래처 데이터 로딩)")
         return None
 
-    file_bytes_customer = download_excel_from_drive_as_bytes(_drive_service, file_id_customer, "거래처주소데이터")
-    if file_bytes_customer is None:
-        return None # 오류 메시지는 download 함수에서 표시
-        
-    try:
-        df = pd.read_excel(file_bytes_customer)
-        
-        # 담당자 컬럼이 없어도 다른 필수 컬럼은 확인해야 함
-        temp_required_cols = [col for col in REQUIRED_EXCEL_COLS if col != MANAGER_COL]
-        missing_cols = [col for col in temp_required_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"거래처 데이터 파일 (ID: {file_id_customer})에 필수 컬럼이 없습니다: {missing_cols}. ({', '.join(temp_required_cols)} 필요)")
-            return None
-        
-        # 담당자 컬럼이 없으면 빈 컬럼으로 추가 (오류 방지 및 하위 로직 호환성)
-        if MANAGER_COL not in df.columns:
-            st.info(f"거래처 데이터 파일에 '{MANAGER_COL}' 컬럼이 없어 빈 값으로 추가합니다. '냉창' 여부 표시에 영향이 있을 수 있습니다.")
-            df[MANAGER_COL] = ""
-            
-        df['위도'] = pd.to_numeric(df['위도'], errors='coerce')
-        df['경도'] = pd.to_numeric(df['경도'], errors='coerce')
-        df.dropna(subset=['위도', '경도'], inplace=True) # 위도, 경도 없는 데이터는 지도에 표시 불가
-        
-        if df.empty:
-            st.warning(f"거래처 데이터 파일 (ID: {file_id_customer})에 유효한 위도/경도 데이터가 없습니다.")
-            return pd.DataFrame() # 빈 DataFrame 반환
-
-        df['거래처명'] = df['거래처명'].astype(str).str.strip()
-        df['주소'] = df['주소'].astype(str).str.strip().fillna("주소 정보 없음")
-        df[MANAGER_COL] = df[MANAGER_COL].astype(str).str.strip().fillna("") 
-        
-        # 데이터 로드 성공 시, 현재 시간을 세션 상태에 기록 (업데이트 시간 표시용)
-        st.session_state['map_data_last_df_load_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        if 'map_data_last_upload_processed_time' in st.session_state: # 이전 업로드 기록이 있다면 삭제
-            del st.session_state['map_data_last_upload_processed_time']
-
-        return df
-    except Exception as e:
-        st.error(f"거래처 데이터 (ID: {file_id_customer}) 로드 중 오류 발생: {e}")
+    df = read_excel_sheet(_drive_service, file_id_customer, 0, "거래처주소데이터", schema=CUSTOMER_SCHEMA.name, file_version=file_version)
+    if df is None:
+        raise TransientLoadError("거래처주소데이터 다운로드 실패") # 오류 메시지는 read_excel_sheet 함수에서 표시
+    
+    # 담당자 컬럼이 없어도 다른 필수 컬럼은 확인해야 함
+    temp_required_cols = [col for col in REQUIRED_EXCEL_COLS if col != MANAGER_COL]
+    missing_cols = [col for col in temp_required_cols if col not in df.columns]
+    if missing_cols:
+        st.error(f"거래처 데이터 파일 (ID: {file_id_customer})에 필수 컬럼이 없습니다: {missing_cols}. ({', '.join(temp_required_cols)} 필요)")
         return None
+    
+    # 담당자 컬럼이 없으면 빈 컬럼으로 추가 (오류 방지 및 하위 로직 호환성)
+    if MANAGER_COL not in df.columns:
+        st.info(f"거래처 데이터 파일에 '{MANAGER_COL}' 컬럼이 없어 빈 값으로 추가합니다. '냉창' 여부 표시에 영향이 있을 수 있습니다.")
+        df[MANAGER_COL] = ""
+        
+    df['위도'] = pd.to_numeric(df['위도'], errors='coerce')
+    df['경도'] = pd.to_numeric(df['경도'], errors='coerce')
+    df.dropna(subset=['위도', '경도'], inplace=True) # 위도, 경도 없는 데이터는 지도에 표시 불가
+    
+    if df.empty:
+        st.warning(f"거래처 데이터 파일 (ID: {file_id_customer})에 유효한 위도/경도 데이터가 없습니다.")
+        return pd.DataFrame() # 빈 DataFrame 반환
+
+    # 거래처명/주소/담당자는 스키마로 읽어 이미 공백이 제거된 문자열이며, 빈 칸만 채웁니다.
+    df['거래처명'] = df['거래처명'].fillna("")
+    df['주소'] = df['주소'].fillna("주소 정보 없음")
+    df[MANAGER_COL] = df[MANAGER_COL].fillna("")
+    
+    # 데이터 로드 성공 시, 현재 시간을 세션 상태에 기록 (업데이트 시간 표시용)
+    st.session_state['map_data_last_df_load_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if 'map_data_last_upload_processed_time' in st.session_state: # 이전 업로드 기록이 있다면 삭제
+        del st.session_state['map_data_last_upload_processed_time']
+
+    return df
 
 def process_uploaded_customer_data(new_file_bytes):
     """업로드된 엑셀 파일 바이트를 DataFrame으로 변환하고 기본 처리합니다. (Google Drive에 저장하지 않음)"""
     try:
         with BytesIO(new_file_bytes) as f:
-            df_new = pd.read_excel(f)
+            df_new = CUSTOMER_SCHEMA.normalize(pd.read_excel(f, **CUSTOMER_SCHEMA.read_kwargs()))
         
         temp_required_cols = [col for col in REQUIRED_EXCEL_COLS if col != MANAGER_COL]
         missing_cols = [col for col in temp_required_cols if col not in df_new.columns]
@@ -129,9 +152,9 @@ def process_uploaded_customer_data(new_file_bytes):
             st.warning("업로드한 파일에 유효한 위도/경도 데이터가 없습니다.")
             return pd.DataFrame()
 
-        df_new['거래처명'] = df_new['거래처명'].astype(str).str.strip()
-        df_new['주소'] = df_new['주소'].astype(str).str.strip().fillna("주소 정보 없음")
-        df_new[MANAGER_COL] = df_new[MANAGER_COL].astype(str).str.strip().fillna("")
+        df_new['거래처명'] = df_new['거래처명'].fillna("")
+        df_new['주소'] = df_new['주소'].fillna("주소 정보 없음")
+        df_new[MANAGER_COL] = df_new[MANAGER_COL].fillna("")
 
         # 업로드된 데이터 처리 성공 시, 현재 시간을 세션 상태에 기록
         st.session_state['map_data_last_upload_processed_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -144,6 +167,14 @@ def process_uploaded_customer_data(new_file_bytes):
         st.error(f"업로드된 데이터 처리 중 오류 발생: {e}")
         return None
 
+def warm_customer_datasets(_drive_service):
+    """갱신기 작업: 거래처 데이터와 검색 색인을 미리 만듭니다."""
+    load_customer_data(_drive_service, CUSTOMER_DATA_FILE_ID)
+
+# 새 파일 버전이 게시되기 전에 지도 데이터가 준비되도록 갱신기에 등록합니다 (사이드바 신선도 표시 포함).
+if COMMON_UTILS_LOADED:
+    attach_page_to_cache_warmer(drive_service, "page_customer_map", [(CUSTOMER_DATA_FILE_ID, warm_customer_datasets)])
+
 # --- Streamlit 페이지 UI 구성 ---
 st.title("🗺️ 거래처 위치 지도")
 
@@ -161,9 +192,10 @@ st.markdown("---")
 # 세션 상태에 업로드된 데이터가 있으면 그것을 사용, 없으면 Drive에서 로드
 if 'uploaded_customer_df' in st.session_state and st.session_state.uploaded_customer_df is not None:
     df_customers = st.session_state.uploaded_customer_df
+    customer_search_indexes = st.session_state.get('uploaded_customer_search_indexes') or build_search_indexes(df_customers, CUSTOMER_SEARCH_COLS)
     st.info("업로드된 파일의 데이터로 지도를 표시합니다 (현재 세션에만 적용).")
 else:
-    df_customers = load_customer_data(drive_service, CUSTOMER_DATA_FILE_ID)
+    df_customers, customer_search_indexes = load_customer_data(drive_service, CUSTOMER_DATA_FILE_ID)
 
 last_update_display = get_last_update_display()
 
@@ -177,6 +209,7 @@ if uploaded_file is not None:
     df_processed_upload = process_uploaded_customer_data(uploaded_file_bytes)
     if df_processed_upload is not None:
         st.session_state.uploaded_customer_df = df_processed_upload # 세션 상태에 저장
+        st.session_state.uploaded_customer_search_indexes = build_search_indexes(df_processed_upload, CUSTOMER_SEARCH_COLS) # 업로드 데이터 검색 색인
         df_customers = df_processed_upload # 현재 표시할 데이터프레임도 업데이트
         st.sidebar.success(f'업로드된 파일이 처리되었습니다.\n(처리 시간: {get_last_update_display()})')
         # st.experimental_rerun() # 페이지를 다시 실행하여 변경사항 즉시 반영
@@ -190,10 +223,15 @@ if uploaded_file is not None:
 st.sidebar.markdown("---")
 st.sidebar.header("거래처 정보 검색 (참고용)")
 search_customer_name = st.sidebar.text_input("거래처명으로 검색", key="search_cust_by_name_sidebar")
-if search_customer_name and df_customers is not None and not df_customers.empty:
-    searched_by_name_df = df_customers[df_customers['거래처명'].str.contains(search_customer_name.strip(), case=False, na=False, regex=False)]
+if search_customer_name and df_customers is not None and not df_customers.empty and '거래처명' in customer_search_indexes:
+    # 행마다 str.contains를 돌리지 않고 검색 색인에서 순위대로 일치하는 행 위치만 가져옵니다 (초성/오타 검색 포함).
+    name_index = customer_search_indexes['거래처명']
+    name_hits = name_index.search(search_customer_name)
+    searched_by_name_df = df_customers.iloc[name_index.rows_for_ids([hit.value_id for hit in name_hits], sort_rows=False)]
     if not searched_by_name_df.empty:
         st.sidebar.markdown("**거래처명 검색 결과:**")
+        if name_hits[0].match == MATCH_FUZZY:
+            st.sidebar.caption("일치하는 거래처명이 없어 비슷한 이름을 표시합니다.")
         for idx, row in searched_by_name_df.head().iterrows(): 
             st.sidebar.markdown(f"**{row['거래처명']}**")
             st.sidebar.markdown(f" 주소: {row['주소']}")
@@ -210,12 +248,16 @@ st.sidebar.header("주소로 거래처 찾기 (지도에 즉시 표시)")
 search_address = st.sidebar.text_input("주소의 일부 또는 전체 입력", key="search_by_address_map_sidebar")
 
 searched_by_address_df_for_map = pd.DataFrame() 
-if search_address and df_customers is not None and not df_customers.empty:
+if search_address and df_customers is not None and not df_customers.empty and '주소' in customer_search_indexes:
     search_address_stripped = search_address.strip()
     if search_address_stripped: 
-        searched_by_address_df_for_map = df_customers[df_customers['주소'].str.contains(search_address_stripped, case=False, na=False, regex=False)]
+        address_index = customer_search_indexes['주소']
+        address_hits = address_index.search(search_address_stripped)
+        searched_by_address_df_for_map = df_customers.iloc[address_index.rows_for_ids([hit.value_id for hit in address_hits], sort_rows=False)]
         if not searched_by_address_df_for_map.empty:
             st.sidebar.markdown(f"**'{search_address_stripped}' 포함 주소 검색 결과 ({len(searched_by_address_df_for_map)}건):**")
+            if address_hits[0].match == MATCH_FUZZY:
+                st.sidebar.caption("일치하는 주소가 없어 비슷한 주소를 표시합니다.")
             for idx, row in searched_by_address_df_for_map.head().iterrows():
                 st.sidebar.markdown(f"- **{row['거래처명']}**: {row['주소']}")
             if len(searched_by_address_df_for_map) > 5:
@@ -0,0 +1,220 @@
+# pages/6_재고_흐름_검증.py (SM 재고 흐름 검증: 이전 잔량 + 입고 − 출고 vs 실제 잔량)
+
+import streamlit as st
+import pandas as pd
+import datetime
+
+# common_utils.py 에서 공통 유틸리티 함수 가져오기
+from common_utils import DATASET_CACHE_MAX_ENTRIES, TransientLoadError, get_drive_file_version, get_available_sheet_dates
+from cache_warmer import attach_page_to_cache_warmer
+from sheet_schemas import PURCHASE_LOG_SCHEMA, SALES_LOG_SCHEMA
+from sm_history import load_sm_history_rows
+from log_store import load_log_rows
+from display_utils import render_paginated_table
+from inventory_flow import (
+    FLOW_DATE_COL, FLOW_PREV_DATE_COL, LOCATION_COL, FLOW_BOX_TOLERANCE, FLOW_KG_TOLERANCE,
+    FLOW_FLAGGED_COUNT_COL, FLOW_ABS_RESIDUAL_COL,
+    compute_inventory_flow, daily_movements, flow_residual_flags, summarize_flow_by_date
+)
+
+# --- Google Drive 파일 ID 정의 ---
+SM_FILE_ID = "1tRljdvOpp4fITaVEXvoL9mNveNg2qt4p"        # SM재고현황 파일 ID
+PURCHASE_FILE_ID = "1AgKl29yQ80sTDszLql6oBnd9FnLWf8oR"  # 입고내역(매입) 파일 ID
+SALES_FILE_ID = "1h-V7kIoInXgGLll7YBW5V_uZdF3Q1PdY"     # 출고내역(매출) 파일 ID
+# --- 파일 ID 정의 끝 ---
+
+# --- 이 페이지 고유의 설정 ---
+PURCHASE_LOG_SHEET_NAME = 'p-list'
+PURCHASE_DATE_COL = '매입일자'; PURCHASE_CODE_COL = '코드'; PURCHASE_CUSTOMER_COL = '거래처명'
+PURCHASE_LOCATION_COL = '지점명'; PURCHASE_QTY_BOX_COL = 'Box'; PURCHASE_QTY_KG_COL = 'Kg'
+# 메인 페이지와 같은 log_store를 쓰도록 같은 ffill 컬럼/스키마로 읽습니다.
+PURCHASE_LOG_FFILL_COLS = (PURCHASE_DATE_COL, PURCHASE_LOCATION_COL, PURCHASE_CODE_COL, PURCHASE_CUSTOMER_COL)
+SALES_LOG_SHEET_NAME = 's-list'
+SALES_DATE_COL = '매출일자'; SALES_QTY_BOX_COL = '수량(Box)'; SALES_QTY_KG_COL = '수량(Kg)'
+
+DEFAULT_FLOW_DAYS = 30
+
+# --- Google Drive 서비스 객체 가져오기 ---
+retrieved_drive_service = st.session_state.get('drive_service')
+page_title_for_debug = "재고 흐름 검증 페이지"
+
+if retrieved_drive_service:
+    st.sidebar.info(f"'{page_title_for_debug}'에서 Drive Service 로드 성공!")
+else:
+    st.sidebar.error(f"'{page_title_for_debug}'에서 Drive Service 로드 실패! (None). 메인 페이지를 먼저 방문하여 인증을 완료해주세요.")
+
+drive_service = retrieved_drive_service
+
+
+# --- 데이터 로딩 함수 ---
+# 아래 로더들은 Drive 파일 버전을 캐시 키에 포함하여 결과를 st.cache_resource에 보관합니다 (반환된 DataFrame은 수정하지 않음).
+def load_purchase_movements(_drive_service, start_date, end_date):
+    file_version = get_drive_file_version(_drive_service, PURCHASE_FILE_ID, "입고내역.xlsx")
+    if file_version is None:
+        return None
+    try:
+        return _load_purchase_movements_for_version(_drive_service, start_date, end_date, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"입고내역 데이터 로드/처리 중 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_purchase_movements_for_version(_drive_service, start_date, end_date, file_version):
+    """load_purchase_movements의 실제 로딩 함수입니다. [날짜, 상품코드, 지점명]별 입고 박스/Kg 합계."""
+    df_rows = load_log_rows(_drive_service, PURCHASE_FILE_ID, PURCHASE_LOG_SHEET_NAME, PURCHASE_DATE_COL, start_date, end_date,
+                            PURCHASE_LOG_FFILL_COLS, "입고내역.xlsx", PURCHASE_LOG_SCHEMA.name, file_version=file_version)
+    if df_rows is None:
+        raise TransientLoadError("입고내역 로그 행을 읽지 못했습니다.")
+    return daily_movements(df_rows, PURCHASE_DATE_COL, PURCHASE_QTY_BOX_COL, PURCHASE_QTY_KG_COL)
+
+def load_sales_movements(_drive_service, start_date, end_date):
+    file_version = get_drive_file_version(_drive_service, SALES_FILE_ID, "출고내역.xlsx")
+    if file_version is None:
+        return None
+    try:
+        return _load_sales_movements_for_version(_drive_service, start_date, end_date, file_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"출고내역 데이터 로드/처리 중 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_sales_movements_for_version(_drive_service, start_date, end_date, file_version):
+    """load_sales_movements의 실제 로딩 함수입니다. [날짜, 상품코드, 지점명]별 출고 박스/Kg 합계."""
+    df_rows = load_log_rows(_drive_service, SALES_FILE_ID, SALES_LOG_SHEET_NAME, SALES_DATE_COL, start_date, end_date,
+                            file_name_for_error_msg="출고내역.xlsx", schema=SALES_LOG_SCHEMA.name, file_version=file_version)
+    if df_rows is None:
+        raise TransientLoadError("출고내역 로그 행을 읽지 못했습니다.")
+    return daily_movements(df_rows, SALES_DATE_COL, SALES_QTY_BOX_COL, SALES_QTY_KG_COL)
+
+def select_flow_sheet_dates(available_dates_desc, start_date, end_date):
+    """기간 안의 스냅샷 날짜와, 첫 날짜의 기초 잔량이 될 직전 스냅샷 날짜를 오름차순으로 반환합니다."""
+    in_range = sorted(d for d in available_dates_desc if start_date <= d <= end_date)
+    earlier = [d for d in available_dates_desc if d < start_date]
+    return ([max(earlier)] if earlier else []) + in_range
+
+def load_inventory_flow(_drive_service, start_date, end_date):
+    """
+    기간의 재고 흐름 검증 표를 반환합니다 (실패 시 None).
+    SM/입고/출고 세 파일의 버전을 캐시 키로 쓰므로, 파일이 바뀌지 않으면 다시 계산하지 않습니다.
+    """
+    sm_version = get_drive_file_version(_drive_service, SM_FILE_ID, "SM재고현황.xlsx")
+    purchase_version = get_drive_file_version(_drive_service, PURCHASE_FILE_ID, "입고내역.xlsx")
+    sales_version = get_drive_file_version(_drive_service, SALES_FILE_ID, "출고내역.xlsx")
+    if sm_version is None or purchase_version is None or sales_version is None:
+        return None
+    try:
+        return _load_inventory_flow_for_versions(_drive_service, start_date, end_date, sm_version, purchase_version, sales_version)
+    except TransientLoadError:
+        return None # 오류 메시지는 이미 표시됨 (실패는 캐시되지 않음)
+    except Exception as e:
+        st.error(f"재고 흐름 계산 중 예상 못한 오류: {e}")
+        return None
+
+@st.cache_resource(max_entries=DATASET_CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_inventory_flow_for_versions(_drive_service, start_date, end_date, sm_version, purchase_version, sales_version):
+    """load_inventory_flow의 실제 계산 함수입니다. 입출고는 캐시 키로 쓴 버전 그대로 읽습니다."""
+    available_dates = get_available_sheet_dates(_drive_service, SM_FILE_ID, "SM재고현황.xlsx", file_version=sm_version)
+    sheet_dates = select_flow_sheet_dates(available_dates, start_date, end_date)
+    if len(sheet_dates) < 2:
+        return pd.DataFrame()
+    # 일자별 스냅샷은 sm_history에 시트마다 한 번만 변환되어 보관됩니다.
+    df_snapshots = load_sm_history_rows(_drive_service, SM_FILE_ID, [d.strftime("%Y%m%d") for d in sheet_dates], "SM재고현황.xlsx", sm_version)
+    if df_snapshots is None:
+        raise TransientLoadError("SM 재고 스냅샷을 읽지 못했습니다.")
+    # 입출고는 직전 스냅샷 다음 날부터 종료일까지만 필요합니다.
+    movement_start = sheet_dates[0] + datetime.timedelta(days=1)
+    # 다시 버전을 확인하면 캐시 키와 다른 버전을 읽을 수 있으므로, 버전별 함수를 직접 부릅니다.
+    df_purchases = _load_purchase_movements_for_version(_drive_service, movement_start, end_date, purchase_version)
+    df_sales = _load_sales_movements_for_version(_drive_service, movement_start, end_date, sales_version)
+    if df_purchases is None or df_sales is None:
+        return None # 필요한 컬럼이 없는 버전 (다시 읽어도 같으므로 캐시합니다)
+    return compute_inventory_flow(df_snapshots, df_purchases, df_sales)
+
+
+def warm_inventory_flow_datasets(_drive_service):
+    """갱신기 작업: 기본 기간(최신 SM 날짜까지 최근 DEFAULT_FLOW_DAYS일)의 재고 흐름 표를 미리 만듭니다."""
+    available_dates = get_available_sheet_dates(_drive_service, SM_FILE_ID, "SM재고현황.xlsx")
+    if not available_dates: return
+    min_sm_date, max_sm_date = min(available_dates), max(available_dates)
+    load_inventory_flow(_drive_service, max(min_sm_date, max_sm_date - datetime.timedelta(days=DEFAULT_FLOW_DAYS - 1)), max_sm_date)
+
+# 흐름 표는 세 파일을 모두 읽으므로, 어느 파일이 바뀌어도 다시 데웁니다 (사이드바 신선도 표시 포함).
+attach_page_to_cache_warmer(drive_service, "page_inventory_flow", [
+    (SM_FILE_ID, warm_inventory_flow_datasets), (PURCHASE_FILE_ID, warm_inventory_flow_datasets), (SALES_FILE_ID, warm_inventory_flow_datasets)
+])
+
+
+# --- Streamlit 페이지 UI 구성 ---
+st.title("🧮 재고 흐름 검증")
+st.markdown("직전 SM 재고 스냅샷의 잔량에 그 사이 입고(매입내역)를 더하고 출고(매출내역)를 뺀 **예상 잔량**을, 그날 SM 재고현황의 **실제 잔량**과 비교합니다.")
+st.markdown("<small>스냅샷이 없는 날(주말 등)의 입출고는 다음 스냅샷 날짜에 합산합니다. 차이 = 실제 − 예상 (양수면 장부보다 재고가 많음)</small>", unsafe_allow_html=True)
+st.markdown("---")
+
+if drive_service is None:
+    st.error("Google Drive 서비스에 연결되지 않았습니다. 앱의 메인 페이지를 방문하여 인증을 완료하거나, 앱 설정을 확인해주세요.")
+    st.stop()
+
+available_sm_dates = get_available_sheet_dates(drive_service, SM_FILE_ID, "SM재고현황.xlsx")
+if not available_sm_dates:
+    st.warning("SM재고현황 파일에서 날짜 시트를 찾을 수 없습니다.")
+    st.stop()
+
+min_sm_date, max_sm_date = min(available_sm_dates), max(available_sm_dates)
+col_start, col_end = st.columns(2)
+flow_start_date = col_start.date_input("시작일", max(min_sm_date, max_sm_date - datetime.timedelta(days=DEFAULT_FLOW_DAYS - 1)),
+                                       min_value=min_sm_date, max_value=max_sm_date, key="flow_start_date")
+flow_end_date = col_end.date_input("종료일", max_sm_date, min_value=min_sm_date, max_value=max_sm_date, key="flow_end_date")
+
+col_box_tol, col_kg_tol = st.columns(2)
+box_tolerance = col_box_tol.number_input("박스 허용 오차", min_value=0.0, value=FLOW_BOX_TOLERANCE, step=0.5, key="flow_box_tolerance")
+kg_tolerance = col_kg_tol.number_input("Kg 허용 오차", min_value=0.0, value=FLOW_KG_TOLERANCE, step=0.1, key="flow_kg_tolerance")
+
+if flow_start_date > flow_end_date:
+    st.error("시작일이 종료일보다 늦을 수 없습니다.")
+    st.stop()
+
+with st.spinner("재고 흐름을 계산하는 중입니다..."):
+    df_flow = load_inventory_flow(drive_service, flow_start_date, flow_end_date)
+
+if df_flow is None:
+    st.error("재고 흐름 검증에 필요한 데이터를 불러오지 못했습니다.")
+    st.stop()
+if df_flow.empty:
+    st.info("선택한 기간에 비교할 스냅샷 날짜가 부족합니다 (직전 스냅샷 포함 2개 이상 필요).")
+    st.stop()
+
+# 허용 오차는 캐시된 잔차 표 위에서만 적용하므로, 값을 바꿔도 다시 계산하지 않습니다.
+flags = flow_residual_flags(df_flow, box_tolerance, kg_tolerance)
+df_daily_summary = summarize_flow_by_date(df_flow, flags)
+
+col1, col2, col3 = st.columns(3)
+col1.metric("검사 항목 (날짜 x 품목 x 지점)", f"{len(df_flow):,}")
+col2.metric("이상 항목", f"{int(flags.sum()):,}")
+col3.metric("이상 비율", f"{flags.mean() * 100:.2f} %")
+
+st.subheader("📈 날짜별 이상 항목 수")
+st.line_chart(df_daily_summary.pivot(index=FLOW_DATE_COL, columns=LOCATION_COL, values=FLOW_FLAGGED_COUNT_COL).fillna(0))
+with st.expander("날짜/지점별 요약 표", expanded=False):
+    render_paginated_table(
+        df_daily_summary, key="flow_daily_summary_table", sort_by=FLOW_DATE_COL, ascending=False,
+        date_cols=[FLOW_DATE_COL], formatters={FLOW_ABS_RESIDUAL_COL: '{:,.2f}'}, export_name="재고흐름검증_요약"
+    )
+
+st.subheader("📋 이상 항목")
+location_options = sorted(df_daily_summary[LOCATION_COL].dropna().unique().tolist())
+selected_locations = st.multiselect("지점 선택 (비우면 전체)", location_options, key="flow_locations")
+show_mask = flags & (df_flow[LOCATION_COL].isin(selected_locations).to_numpy() if selected_locations else True)
+if not show_mask.any():
+    st.success("허용 오차를 넘는 항목이 없습니다.")
+else:
+    df_flagged = df_flow[show_mask]
+    render_paginated_table(
+        df_flagged, key="flow_flagged_table", sort_by=FLOW_DATE_COL, ascending=False,
+        date_cols=[FLOW_DATE_COL, FLOW_PREV_DATE_COL],
+        formatters={col: '{:,.2f}' for col in df_flagged.columns if col.endswith('(박스)') or col.endswith('(Kg)')},
+        export_name=f"재고흐름검증_이상항목_{flow_start_date.strftime('%Y%m%d')}_{flow_end_date.strftime('%Y%m%d')}"
+    )
@@ -0,0 +1,314 @@
+# sales_analytics.py (매출 집계 큐브)
+#
+# 매출내역 행을 [일자 x 거래처 x 상품]별 매출금액/수량(Kg)/건수로 한 번만 집계하고,
+# 일자 축으로 누적합(prefix sum)을 만들어 둡니다.
+# 임의의 기간 [시작일, 종료일]의 합계는 누적합 두 값의 차이이므로,
+# 기간을 바꿀 때마다 전체 행을 다시 거르고 묶지 않고도 전체/거래처별/상품별 합계를 바로 구할 수 있습니다.
+# 거래처별/상품별 누적합은 (키, 일자) 순으로 정렬된 집계 칸 위에 만들며, 키마다 이진 탐색 두 번으로 조회합니다.
+
+import numpy as np
+import pandas as pd
+
+from search_index import MATCH_FUZZY, SearchIndex
+
+ROW_COUNT_COL = '건수'
+CUSTOMER_DIM = 'customer'
+PRODUCT_DIM = 'product'
+
+# 거래 감소 분석의 기본 비교 구간: (이름, 최근 구간 일수, 비교 구간을 앞당길 일수)
+DECLINE_WINDOW_SPECS = [
+    ('최근 4주 vs 이전 4주', 28, 28),
+    ('최근 30일 vs 이전 30일', 30, 30),
+    ('최근 4주 vs 전년 동기', 28, 364), # 52주 전 (요일 맞춤)
+]
+DECLINE_TREND_WEEKS = 12 # 주간 추세(기울기)를 계산할 최근 주 수
+TREND_SLOPE_COL = '주간 추세(원/주)'
+TREND_PCT_COL = '주간 추세율(%)'
+
+
+class SalesCube:
+    """
+    매출 행을 일자 x 거래처 x 상품으로 집계한 큐브입니다.
+    파일 버전별로 캐시되어 모든 세션이 공유하므로 속성을 수정하지 않습니다.
+    합계 컬럼은 [amount_col, weight_col, '건수'] 순서입니다.
+    """
+    def __init__(self, df_sales, date_col, customer_col, product_col, amount_col, weight_col):
+        self.date_col = date_col
+        self.customer_col = customer_col
+        self.product_col = product_col
+        self.amount_col = amount_col
+        self.weight_col = weight_col
+        self.measure_cols = [amount_col, weight_col, ROW_COUNT_COL]
+
+        dates = pd.to_datetime(df_sales[date_col], errors='coerce').dt.normalize()
+        valid = dates.notna().to_numpy()
+        dates = dates[valid]
+        if dates.empty:
+            self.days = pd.DatetimeIndex([], name=date_col)
+        else:
+            self.days = pd.date_range(dates.min(), dates.max(), freq='D', name=date_col)
+        n_days = len(self.days)
+
+        customer_codes, customers = pd.factorize(df_sales[customer_col][valid], sort=True, use_na_sentinel=False)
+        product_codes, products = pd.factorize(df_sales[product_col][valid], sort=True, use_na_sentinel=False)
+        self.labels = {
+            CUSTOMER_DIM: pd.Index(np.asarray(customers, dtype=object), name=customer_col),
+            PRODUCT_DIM: pd.Index(np.asarray(products, dtype=object), name=product_col),
+        }
+        # 거래처/품목 이름 검색 색인 (행 위치 = 키 번호)
+        self._search = {dim: SearchIndex(labels) for dim, labels in self.labels.items()}
+
+        df_cells = pd.DataFrame({
+            'day': (dates - self.days[0]).dt.days.to_numpy() if n_days else np.array([], dtype=np.int64),
+            CUSTOMER_DIM: customer_codes,
+            PRODUCT_DIM: product_codes,
+            amount_col: pd.to_numeric(df_sales[amount_col][valid], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+            weight_col: pd.to_numeric(df_sales[weight_col][valid], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+            ROW_COUNT_COL: 1.0,
+        })
+        # 일자 순으로 정렬된 집계 칸 (상세 조회/검색용)
+        self.cells = df_cells.groupby(['day', CUSTOMER_DIM, PRODUCT_DIM], sort=True, as_index=False)[self.measure_cols].sum()
+        self._cell_days = self.cells['day'].to_numpy()
+        cell_values = self.cells[self.measure_cols].to_numpy(dtype='float64')
+
+        # 전체 일별 합계와 그 누적합 (맨 앞 0 포함)
+        self._daily = np.zeros((n_days, len(self.measure_cols)))
+        np.add.at(self._daily, self._cell_days, cell_values)
+        self._total_prefix = np.vstack([np.zeros((1, len(self.measure_cols))), np.cumsum(self._daily, axis=0)])
+
+        # 키별 누적합: (키 * 일수 + 일자) 순으로 정렬한 칸 위의 누적합
+        self._key_prefix = {}
+        for dim in (CUSTOMER_DIM, PRODUCT_DIM):
+            keys = self.cells[dim].to_numpy().astype(np.int64)
+            order = np.lexsort((self._cell_days, keys))
+            flat_keys = keys[order] * max(n_days, 1) + self._cell_days[order]
+            prefix = np.vstack([np.zeros((1, len(self.measure_cols))), np.cumsum(cell_values[order], axis=0)])
+            self._key_prefix[dim] = (flat_keys, prefix)
+
+    @property
+    def empty(self):
+        return len(self.days) == 0
+
+    def _day_bounds(self, start_date, end_date):
+        """[start_date, end_date] 기간을 일자 위치 (시작, 끝 포함)로 바꿉니다. 겹치는 날이 없으면 None."""
+        if self.empty:
+            return None
+        first = max(0, (pd.Timestamp(start_date).normalize() - self.days[0]).days)
+        last = min(len(self.days) - 1, (pd.Timestamp(end_date).normalize() - self.days[0]).days)
+        return (first, last) if first <= last else None
+
+    def total(self, start_date, end_date):
+        """기간 전체 합계를 Series(매출금액, 수량(Kg), 건수)로 반환합니다."""
+        bounds = self._day_bounds(start_date, end_date)
+        if bounds is None:
+            return pd.Series(0.0, index=self.measure_cols)
+        first, last = bounds
+        return pd.Series(self._total_prefix[last + 1] - self._total_prefix[first], index=self.measure_cols)
+
+    def totals_by(self, dim, start_date, end_date, codes=None):
+        """
+        기간의 키(dim: 'customer' / 'product')별 합계 표를 반환합니다 (기간에 거래가 있는 키만).
+        codes를 주면 그 키 번호들만 계산합니다. 키마다 누적합 이진 탐색 두 번으로 구합니다.
+        """
+        labels = self.labels[dim]
+        bounds = self._day_bounds(start_date, end_date)
+        if bounds is None or len(labels) == 0:
+            return pd.DataFrame(columns=self.measure_cols, index=labels[:0])
+        first, last = bounds
+        flat_keys, prefix = self._key_prefix[dim]
+        key_codes = np.arange(len(labels), dtype=np.int64) if codes is None else np.asarray(codes, dtype=np.int64)
+        base = key_codes * len(self.days)
+        hi = np.searchsorted(flat_keys, base + last, side='right')
+        lo = np.searchsorted(flat_keys, base + first, side='left')
+        df_totals = pd.DataFrame(prefix[hi] - prefix[lo], index=labels[key_codes], columns=self.measure_cols)
+        return df_totals[df_totals[ROW_COUNT_COL] > 0]
+
+    def range_totals_by(self, dim, date_ranges, measure_col=None):
+        """
+        여러 기간 [(시작일, 종료일), ...]의 키별 합계를 (키 수 x 기간 수) 배열로 한 번에 구합니다 (measure_col 기본값: 금액).
+        모든 키와 모든 기간의 경계를 한 번의 이진 탐색으로 찾으므로 기간 수가 늘어도 키/기간별 반복이 없습니다.
+        """
+        labels = self.labels[dim]
+        measure_idx = self.measure_cols.index(measure_col or self.amount_col)
+        if self.empty or len(labels) == 0 or not len(date_ranges):
+            return np.zeros((len(labels), len(date_ranges)))
+        n_days = len(self.days)
+        first_day = self.days[0]
+        firsts = np.array([(pd.Timestamp(start).normalize() - first_day).days for start, _ in date_ranges], dtype=np.int64)
+        lasts = np.array([(pd.Timestamp(end).normalize() - first_day).days for _, end in date_ranges], dtype=np.int64)
+        firsts = np.maximum(firsts, 0)
+        lasts = np.minimum(lasts, n_days - 1)
+        valid = firsts <= lasts
+        # 데이터 범위와 겹치지 않는 기간은 다른 키의 구간을 침범하지 않도록 경계를 0으로 두고 결과를 0으로 만듭니다.
+        firsts = np.where(valid, firsts, 0)
+        lasts = np.where(valid, lasts, 0)
+
+        flat_keys, prefix = self._key_prefix[dim]
+        base = np.arange(len(labels), dtype=np.int64)[:, None] * n_days
+        hi = np.searchsorted(flat_keys, base + lasts[None, :], side='right')
+        lo = np.searchsorted(flat_keys, base + firsts[None, :], side='left')
+        sums = prefix[hi, measure_idx] - prefix[lo, measure_idx]
+        sums[:, ~valid] = 0.0
+        return sums
+
+    def match_codes(self, dim, search_text):
+        """
+        이름 검색 색인으로 search_text와 일치하는 (키 번호 배열, 유사 이름 목록)을 반환합니다.
+        부분 일치(대소문자 무시)와 초성 검색('ㅅㄱㅅ')을 지원하며, 일치하는 이름이 없으면 오타를 허용한 유사 이름을 찾습니다.
+        유사 이름 목록은 결과가 오타 허용 검색으로 찾은 것일 때만 그 이름들을 담고, 그 외에는 빈 목록입니다.
+        """
+        search = self._search[dim]
+        hits = search.search(search_text)
+        codes = search.rows_for_ids([hit.value_id for hit in hits], sort_rows=False)
+        similar_names = [hit.label for hit in hits] if hits and hits[0].match == MATCH_FUZZY else []
+        return codes, similar_names
+
+    def _cell_mask(self, first, last, customer_codes=None, product_codes=None):
+        lo = np.searchsorted(self._cell_days, first, side='left')
+        hi = np.searchsorted(self._cell_days, last, side='right')
+        mask = np.zeros(len(self.cells), dtype=bool)
+        mask[lo:hi] = True
+        if customer_codes is not None:
+            mask &= np.isin(self.cells[CUSTOMER_DIM].to_numpy(), customer_codes)
+        if product_codes is not None:
+            mask &= np.isin(self.cells[PRODUCT_DIM].to_numpy(), product_codes)
+        return mask
+
+    def daily_totals(self, start_date, end_date, customer_codes=None, product_codes=None):
+        """
+        기간의 일별 합계 표(일자 index, 거래가 없는 날은 0)를 반환합니다.
+        거래처/상품 조건이 없으면 미리 만든 일별 합계를 잘라내기만 합니다.
+        """
+        bounds = self._day_bounds(start_date, end_date)
+        if bounds is None:
+            return pd.DataFrame(columns=self.measure_cols, index=self.days[:0])
+        first, last = bounds
+        if customer_codes is None and product_codes is None:
+            values = self._daily[first:last + 1]
+        else:
+            mask = self._cell_mask(first, last, customer_codes, product_codes)
+            values = np.zeros((last - first + 1, len(self.measure_cols)))
+            np.add.at(values, self._cell_days[mask] - first, self.cells[self.measure_cols].to_numpy(dtype='float64')[mask])
+        return pd.DataFrame(values, index=self.days[first:last + 1], columns=self.measure_cols)
+
+    def period_totals(self, start_date, end_date, freq, customer_codes=None, product_codes=None):
+        """
+        기간을 freq('D' 일별 / 'W' 주별 / 'M' 월별) 단위로 묶은 합계 표를 반환합니다 (index는 각 주/월의 시작일).
+        주/월 경계마다 누적합 두 값의 차이로 구하므로 기간 양끝의 일부 주/월도 기간 안의 날만 합산합니다.
+        """
+        if freq == 'D':
+            return self.daily_totals(start_date, end_date, customer_codes, product_codes)
+        bounds = self._day_bounds(start_date, end_date)
+        if bounds is None:
+            return pd.DataFrame(columns=self.measure_cols, index=self.days[:0])
+        first, last = bounds
+        if customer_codes is None and product_codes is None:
+            prefix = self._total_prefix[first:last + 2] - self._total_prefix[first]
+        else:
+            daily_values = self.daily_totals(start_date, end_date, customer_codes, product_codes).to_numpy(dtype='float64')
+            prefix = np.vstack([np.zeros((1, len(self.measure_cols))), np.cumsum(daily_values, axis=0)])
+        periods = self.days[first:last + 1].to_period(freq)
+        period_codes = periods.asi8
+        breaks = np.flatnonzero(period_codes[1:] != period_codes[:-1]) + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(period_codes)]])
+        period_index = pd.DatetimeIndex(periods[starts].start_time, name=self.date_col)
+        return pd.DataFrame(prefix[ends] - prefix[starts], index=period_index, columns=self.measure_cols)
+
+    def cells_in_range(self, start_date, end_date, customer_codes=None, product_codes=None):
+        """기간(및 거래처/상품 조건)의 [일자, 거래처, 상품]별 합계 행을 일자 순으로 반환합니다."""
+        bounds = self._day_bounds(start_date, end_date)
+        if bounds is None:
+            return pd.DataFrame(columns=[self.date_col, self.customer_col, self.product_col] + self.measure_cols)
+        df_cells = self.cells[self._cell_mask(*bounds, customer_codes, product_codes)]
+        return pd.DataFrame({
+            self.date_col: self.days[df_cells['day'].to_numpy()],
+            self.customer_col: self.labels[CUSTOMER_DIM][df_cells[CUSTOMER_DIM].to_numpy()],
+            self.product_col: self.labels[PRODUCT_DIM][df_cells[PRODUCT_DIM].to_numpy()],
+            **{col: df_cells[col].to_numpy() for col in self.measure_cols},
+        })
+
+
+def rolling_decline_windows(as_of_date, specs=DECLINE_WINDOW_SPECS):
+    """
+    as_of_date(포함)에서 끝나는 비교 구간 목록 [(이름, 최근 시작, 최근 끝, 이전 시작, 이전 끝)]을 만듭니다.
+    이전 구간은 최근 구간을 spec의 일수만큼 앞당긴 같은 길이의 구간입니다.
+    """
+    as_of = pd.Timestamp(as_of_date).normalize()
+    windows = []
+    for label, window_days, offset_days in specs:
+        recent_start = as_of - pd.Timedelta(days=window_days - 1)
+        shift = pd.Timedelta(days=offset_days)
+        windows.append((label, recent_start, as_of, recent_start - shift, as_of - shift))
+    return windows
+
+
+def window_column_names(label):
+    """비교 구간 하나의 결과 컬럼 이름 (이전, 최근, 변동액, 변동률)."""
+    return f"{label} 이전", f"{label} 최근", f"{label} 변동액", f"{label} 변동률(%)"
+
+
+def build_customer_decline_table(cube, windows, trend_end=None, trend_weeks=DECLINE_TREND_WEEKS):
+    """
+    모든 거래처의 구간별 매출 비교표를 만듭니다 (index: 거래처명).
+    - 비교 구간마다 '이전', '최근', '변동액', '변동률(%)' 컬럼 (이전 매출이 0이면 변동률은 NaN)
+    - trend_end(기본: 마지막 구간의 최근 끝)까지 최근 trend_weeks주 주간 매출의 최소제곱 기울기(원/주)와,
+      이를 같은 기간 주 평균 매출 대비 %로 나타낸 추세율
+    모든 구간/주의 합계를 range_totals_by 한 번으로 구합니다. 어떤 구간에도 매출이 없는 거래처는 제외합니다.
+    """
+    labels = cube.labels[CUSTOMER_DIM]
+    trend_end = pd.Timestamp(trend_end if trend_end is not None else (windows[-1][2] if windows else cube.days[-1])).normalize()
+    week_starts = [trend_end - pd.Timedelta(days=7 * (trend_weeks - week) - 1) for week in range(trend_weeks)]
+    week_ranges = [(start, start + pd.Timedelta(days=6)) for start in week_starts]
+
+    date_ranges = []
+    for _, recent_start, recent_end, previous_start, previous_end in windows:
+        date_ranges.extend([(previous_start, previous_end), (recent_start, recent_end)])
+    sums = cube.range_totals_by(CUSTOMER_DIM, date_ranges + week_ranges)
+
+    columns = {}
+    for window_idx, window in enumerate(windows):
+        previous_col, recent_col, change_col, change_pct_col = window_column_names(window[0])
+        previous = sums[:, 2 * window_idx]
+        recent = sums[:, 2 * window_idx + 1]
+        columns[previous_col] = previous
+        columns[recent_col] = recent
+        columns[change_col] = recent - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns[change_pct_col] = np.where(previous > 0, (recent - previous) / previous * 100, np.nan)
+
+    weekly = sums[:, len(date_ranges):]
+    if trend_weeks > 1:
+        week_offsets = np.arange(trend_weeks, dtype='float64') - (trend_weeks - 1) / 2
+        weekly_mean = weekly.mean(axis=1)
+        slope = (weekly - weekly_mean[:, None]) @ week_offsets / np.square(week_offsets).sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope_pct = np.where(weekly_mean > 0, slope / weekly_mean * 100, np.nan)
+        columns[TREND_SLOPE_COL] = slope
+        columns[TREND_PCT_COL] = slope_pct
+
+    df_decline = pd.DataFrame(columns, index=labels)
+    has_sales = (sums != 0).any(axis=1)
+    return df_decline[has_sales].round({col: 2 for col in df_decline.columns if col.endswith('(%)')})
+
+
+def rank_declines(df_decline, window_label, min_previous_amount=0, max_change_pct=0.0, top_n=None):
+    """
+    window_label 구간에서 매출이 줄어든 거래처를 감소액이 큰 순으로 반환합니다.
+    이전 매출이 min_previous_amount 이상(0 초과)이고 변동률이 max_change_pct(%) 이하인 거래처만 남기며, top_n개까지 자릅니다.
+    """
+    previous_col, _, change_col, change_pct_col = window_column_names(window_label)
+    selected = df_decline[
+        (df_decline[previous_col] > 0)
+        & (df_decline[previous_col] >= min_previous_amount)
+        & (df_decline[change_col] < 0)
+        & (df_decline[change_pct_col] <= max_change_pct)
+    ].sort_values(by=change_col, ascending=True, kind='stable')
+    return selected if top_n is None else selected.head(top_n)
+
+
+def build_sales_cube(df_sales, date_col, customer_col, product_col, amount_col, weight_col):
+    """매출 행으로 SalesCube를 만듭니다. 필요한 컬럼이 없으면 None."""
+    if df_sales is None or not all(col in df_sales.columns for col in [date_col, customer_col, product_col, amount_col, weight_col]):
+        return None
+    return SalesCube(df_sales, date_col, customer_col, product_col, amount_col, weight_col)
@@ -0,0 +1,303 @@
+# search_index.py (거래처/품목/주소/상품코드 부분 문자열 검색 색인)
+#
+# 검색 대상 컬럼의 고유값마다 글자 한 개(unigram)와 연속 두 글자(bigram)를 뽑아
+# [글자 조각 -> 그 조각을 포함하는 고유값 번호 목록] 역색인을 만들어 둡니다.
+# 검색어의 조각별 목록을 교집합한 뒤 남은 후보만 실제 문자열로 확인하므로,
+# 키 입력마다 모든 행에 str.contains를 돌리지 않고 일치하는 값/행 수에 비례하는 시간만 듭니다.
+# 한글은 음절 단위로 그대로 조각내며, 영문은 대소문자를 구분하지 않습니다 (casefold).
+# 색인은 데이터 버전별로 한 번 만들어 캐시하고 모든 세션이 공유하므로 만든 뒤에는 수정하지 않습니다.
+#
+# search()는 순위가 매겨진 결과를 돌려주는 검색 엔진입니다.
+# - 일치 > 앞부분 일치 > 부분 일치 순으로, 같은 종류 안에서는 짧은 이름이 먼저 나옵니다.
+# - 'ㅅㄱㅅ'처럼 초성만 입력하면 미리 만든 초성 키(삼겹살 -> ㅅㄱㅅ)에서 찾습니다.
+# - 위에서 아무것도 찾지 못하면 한글을 자모로 풀어 쓴 키(삼 -> ㅅㅏㅁ)의 trigram 색인으로 후보를 좁히고,
+#   허용 편집 거리 안의 후보만 '유사' 결과로 돌려줍니다 (오타 한두 글자 허용).
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+SEARCH_NGRAM = 2
+FUZZY_NGRAM = 3               # 자모 키의 후보 생성용 조각 길이
+FUZZY_JAMO_PER_EDIT = 4       # 검색어 자모 4개당 편집 1회 허용 (최소 1회)
+FUZZY_MAX_CANDIDATES = 50     # 편집 거리를 계산할 최대 후보 수 (공유 조각이 많은 순)
+_EMPTY_IDS = np.array([], dtype=np.int64)
+
+# 결과 종류 (순위 순서)
+MATCH_EXACT = '일치'
+MATCH_PREFIX = '앞부분 일치'
+MATCH_CONTAINS = '부분 일치'
+MATCH_CHOSUNG = '초성 일치'
+MATCH_FUZZY = '유사'
+_MATCH_RANK = {MATCH_EXACT: 0, MATCH_PREFIX: 1, MATCH_CONTAINS: 2, MATCH_CHOSUNG: 3, MATCH_FUZZY: 4}
+
+SearchHit = namedtuple('SearchHit', ['value_id', 'label', 'match', 'distance'])
+
+# 한글 음절 분해표 (호환용 자모)
+_HANGUL_BASE, _HANGUL_LAST = 0xAC00, 0xD7A3
+_CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_JUNGSEONG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+_JONGSEONG = ['', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ',
+              'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+_CHOSEONG_SET = frozenset(_CHOSEONG)
+
+
+def normalize_search_text(text):
+    """검색/색인용으로 앞뒤 공백을 없애고 대소문자를 통일합니다. NaN/None은 빈 문자열입니다."""
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ""
+    return str(text).strip().casefold()
+
+
+def to_chosung(text):
+    """한글 음절을 초성으로 바꾸고 공백을 없앤 키를 반환합니다 (예: '돼지 삼겹살' -> 'ㄷㅈㅅㄱㅅ'). 다른 글자는 그대로 둡니다."""
+    chars = []
+    for char in text:
+        code = ord(char)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            chars.append(_CHOSEONG[(code - _HANGUL_BASE) // 588])
+        elif not char.isspace():
+            chars.append(char)
+    return ''.join(chars)
+
+
+def to_jamo(text):
+    """한글 음절을 초성/중성/종성 자모로 풀어 쓴 문자열을 반환합니다 (예: '삼겹' -> 'ㅅㅏㅁㄱㅕㅂ'). 공백은 없앱니다."""
+    chars = []
+    for char in text:
+        code = ord(char)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            offset = code - _HANGUL_BASE
+            chars.append(_CHOSEONG[offset // 588])
+            chars.append(_JUNGSEONG[(offset % 588) // 28])
+            chars.append(_JONGSEONG[offset % 28])
+        elif not char.isspace():
+            chars.append(char)
+    return ''.join(chars)
+
+
+def is_chosung_query(text):
+    """공백을 뺀 모든 글자가 초성 자음(ㄱ~ㅎ)이면 True."""
+    chars = [char for char in text if not char.isspace()]
+    return bool(chars) and all(char in _CHOSEONG_SET for char in chars)
+
+
+def _ngrams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _text_grams(text):
+    """text에 들어 있는 unigram, bigram 집합을 반환합니다."""
+    grams = set(text)
+    grams.update(_ngrams(text, SEARCH_NGRAM))
+    return grams
+
+
+def _build_postings(keys, grams_of):
+    """keys(고유값 번호 순)의 조각 -> 정렬된 고유값 번호 배열 사전을 만듭니다."""
+    postings = {}
+    for value_id, key in enumerate(keys):
+        if not key:
+            continue
+        for gram in grams_of(key):
+            postings.setdefault(gram, []).append(value_id)
+    # 고유값 번호 순으로 추가했으므로 각 목록은 이미 정렬되어 있습니다.
+    return {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+
+def _intersect_postings(postings, grams):
+    """grams의 모든 조각을 포함하는 고유값 번호 (짧은 목록부터 교집합)."""
+    posting_lists = []
+    for gram in grams:
+        ids = postings.get(gram)
+        if ids is None:
+            return _EMPTY_IDS
+        posting_lists.append(ids)
+    if not posting_lists:
+        return _EMPTY_IDS
+    posting_lists.sort(key=len)
+    candidates = posting_lists[0]
+    for ids in posting_lists[1:]:
+        candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        if not len(candidates):
+            break
+    return candidates
+
+
+def _query_grams(query):
+    """부분 일치 후보용 검색어 조각: 한 글자면 unigram, 그 외에는 bigram."""
+    return _text_grams(query) if len(query) < SEARCH_NGRAM else _ngrams(query, SEARCH_NGRAM)
+
+
+def bounded_substring_distance(pattern, text, max_distance):
+    """
+    pattern과 text의 가장 비슷한 부분 문자열 사이의 편집 거리를 반환합니다.
+    max_distance를 넘으면 None입니다 (검색어가 긴 이름의 일부인 경우를 위해 text의 시작/끝은 자유).
+    """
+    pattern_len = len(pattern)
+    if pattern_len == 0:
+        return 0
+    column = list(range(pattern_len + 1))
+    best = column[-1]
+    for text_char in text:
+        prev_diag, column[0] = column[0], 0
+        for i in range(1, pattern_len + 1):
+            cost = 0 if pattern[i - 1] == text_char else 1
+            current = min(column[i] + 1, column[i - 1] + 1, prev_diag + cost)
+            prev_diag, column[i] = column[i], current
+        if column[-1] < best:
+            best = column[-1]
+            if best == 0:
+                break
+    return best if best <= max_distance else None
+
+
+class SearchIndex:
+    """
+    한 컬럼(values)의 부분 문자열/접두어 검색 색인입니다.
+    labels: 고유값 (원래 표기), 고유값 번호는 labels의 위치입니다.
+    match_ids / match_labels는 고유값 단위로, match_rows는 원래 values의 행 위치 단위로 결과를 돌려줍니다.
+    search / search_ids / search_rows는 초성/유사 검색까지 포함한 순위 결과를 돌려줍니다.
+    """
+    def __init__(self, values):
+        row_ids, labels = pd.factorize(pd.Series(values).reset_index(drop=True), sort=True)
+        self.labels = pd.Index(labels)
+        self._keys = [normalize_search_text(label) for label in self.labels]
+        self._key_to_ids = {}
+        for value_id, key in enumerate(self._keys):
+            if key:
+                self._key_to_ids.setdefault(key, []).append(value_id)
+        self._postings = _build_postings(self._keys, _text_grams)
+        # 초성 검색용 키/색인과 유사 검색용 자모 키/trigram 색인
+        self._chosung_keys = [to_chosung(key) for key in self._keys]
+        self._chosung_postings = _build_postings(self._chosung_keys, _text_grams)
+        self._jamo_keys = [to_jamo(key) for key in self._keys]
+        self._jamo_postings = _build_postings(self._jamo_keys, lambda key: _ngrams(key, FUZZY_NGRAM))
+
+        # 고유값 번호 -> 행 위치 (CSR): _row_order[_row_offsets[i]:_row_offsets[i + 1]]가 i번 값의 행들
+        valid_rows = np.flatnonzero(row_ids >= 0)
+        self._row_order = valid_rows[np.argsort(row_ids[valid_rows], kind='stable')]
+        self._row_offsets = np.concatenate([[0], np.cumsum(np.bincount(row_ids[valid_rows], minlength=len(self.labels)))])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _candidate_ids(self, query):
+        """검색어의 모든 조각을 포함하는 고유값 번호 후보."""
+        return _intersect_postings(self._postings, _query_grams(query))
+
+    def match_ids(self, search_text, prefix=False):
+        """
+        search_text를 포함하는(prefix=True이면 search_text로 시작하는) 고유값 번호를 정렬된 배열로 반환합니다.
+        조각이 모두 들어 있어도 순서가 다를 수 있으므로 후보는 실제 문자열로 한 번 더 확인합니다.
+        """
+        query = normalize_search_text(search_text)
+        if not query:
+            return _EMPTY_IDS
+        candidates = self._candidate_ids(query)
+        if prefix:
+            confirmed = [value_id for value_id in candidates if self._keys[value_id].startswith(query)]
+        elif len(query) <= SEARCH_NGRAM:
+            return candidates # 조각 하나가 곧 검색어이므로 확인할 필요가 없습니다.
+        else:
+            confirmed = [value_id for value_id in candidates if query in self._keys[value_id]]
+        return np.array(confirmed, dtype=np.int64)
+
+    def exact_ids(self, search_text):
+        """공백/대소문자를 무시하고 search_text와 같은 고유값 번호 배열을 반환합니다 (상품코드 조회 등)."""
+        return np.array(self._key_to_ids.get(normalize_search_text(search_text), []), dtype=np.int64)
+
+    def match_labels(self, search_text, prefix=False):
+        """match_ids 결과의 원래 표기 목록 (Index)을 반환합니다."""
+        return self.labels[self.match_ids(search_text, prefix=prefix)]
+
+    def _chosung_ids(self, query):
+        """초성 검색어(공백 무시)가 초성 키에 들어 있는 고유값 번호."""
+        chosung_query = to_chosung(query)
+        candidates = _intersect_postings(self._chosung_postings, _query_grams(chosung_query))
+        return [value_id for value_id in candidates if chosung_query in self._chosung_keys[value_id]]
+
+    def _fuzzy_hits(self, query):
+        """
+        자모 trigram을 많이 공유하는 후보(최대 FUZZY_MAX_CANDIDATES개)만 골라 편집 거리를 계산합니다.
+        반환: [(고유값 번호, 편집 거리)]
+        """
+        jamo_query = to_jamo(query)
+        query_grams = _ngrams(jamo_query, FUZZY_NGRAM)
+        posting_lists = [self._jamo_postings[gram] for gram in query_grams if gram in self._jamo_postings]
+        if not posting_lists:
+            return []
+        max_distance = max(1, len(jamo_query) // FUZZY_JAMO_PER_EDIT)
+        # 편집 1회는 조각을 최대 FUZZY_NGRAM개 깨뜨리므로, 그보다 적게 공유하는 값은 허용 거리 안에 들 수 없습니다.
+        min_shared = max(1, len(query_grams) - FUZZY_NGRAM * max_distance)
+        shared_counts = np.bincount(np.concatenate(posting_lists), minlength=len(self.labels))
+        candidates = np.flatnonzero(shared_counts >= min_shared)
+        if len(candidates) > FUZZY_MAX_CANDIDATES:
+            top = np.argpartition(-shared_counts[candidates], FUZZY_MAX_CANDIDATES - 1)[:FUZZY_MAX_CANDIDATES]
+            candidates = candidates[top]
+        hits = []
+        for value_id in candidates:
+            distance = bounded_substring_distance(jamo_query, self._jamo_keys[value_id], max_distance)
+            if distance is not None:
+                hits.append((int(value_id), distance))
+        return hits
+
+    def search(self, search_text, limit=None, fuzzy=True):
+        """
+        순위가 매겨진 검색 결과 [SearchHit(value_id, label, match, distance)]를 반환합니다.
+        일치/앞부분 일치/부분 일치와 (초성만 입력했다면) 초성 일치를 모으고,
+        아무것도 없을 때만 fuzzy=True이면 오타를 허용하는 유사 검색을 합니다. limit개까지만 반환합니다.
+        """
+        query = normalize_search_text(search_text)
+        if not query:
+            return []
+        ranked = {}
+        for value_id in self.match_ids(query):
+            key = self._keys[value_id]
+            match = MATCH_EXACT if key == query else (MATCH_PREFIX if key.startswith(query) else MATCH_CONTAINS)
+            ranked[int(value_id)] = (match, 0)
+        if is_chosung_query(query):
+            for value_id in self._chosung_ids(query):
+                ranked.setdefault(int(value_id), (MATCH_CHOSUNG, 0))
+        if fuzzy and not ranked and len(to_jamo(query)) >= FUZZY_NGRAM:
+            for value_id, distance in self._fuzzy_hits(query):
+                ranked[value_id] = (MATCH_FUZZY, distance)
+
+        order = sorted(ranked, key=lambda value_id: (_MATCH_RANK[ranked[value_id][0]], ranked[value_id][1], len(self._keys[value_id]), value_id))
+        if limit is not None:
+            order = order[:limit]
+        return [SearchHit(value_id, self.labels[value_id], ranked[value_id][0], ranked[value_id][1]) for value_id in order]
+
+    def search_ids(self, search_text, limit=None, fuzzy=True):
+        """search 결과의 고유값 번호를 순위 순 배열로 반환합니다."""
+        return np.array([hit.value_id for hit in self.search(search_text, limit=limit, fuzzy=fuzzy)], dtype=np.int64)
+
+    def rows_for_ids(self, value_ids, sort_rows=True):
+        """
+        고유값 번호들에 해당하는 원래 values의 행 위치 배열을 반환합니다.
+        sort_rows=False이면 value_ids 순서(검색 순위)대로, 같은 값의 행끼리는 원래 순서로 둡니다.
+        """
+        value_ids = np.asarray(value_ids, dtype=np.int64)
+        if not len(value_ids):
+            return _EMPTY_IDS
+        starts = self._row_offsets[value_ids]
+        ends = self._row_offsets[value_ids + 1]
+        rows = np.concatenate([self._row_order[start:end] for start, end in zip(starts, ends)])
+        if sort_rows:
+            rows.sort()
+        return rows
+
+    def match_rows(self, search_text, prefix=False):
+        """search_text가 들어 있는 행의 위치(iloc용)를 오름차순 배열로 반환합니다."""
+        return self.rows_for_ids(self.match_ids(search_text, prefix=prefix))
+
+    def search_rows(self, search_text, limit=None, fuzzy=True):
+        """search 결과에 해당하는 행 위치(iloc용)를 검색 순위 순으로 반환합니다. limit은 고유값 개수 기준입니다."""
+        return self.rows_for_ids(self.search_ids(search_text, limit=limit, fuzzy=fuzzy), sort_rows=False)
+
+
+def build_search_indexes(df, columns):
+    """df의 컬럼별 SearchIndex를 {컬럼 이름: SearchIndex}로 만듭니다 (없는 컬럼은 건너뜀)."""
+    if df is None:
+        return {}
+    return {col: SearchIndex(df[col]) for col in columns if col in df.columns}
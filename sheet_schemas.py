@@ -0,0 +1,129 @@
+# sheet_schemas.py (시트 유형별 읽기 스키마 등록부)
+#
+# SM재고현황 스냅샷, 매출내역(s-list), 매입내역(p-list), ERP 재고현황, 거래처주소데이터 시트마다
+# 사용하는 컬럼, 컬럼 종류, 원본 파일의 다른 컬럼 표기(별칭)를 한곳에 정리합니다.
+# read_excel_sheet(..., schema=이름)으로 읽으면 필요한 컬럼만 읽고(usecols),
+# 상품코드 같은 코드/문자열 컬럼은 처음부터 문자열로 읽으므로(dtype=str) '1234.0' 같은 값이 생기지 않습니다.
+# 별칭 컬럼은 표준 이름으로 바뀌므로 로더들은 '상 품 명'/'상  품  명' 등을 따로 처리할 필요가 없습니다.
+
+import hashlib
+import pandas as pd
+
+# 컬럼 종류
+CODE = 'code'      # 식별 코드 (문자열로 읽고 앞뒤 공백 제거, 빈 칸은 NaN 유지)
+TEXT = 'text'      # 일반 문자열 (문자열로 읽고 앞뒤 공백 제거, 빈 칸은 NaN 유지)
+NUMBER = 'number'  # 숫자 (pd.to_numeric, 변환 불가 값은 NaN)
+DATE = 'date'      # 일자 (엑셀 값 그대로 읽음, 해석은 각 로더에서)
+
+# 원본 파일들에 나타나는 컬럼 표기 -> 표준 컬럼 이름
+COMMON_COLUMN_ALIASES = {
+    '상 품 명': '상품명',
+    '상  품  명': '상품명',
+    '지 점 명': '지점명',
+}
+
+
+class SheetSchema:
+    """
+    시트 유형 하나의 읽기 규칙입니다.
+    columns: 표준 컬럼 이름 -> 컬럼 종류 (CODE / TEXT / NUMBER / DATE)
+    required: 이 유형의 시트라면 반드시 있어야 하는 표준 컬럼 이름
+    aliases: 원본 컬럼 표기 -> 표준 컬럼 이름 (columns에 있는 컬럼의 별칭만 사용)
+    """
+    def __init__(self, name, columns, required=(), aliases=None):
+        self.name = name
+        self.columns = dict(columns)
+        self.required = tuple(required)
+        alias_map = COMMON_COLUMN_ALIASES if aliases is None else aliases
+        self.aliases = {alias: col for alias, col in alias_map.items() if col in self.columns}
+        self._source_columns = set(self.columns) | set(self.aliases)
+        # 스키마가 바뀌면 sheet_store에 저장된 이전 스키마의 사본을 쓰지 않도록 정의 내용을 변형 이름에 넣습니다.
+        definition = repr((sorted(self.columns.items()), sorted(self.aliases.items())))
+        self.store_variant = f"schema_{name}_{hashlib.sha1(definition.encode('utf-8')).hexdigest()[:8]}"
+
+    def _source_names_of_kind(self, *kinds):
+        return [src for src in self._source_columns if self.columns[self.aliases.get(src, src)] in kinds]
+
+    def usecols(self, column_name):
+        """pd.read_excel의 usecols로 쓰는 함수입니다. 스키마에 있는 컬럼(별칭 포함)만 읽습니다."""
+        return column_name in self._source_columns
+
+    def read_kwargs(self):
+        """pd.read_excel / ExcelFile.parse에 넘길 usecols, dtype 인자를 반환합니다."""
+        return {
+            'usecols': self.usecols,
+            'dtype': {src: str for src in self._source_names_of_kind(CODE, TEXT)},
+        }
+
+    def normalize(self, df):
+        """
+        읽은 시트의 별칭 컬럼을 표준 이름으로 바꾸고 컬럼 종류에 맞게 정리합니다 (df를 직접 수정하여 반환).
+        표준 이름 컬럼이 이미 있으면 별칭 컬럼은 그대로 둡니다.
+        """
+        rename_map = {alias: col for alias, col in self.aliases.items() if alias in df.columns and col not in df.columns}
+        if rename_map:
+            df.rename(columns=rename_map, inplace=True)
+        for col, kind in self.columns.items():
+            if col not in df.columns:
+                continue
+            if kind in (CODE, TEXT):
+                if df[col].dtype == object:
+                    df[col] = df[col].str.strip()
+            elif kind == NUMBER:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+
+    def missing_columns(self, df):
+        """required 중 df에 없는 컬럼 목록을 반환합니다."""
+        return [col for col in self.required if col not in df.columns]
+
+
+SM_SNAPSHOT_SCHEMA = SheetSchema(
+    'sm_snapshot',
+    columns={
+        '번호': TEXT, '상품코드': CODE, '상품명': TEXT, '지점명': TEXT,
+        '잔량(박스)': NUMBER, '잔량(Kg)': NUMBER,
+        '소비기한': TEXT, '입고일자': DATE, 'Box': NUMBER, '입고(Kg)': NUMBER, '잔여일수': NUMBER,
+    },
+    required=['지점명', '상품코드', '잔량(박스)', '잔량(Kg)'],
+)
+
+SALES_LOG_SCHEMA = SheetSchema(
+    's-list',
+    columns={
+        '매출일자': DATE, '거래처명': TEXT, '상품코드': CODE, '상품명': TEXT, '지점명': TEXT,
+        '수량(Box)': NUMBER, '수량(Kg)': NUMBER, '매출단가': NUMBER, '매출금액': NUMBER,
+    },
+    required=['매출일자'],
+)
+
+PURCHASE_LOG_SCHEMA = SheetSchema(
+    'p-list',
+    columns={
+        '매입일자': DATE, '코드': TEXT, '거래처명': TEXT, '상품코드': CODE, '상품명': TEXT, '지점명': TEXT,
+        'Box': NUMBER, 'Kg': NUMBER,
+    },
+    required=['매입일자'],
+)
+
+ERP_STOCK_SCHEMA = SheetSchema(
+    'erp_stock',
+    columns={'호실': TEXT, '상품코드': CODE, '품목명': TEXT, '수량': NUMBER, '중량': NUMBER},
+    required=['호실', '상품코드', '품목명', '수량', '중량'],
+)
+
+CUSTOMER_SCHEMA = SheetSchema(
+    'customer',
+    columns={'거래처명': TEXT, '주소': TEXT, '위도': NUMBER, '경도': NUMBER, '담당자': TEXT},
+    required=['거래처명', '주소', '위도', '경도'],
+)
+
+SHEET_SCHEMAS = {
+    schema.name: schema
+    for schema in (SM_SNAPSHOT_SCHEMA, SALES_LOG_SCHEMA, PURCHASE_LOG_SCHEMA, ERP_STOCK_SCHEMA, CUSTOMER_SCHEMA)
+}
+
+
+def get_sheet_schema(schema_name):
+    """이름으로 등록된 SheetSchema를 반환합니다. 없는 이름이면 KeyError."""
+    return SHEET_SCHEMAS[schema_name]
@@ -0,0 +1,141 @@
+# sheet_store.py (엑셀 시트 Parquet 사이드카 저장소)
+#
+# Google Drive 엑셀 파일의 각 시트를 파일 버전별로 한 번만 파싱하여 로컬 Parquet 파일로 저장합니다.
+# 같은 버전의 시트를 다시 읽을 때는 openpyxl 파싱 대신 Parquet를 읽으므로 훨씬 빠르며,
+# 디스크에 남아 있으므로 Streamlit 재시작 후에도 유지됩니다.
+# 저장소 전체 크기가 상한을 넘으면 가장 오래 사용되지 않은 파일부터 삭제합니다 (LRU).
+
+import os
+import hashlib
+import threading
+import pandas as pd
+
+# Parquet 엔진(pyarrow)이 없으면 저장소를 사용하지 않고 항상 엑셀 파싱으로 동작합니다.
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+SHEET_STORE_DIR = os.environ.get(
+    "KMEAT_SHEET_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sheet_store")
+)
+SHEET_STORE_MAX_BYTES = int(os.environ.get("KMEAT_SHEET_STORE_MAX_MB", "512")) * 1024 * 1024
+
+# pyarrow가 그대로 저장할 수 있는 object 컬럼 유형 (그 외 혼합형은 문자열로 변환하여 저장)
+_ARROW_SAFE_INFERRED_TYPES = {
+    'string', 'empty', 'boolean', 'integer', 'floating', 'mixed-integer-float',
+    'decimal', 'date', 'datetime', 'datetime64', 'bytes'
+}
+
+_store_lock = threading.Lock()
+
+
+def _sheet_store_path(file_id, file_version, sheet_name, variant="raw"):
+    """(파일 ID, 파일 버전, 시트 이름, 변형) 조합에 해당하는 Parquet 파일 경로를 반환합니다."""
+    key = f"{file_id}|{file_version}|{sheet_name!r}|{variant}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(SHEET_STORE_DIR, str(file_id), f"{digest}.parquet")
+
+
+def prepare_for_parquet(df):
+    """
+    Parquet로 저장할 수 있도록 DataFrame을 정리합니다.
+    숫자와 문자열이 섞인 object 컬럼(예: 상품코드)은 값이 있는 칸만 str()로 변환합니다.
+    이후 로더들이 수행하는 astype(str) / pd.to_numeric 결과는 변환 전과 같습니다.
+    컬럼 이름이 문자열이 아니면 저장할 수 없으므로 None을 반환합니다.
+    """
+    if not all(isinstance(col, str) for col in df.columns) or not df.columns.is_unique:
+        return None
+    df_out = df
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        if pd.api.types.infer_dtype(df[col], skipna=True) in _ARROW_SAFE_INFERRED_TYPES:
+            continue
+        if df_out is df:
+            df_out = df.copy()
+        df_out[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df_out
+
+
+def load_stored_sheet(file_id, file_version, sheet_name, variant="raw"):
+    """
+    저장소에서 시트 DataFrame을 읽어옵니다. 저장된 것이 없거나 읽을 수 없으면 None을 반환합니다.
+    읽은 파일은 수정 시각을 갱신하여 LRU 삭제 대상에서 뒤로 밀립니다.
+    """
+    if not PARQUET_AVAILABLE or not file_version:
+        return None
+    path = _sheet_store_path(file_id, file_version, sheet_name, variant)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+        os.utime(path, None)
+        return df
+    except Exception:
+        # 손상된 파일은 삭제하고 엑셀 파싱으로 대체합니다.
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def save_stored_sheet(file_id, file_version, sheet_name, df, variant="raw"):
+    """
+    시트 DataFrame을 저장소에 기록합니다. 저장에 실패해도 예외를 올리지 않습니다 (캐시일 뿐이므로).
+    임시 파일에 쓴 뒤 교체하므로 동시에 읽는 쪽이 반쯤 쓰인 파일을 보지 않습니다.
+    """
+    if not PARQUET_AVAILABLE or not file_version or df is None:
+        return False
+    df_to_store = prepare_for_parquet(df)
+    if df_to_store is None:
+        return False
+    path = _sheet_store_path(file_id, file_version, sheet_name, variant)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df_to_store.to_parquet(tmp_path, index=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+    evict_sheet_store()
+    return True
+
+
+def evict_sheet_store(max_bytes=None):
+    """저장소 전체 크기가 상한을 넘으면 가장 오래 사용되지 않은 Parquet 파일부터 삭제합니다."""
+    max_bytes = SHEET_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(SHEET_STORE_DIR):
+        return
+    with _store_lock:
+        entries = []
+        total_bytes = 0
+        for root, _dirs, files in os.walk(SHEET_STORE_DIR):
+            for name in files:
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_bytes += stat.st_size
+        if total_bytes <= max_bytes:
+            return
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except OSError:
+                pass
@@ -0,0 +1,214 @@
+# sm_history.py (SM재고현황 일자별 스냅샷 이력 저장소)
+#
+# SM재고현황 파일의 'YYYYMMDD' 시트들을 [날짜, 상품코드, 지점명]별 잔량(박스)/잔량(Kg)만 남긴
+# 긴 형식(long format) 표로 한 번씩만 변환하여 보관합니다.
+# 각 시트는 시트 지문(zip 안 워크시트 XML의 CRC)을 키로 sheet_store에도 저장되므로,
+# 파일에 새 날짜 시트가 추가되어도 이미 변환한 과거 시트는 다시 파싱하지 않고 재시작 후에도 유지됩니다.
+# 품목별 조회는 상품코드로 정렬된 색인에서 잘라내기만 하므로 기간이 길어도 빠릅니다.
+
+import datetime
+import threading
+import pandas as pd
+import streamlit as st
+
+from common_utils import get_drive_file_version, get_excel_sheet_index, read_excel_sheet
+from sheet_store import load_stored_sheet, save_stored_sheet
+from sheet_schemas import SM_SNAPSHOT_SCHEMA
+
+SM_HISTORY_STORE_VARIANT = "sm_history_v2"
+
+SM_HISTORY_DATE_COL = '날짜'
+SM_HISTORY_PROD_CODE_COL = '상품코드'
+SM_HISTORY_LOCATION_COL = '지점명'
+SM_HISTORY_QTY_COL = '잔량(박스)'
+SM_HISTORY_WGT_COL = '잔량(Kg)'
+SM_HISTORY_COLUMNS = [SM_HISTORY_DATE_COL, SM_HISTORY_PROD_CODE_COL, SM_HISTORY_LOCATION_COL, SM_HISTORY_QTY_COL, SM_HISTORY_WGT_COL]
+
+
+def _empty_history_frame():
+    return pd.DataFrame({
+        SM_HISTORY_DATE_COL: pd.Series(dtype='datetime64[ns]'),
+        SM_HISTORY_PROD_CODE_COL: pd.Series(dtype=object),
+        SM_HISTORY_LOCATION_COL: pd.Series(dtype=object),
+        SM_HISTORY_QTY_COL: pd.Series(dtype='float64'),
+        SM_HISTORY_WGT_COL: pd.Series(dtype='float64'),
+    })
+
+
+def compact_sm_sheet(df_sheet, sheet_date):
+    """
+    SM재고현황 시트 하나를 [날짜, 상품코드, 지점명]별 잔량 합계로 줄입니다.
+    df_sheet는 SM_SNAPSHOT_SCHEMA로 읽은 시트여야 합니다 (상품코드/지점명은 문자열, 잔량은 숫자).
+    필요한 컬럼이 없는 시트는 빈 표가 됩니다 (해당 날짜는 재고 0으로 취급).
+    """
+    if SM_SNAPSHOT_SCHEMA.missing_columns(df_sheet):
+        return _empty_history_frame()
+    df_sheet = df_sheet.dropna(how='all')
+    if df_sheet.empty:
+        return _empty_history_frame()
+
+    df_compact = pd.DataFrame({
+        SM_HISTORY_PROD_CODE_COL: df_sheet[SM_HISTORY_PROD_CODE_COL],
+        SM_HISTORY_LOCATION_COL: df_sheet[SM_HISTORY_LOCATION_COL],
+        SM_HISTORY_QTY_COL: df_sheet[SM_HISTORY_QTY_COL].fillna(0),
+        SM_HISTORY_WGT_COL: df_sheet[SM_HISTORY_WGT_COL].fillna(0),
+    })
+    # 코드/지점이 빈 행도 지점별 합계에 들어가도록 dropna=False로 묶습니다.
+    df_compact = df_compact.groupby([SM_HISTORY_PROD_CODE_COL, SM_HISTORY_LOCATION_COL], sort=False, as_index=False, dropna=False)[[SM_HISTORY_QTY_COL, SM_HISTORY_WGT_COL]].sum()
+    df_compact.insert(0, SM_HISTORY_DATE_COL, pd.Timestamp(sheet_date).normalize())
+    return df_compact[SM_HISTORY_COLUMNS]
+
+
+class SmSnapshotHistory:
+    """
+    한 SM재고현황 파일의 일자별 스냅샷 이력입니다 (파일 버전과 무관하게 파일당 하나).
+    시트 이름별로 (시트 지문, 변환된 표)를 보관하며, 지문이 그대로인 시트는 다시 변환하지 않습니다.
+    반환하는 DataFrame은 모든 세션이 공유하므로 호출자는 수정하지 않아야 합니다.
+    """
+    def __init__(self, file_id):
+        self.file_id = file_id
+        self._lock = threading.RLock()
+        self._parts = {}  # 시트 이름 -> (시트 지문, 변환된 표)
+        self._by_product = None  # 상품코드로 정렬된 전체 이력 (변경 시 다시 만듦)
+
+    def ensure_sheets(self, drive_service, sheet_names, file_name_for_error_msg, file_version=None):
+        """
+        요청한 날짜 시트들이 file_version(주지 않으면 현재 버전) 파일 내용 기준으로 변환되어 있도록 합니다.
+        시트 지문과 시트 파싱은 같은 버전에서 읽으므로, 도중에 새 버전이 올라와도 다른 버전의 내용이 이전 지문으로 저장되지 않습니다.
+        파일에 없는 시트 이름은 건너뛰며, 실제로 이력에 있는 시트 이름 목록을 반환합니다. 실패 시 None.
+        """
+        if file_version is None:
+            file_version = get_drive_file_version(drive_service, self.file_id, file_name_for_error_msg)
+            if file_version is None:
+                return None
+        sheet_index = get_excel_sheet_index(drive_service, self.file_id, file_name_for_error_msg, file_version)
+        if sheet_index is None:
+            return None
+        fingerprints = dict(sheet_index)
+
+        with self._lock:
+            available_names = []
+            for sheet_name in sheet_names:
+                fingerprint = fingerprints.get(sheet_name)
+                if fingerprint is None:
+                    continue
+                part = self._parts.get(sheet_name)
+                if part is None or part[0] != fingerprint:
+                    df_compact = self._load_part(drive_service, sheet_name, fingerprint, file_version, file_name_for_error_msg)
+                    if df_compact is None:
+                        return None
+                    self._parts[sheet_name] = (fingerprint, df_compact)
+                    self._by_product = None
+                available_names.append(sheet_name)
+            return available_names
+
+    def _load_part(self, drive_service, sheet_name, fingerprint, file_version, file_name_for_error_msg):
+        df_compact = load_stored_sheet(self.file_id, fingerprint, sheet_name, SM_HISTORY_STORE_VARIANT)
+        if df_compact is not None:
+            return df_compact
+        try:
+            sheet_date = datetime.datetime.strptime(sheet_name, "%Y%m%d").date()
+        except ValueError:
+            return None
+        df_sheet = read_excel_sheet(drive_service, self.file_id, sheet_name, file_name_for_error_msg, keep=False, schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+        if df_sheet is None:
+            return None
+        df_compact = compact_sm_sheet(df_sheet, sheet_date)
+        save_stored_sheet(self.file_id, fingerprint, sheet_name, df_compact, SM_HISTORY_STORE_VARIANT)
+        return df_compact
+
+    def rows_for_sheets(self, sheet_names):
+        """ensure_sheets로 준비한 시트들의 이력 행을 날짜 순서대로 이어 붙여 반환합니다."""
+        with self._lock:
+            frames = [self._parts[name][1] for name in sheet_names if name in self._parts]
+        if not frames:
+            return _empty_history_frame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _product_index(self):
+        with self._lock:
+            if self._by_product is None:
+                frames = [part[1] for part in self._parts.values()]
+                df_all = pd.concat(frames, ignore_index=True) if frames else _empty_history_frame()
+                self._by_product = df_all.set_index(SM_HISTORY_PROD_CODE_COL).sort_index()
+            return self._by_product
+
+    def product_rows(self, product_code, sheet_names):
+        """ensure_sheets로 준비한 시트들 중 한 상품코드의 이력 행만 색인에서 잘라 반환합니다."""
+        by_product = self._product_index()
+        if product_code not in by_product.index:
+            return _empty_history_frame()
+        df_product = by_product.loc[[product_code]].reset_index()
+        dates = pd.to_datetime(list(sheet_names), format="%Y%m%d")
+        return df_product[df_product[SM_HISTORY_DATE_COL].isin(dates)][SM_HISTORY_COLUMNS]
+
+
+@st.cache_resource(show_spinner=False)
+def get_sm_history(file_id):
+    """파일 ID마다 하나의 SmSnapshotHistory를 프로세스 전체에서 공유합니다."""
+    return SmSnapshotHistory(file_id)
+
+
+def load_sm_history_rows(drive_service, file_id, date_strings_yyyymmdd_list, file_name_for_error_msg="SM재고현황", file_version=None):
+    """
+    지정한 날짜(YYYYMMDD) 시트들의 [날짜, 상품코드, 지점명, 잔량(박스), 잔량(Kg)] 이력 행을 반환합니다.
+    파일에 없는 날짜는 건너뛰며, 읽을 수 있는 날짜가 하나도 없거나 실패하면 None을 반환합니다.
+    file_version을 주면 그 버전의 시트를 읽습니다 (버전별 캐시 함수는 캐시 키로 쓴 버전을 넘겨야 합니다).
+    """
+    if drive_service is None or not date_strings_yyyymmdd_list:
+        return None
+    history = get_sm_history(file_id)
+    try:
+        sheet_names = history.ensure_sheets(drive_service, list(date_strings_yyyymmdd_list), file_name_for_error_msg, file_version)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 재고 이력을 만드는 중 오류 발생: {e}")
+        return None
+    if not sheet_names:
+        return None
+    return history.rows_for_sheets(sheet_names)
+
+
+def get_sm_product_history(drive_service, file_id, product_code, start_date, end_date, file_name_for_error_msg="SM재고현황"):
+    """
+    한 상품코드의 start_date~end_date 기간 일자별 총 재고(전 지점 합계)를 반환합니다.
+    반환 컬럼: ['일자', '재고량(박스)', '재고량(Kg)']. 해당 날짜 시트에 품목이 없으면 0으로 채웁니다.
+    """
+    if drive_service is None or not product_code:
+        return pd.DataFrame()
+    # 시트 목록과 시트 변환이 같은 버전을 쓰도록 버전을 한 번만 확인합니다.
+    file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+    if file_version is None:
+        return pd.DataFrame()
+    sheet_index = get_excel_sheet_index(drive_service, file_id, file_name_for_error_msg, file_version)
+    if not sheet_index:
+        return pd.DataFrame()
+
+    wanted_sheets = []
+    for sheet_name, _fingerprint in sheet_index:
+        try:
+            sheet_date = datetime.datetime.strptime(sheet_name, "%Y%m%d").date()
+        except (ValueError, TypeError):
+            continue
+        if start_date <= sheet_date <= end_date:
+            wanted_sheets.append(sheet_name)
+    if not wanted_sheets:
+        return pd.DataFrame()
+
+    history = get_sm_history(file_id)
+    try:
+        sheet_names = history.ensure_sheets(drive_service, sorted(wanted_sheets), file_name_for_error_msg, file_version)
+    except Exception:
+        return pd.DataFrame()
+    if not sheet_names:
+        return pd.DataFrame()
+
+    df_product = history.product_rows(product_code, sheet_names)
+    daily_totals = df_product.groupby(SM_HISTORY_DATE_COL)[[SM_HISTORY_QTY_COL, SM_HISTORY_WGT_COL]].sum()
+    all_dates = pd.DatetimeIndex(pd.to_datetime(sheet_names, format="%Y%m%d"), name=SM_HISTORY_DATE_COL)
+    daily_totals = daily_totals.reindex(all_dates, fill_value=0).sort_index()
+
+    return pd.DataFrame({
+        '일자': daily_totals.index.date,
+        '재고량(박스)': daily_totals[SM_HISTORY_QTY_COL].to_numpy(),
+        '재고량(Kg)': daily_totals[SM_HISTORY_WGT_COL].to_numpy(),
+    })
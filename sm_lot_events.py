@@ -0,0 +1,446 @@
+# sm_lot_events.py (SM재고현황 입고번호(로트)별 이동 이벤트 저장소)
+#
+# 연속한 두 'YYYYMMDD' 스냅샷 시트를 (번호, 상품코드)로 정렬·병합하여 비교하고,
+# 로트마다 무엇이 바뀌었는지를 작은 이벤트 표로 남깁니다.
+# - 입고: 이전 스냅샷에 없던(잔량 0) 로트가 나타남
+# - 부분출고: 잔량이 줄었지만 남아 있음
+# - 소진: 잔량이 0이 되거나 목록에서 사라짐
+# - 수량정정: 기존 로트의 잔량이 늘어남 (입고가 아닌 재고 조정)
+# - 기초재고: 파일의 첫 스냅샷에 이미 있던 로트 (비교할 이전 시트가 없음)
+# 필요한 컬럼이 없는 시트는 읽을 수 없는 시트로 보고 건너뛰며, 다음 시트는 그 이전의 마지막 정상 시트와 비교합니다.
+#
+# 이벤트는 (이전 시트 지문, 현재 시트 지문) 쌍마다 한 번만 계산하여 sheet_store에 저장하므로,
+# 새 날짜 시트가 추가되면 그 시트와 직전 시트의 비교만 새로 합니다 (재시작 후에도 유지).
+# 로트 수명/경과일수/회전 조회는 여러 스냅샷 전체를 다시 읽지 않고, 기간 직전 시트의 로트 스냅샷 하나와 이벤트 표만으로 계산합니다.
+
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from common_utils import get_drive_file_version, get_excel_sheet_index, read_excel_sheet
+from sheet_store import load_stored_sheet, save_stored_sheet
+from sheet_schemas import SM_SNAPSHOT_SCHEMA
+
+# v2: 필요한 컬럼이 없는 시트를 빈 스냅샷으로 저장하지 않고 건너뜁니다 (v1에 저장된 거짓 소진/입고 이벤트는 버림).
+SM_LOT_STORE_VARIANT = "sm_lots_v2"
+SM_LOT_EVENT_STORE_VARIANT = "sm_lot_events_v2"
+
+LOT_NUMBER_COL = '번호'
+LOT_PROD_CODE_COL = '상품코드'
+LOT_PROD_NAME_COL = '상품명'
+LOT_LOCATION_COL = '지점명'
+LOT_RECEIPT_DATE_COL = '입고일자'
+LOT_QTY_COL = '잔량(박스)'
+LOT_WGT_COL = '잔량(Kg)'
+LOT_KEYS = [LOT_NUMBER_COL, LOT_PROD_CODE_COL]
+LOT_COLUMNS = LOT_KEYS + [LOT_PROD_NAME_COL, LOT_LOCATION_COL, LOT_RECEIPT_DATE_COL, LOT_QTY_COL, LOT_WGT_COL]
+
+EVENT_DATE_COL = '날짜'
+EVENT_PREV_DATE_COL = '이전 날짜'
+EVENT_TYPE_COL = '이벤트'
+EVENT_QTY_CHANGE_COL = '변동(박스)'
+EVENT_WGT_CHANGE_COL = '변동(Kg)'
+EVENT_COLUMNS = [EVENT_DATE_COL, EVENT_PREV_DATE_COL, EVENT_TYPE_COL] + LOT_KEYS + [
+    LOT_PROD_NAME_COL, LOT_LOCATION_COL, LOT_RECEIPT_DATE_COL,
+    EVENT_QTY_CHANGE_COL, EVENT_WGT_CHANGE_COL, LOT_QTY_COL, LOT_WGT_COL,
+]
+
+EVENT_OPENING = '기초재고'
+EVENT_APPEARED = '입고'
+EVENT_PARTIAL = '부분출고'
+EVENT_EMPTIED = '소진'
+EVENT_CORRECTED = '수량정정'
+EVENT_TYPES = [EVENT_APPEARED, EVENT_PARTIAL, EVENT_EMPTIED, EVENT_CORRECTED, EVENT_OPENING]
+
+LOT_QTY_TOLERANCE = 1e-6 # 이 값 이하의 잔량 변화는 변동으로 보지 않습니다.
+
+# 로트 수명 표 컬럼
+LIFECYCLE_FIRST_SEEN_COL = '최초 확인일'
+LIFECYCLE_LAST_SEEN_COL = '최종 확인일'
+LIFECYCLE_EMPTIED_COL = '소진일'
+LIFECYCLE_START_QTY_COL = '최초 잔량(박스)'
+LIFECYCLE_START_WGT_COL = '최초 잔량(Kg)'
+LIFECYCLE_CORRECTIONS_COL = '정정 횟수'
+LIFECYCLE_DAYS_COL = '보유일수'
+
+# 품목별 회전 표 컬럼
+TURNOVER_EMPTIED_LOTS_COL = '소진 로트 수'
+TURNOVER_AVG_DAYS_COL = '평균 소진일수'
+TURNOVER_OPEN_LOTS_COL = '보유 로트 수'
+TURNOVER_OPEN_AGE_COL = '보유 로트 평균 경과일수'
+
+
+def _empty_lot_frame():
+    return pd.DataFrame({
+        LOT_NUMBER_COL: pd.Series(dtype=object), LOT_PROD_CODE_COL: pd.Series(dtype=object),
+        LOT_PROD_NAME_COL: pd.Series(dtype=object), LOT_LOCATION_COL: pd.Series(dtype=object),
+        LOT_RECEIPT_DATE_COL: pd.Series(dtype='datetime64[ns]'),
+        LOT_QTY_COL: pd.Series(dtype='float64'), LOT_WGT_COL: pd.Series(dtype='float64'),
+    })
+
+
+def _empty_event_frame():
+    df_events = _empty_lot_frame().assign(**{
+        EVENT_DATE_COL: pd.Series(dtype='datetime64[ns]'), EVENT_PREV_DATE_COL: pd.Series(dtype='datetime64[ns]'),
+        EVENT_TYPE_COL: pd.Series(dtype=object),
+        EVENT_QTY_CHANGE_COL: pd.Series(dtype='float64'), EVENT_WGT_CHANGE_COL: pd.Series(dtype='float64'),
+    })
+    return df_events[EVENT_COLUMNS]
+
+
+def compact_lot_sheet(df_sheet):
+    """
+    SM재고현황 시트 하나를 (번호, 상품코드)별 잔량 합계로 줄이고 키 순서로 정렬합니다.
+    df_sheet는 SM_SNAPSHOT_SCHEMA로 읽은 시트여야 합니다. 번호가 빈 행은 번호 ''로 묶습니다.
+    필요한 컬럼이 없는 시트는 None을 반환합니다 (빈 표로 보면 모든 로트가 소진된 것처럼 비교되므로 읽을 수 없는 시트로 취급).
+    """
+    if SM_SNAPSHOT_SCHEMA.missing_columns(df_sheet) or LOT_NUMBER_COL not in df_sheet.columns:
+        return None
+    df_sheet = df_sheet.dropna(how='all')
+    if df_sheet.empty:
+        return _empty_lot_frame()
+
+    df_lots = pd.DataFrame({
+        LOT_NUMBER_COL: df_sheet[LOT_NUMBER_COL].fillna(''),
+        LOT_PROD_CODE_COL: df_sheet[LOT_PROD_CODE_COL].fillna(''),
+        LOT_PROD_NAME_COL: df_sheet[LOT_PROD_NAME_COL] if LOT_PROD_NAME_COL in df_sheet.columns else '',
+        LOT_LOCATION_COL: df_sheet[LOT_LOCATION_COL],
+        LOT_RECEIPT_DATE_COL: pd.to_datetime(df_sheet[LOT_RECEIPT_DATE_COL], errors='coerce') if LOT_RECEIPT_DATE_COL in df_sheet.columns else pd.NaT,
+        LOT_QTY_COL: df_sheet[LOT_QTY_COL].fillna(0),
+        LOT_WGT_COL: df_sheet[LOT_WGT_COL].fillna(0),
+    })
+    return df_lots.groupby(LOT_KEYS, sort=True, as_index=False).agg(**{
+        LOT_PROD_NAME_COL: (LOT_PROD_NAME_COL, 'first'),
+        LOT_LOCATION_COL: (LOT_LOCATION_COL, 'first'),
+        LOT_RECEIPT_DATE_COL: (LOT_RECEIPT_DATE_COL, 'min'),
+        LOT_QTY_COL: (LOT_QTY_COL, 'sum'),
+        LOT_WGT_COL: (LOT_WGT_COL, 'sum'),
+    })[LOT_COLUMNS]
+
+
+def _has_stock(qty, wgt):
+    return (np.abs(qty) > LOT_QTY_TOLERANCE) | (np.abs(wgt) > LOT_QTY_TOLERANCE)
+
+
+def diff_lot_snapshots(df_previous, df_current, sheet_date, previous_date=None):
+    """
+    두 로트 스냅샷(compact_lot_sheet 결과)을 (번호, 상품코드)로 정렬·병합하여 이벤트 표를 만듭니다.
+    df_previous가 None이면 df_current의 잔량이 있는 로트를 모두 '기초재고'로 남깁니다.
+    잔량이 그대로인 로트는 이벤트를 만들지 않습니다.
+    """
+    sheet_date = pd.Timestamp(sheet_date).normalize()
+    if df_previous is None:
+        df_opening = df_current[_has_stock(df_current[LOT_QTY_COL].to_numpy(), df_current[LOT_WGT_COL].to_numpy())]
+        return df_opening.assign(**{
+            EVENT_DATE_COL: sheet_date, EVENT_PREV_DATE_COL: pd.NaT, EVENT_TYPE_COL: EVENT_OPENING,
+            EVENT_QTY_CHANGE_COL: df_opening[LOT_QTY_COL], EVENT_WGT_CHANGE_COL: df_opening[LOT_WGT_COL],
+        })[EVENT_COLUMNS].reset_index(drop=True)
+
+    # 두 스냅샷 모두 키 순서로 정렬되어 있으므로 정렬 병합 한 번으로 짝을 맞춥니다.
+    merged = pd.merge(df_previous, df_current, on=LOT_KEYS, how='outer', sort=True, suffixes=('_prev', ''))
+    prev_qty = merged[f'{LOT_QTY_COL}_prev'].fillna(0).to_numpy(dtype='float64')
+    prev_wgt = merged[f'{LOT_WGT_COL}_prev'].fillna(0).to_numpy(dtype='float64')
+    cur_qty = merged[LOT_QTY_COL].fillna(0).to_numpy(dtype='float64')
+    cur_wgt = merged[LOT_WGT_COL].fillna(0).to_numpy(dtype='float64')
+    qty_change, wgt_change = cur_qty - prev_qty, cur_wgt - prev_wgt
+
+    had_stock, has_stock = _has_stock(prev_qty, prev_wgt), _has_stock(cur_qty, cur_wgt)
+    kept = had_stock & has_stock
+    increased = (qty_change > LOT_QTY_TOLERANCE) | (wgt_change > LOT_QTY_TOLERANCE)
+    decreased = (qty_change < -LOT_QTY_TOLERANCE) | (wgt_change < -LOT_QTY_TOLERANCE)
+    event_types = np.select(
+        [~had_stock & has_stock, had_stock & ~has_stock, kept & increased, kept & decreased],
+        [EVENT_APPEARED, EVENT_EMPTIED, EVENT_CORRECTED, EVENT_PARTIAL],
+        default=''
+    )
+    has_event = event_types != ''
+    if not has_event.any():
+        return _empty_event_frame()
+
+    # 소진된 로트는 현재 스냅샷에 없을 수 있으므로 이름/지점/입고일자를 이전 값으로 채웁니다.
+    df_events = merged[has_event]
+    df_events = pd.DataFrame({
+        EVENT_DATE_COL: sheet_date,
+        EVENT_PREV_DATE_COL: pd.Timestamp(previous_date).normalize() if previous_date is not None else pd.NaT,
+        EVENT_TYPE_COL: event_types[has_event],
+        LOT_NUMBER_COL: df_events[LOT_NUMBER_COL].to_numpy(),
+        LOT_PROD_CODE_COL: df_events[LOT_PROD_CODE_COL].to_numpy(),
+        LOT_PROD_NAME_COL: df_events[LOT_PROD_NAME_COL].fillna(df_events[f'{LOT_PROD_NAME_COL}_prev']).to_numpy(),
+        LOT_LOCATION_COL: df_events[LOT_LOCATION_COL].fillna(df_events[f'{LOT_LOCATION_COL}_prev']).to_numpy(),
+        LOT_RECEIPT_DATE_COL: df_events[LOT_RECEIPT_DATE_COL].fillna(df_events[f'{LOT_RECEIPT_DATE_COL}_prev']).to_numpy(),
+        EVENT_QTY_CHANGE_COL: qty_change[has_event],
+        EVENT_WGT_CHANGE_COL: wgt_change[has_event],
+        LOT_QTY_COL: cur_qty[has_event],
+        LOT_WGT_COL: cur_wgt[has_event],
+    })
+    return df_events[EVENT_COLUMNS]
+
+
+def _sheet_date(sheet_name):
+    try:
+        return datetime.datetime.strptime(sheet_name, "%Y%m%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+class SmLotEventStream:
+    """
+    한 SM재고현황 파일의 로트 이동 이벤트 저장소입니다 (파일 버전과 무관하게 파일당 하나).
+    시트 이름별로 ((이전 시트 지문, 현재 시트 지문), 이벤트 표)를 보관하며, 지문 쌍이 그대로면 다시 비교하지 않습니다.
+    반환하는 DataFrame은 모든 세션이 공유하므로 호출자는 수정하지 않아야 합니다.
+    """
+    def __init__(self, file_id):
+        self.file_id = file_id
+        self._lock = threading.RLock()
+        self._events = {}  # 시트 이름 -> (지문 쌍 키, 이벤트 표)
+        self._readable = {}  # 시트 지문 -> 로트 스냅샷을 만들 수 있는지 (필요한 컬럼이 있는지)
+
+    def ensure_sheets(self, drive_service, sheet_names, file_name_for_error_msg, file_version):
+        """
+        요청한 날짜 시트들의 이벤트가 file_version 파일 내용 기준으로 계산되어 있도록 합니다.
+        시트 지문과 시트 파싱은 모두 그 버전에서 읽습니다 (다른 버전의 내용이 지문 키로 저장되지 않음).
+        각 시트는 파일 안에서 그보다 앞선 마지막 정상 시트와 비교합니다. 파일에 없는 시트와 필요한 컬럼이 없는 시트는
+        건너뛰며, 이벤트를 준비한 시트 이름 목록(날짜 순)을 반환합니다. 실패 시 None.
+        """
+        sheet_index = get_excel_sheet_index(drive_service, self.file_id, file_name_for_error_msg, file_version)
+        if sheet_index is None:
+            return None
+        dated_sheets = sorted((name, fingerprint) for name, fingerprint in sheet_index if _sheet_date(name) is not None)
+        position = {name: i for i, (name, _fingerprint) in enumerate(dated_sheets)}
+        wanted = sorted(name for name in set(sheet_names) if name in position)
+
+        with self._lock:
+            lot_snapshots = {} # 이번 호출에서 읽은 로트 스냅샷 (연속한 시트끼리 재사용)
+            prepared = []
+            for sheet_name in wanted:
+                i = position[sheet_name]
+                fingerprint = dated_sheets[i][1]
+                readable = self._sheet_readable(drive_service, dated_sheets[i], file_version, lot_snapshots, file_name_for_error_msg)
+                if readable is None:
+                    return None
+                if not readable:
+                    continue
+                previous = self._previous_readable_sheet(drive_service, dated_sheets[:i], file_version, lot_snapshots, file_name_for_error_msg)
+                if previous is False:
+                    return None
+                pair_key = f"{previous[1] if previous else ''}>{fingerprint}"
+                cached = self._events.get(sheet_name)
+                if cached is None or cached[0] != pair_key:
+                    df_events = load_stored_sheet(self.file_id, pair_key, sheet_name, SM_LOT_EVENT_STORE_VARIANT)
+                    if df_events is None:
+                        df_current = self._lot_snapshot(drive_service, sheet_name, fingerprint, file_version, lot_snapshots, file_name_for_error_msg)
+                        df_previous = None
+                        if previous is not None:
+                            df_previous = self._lot_snapshot(drive_service, previous[0], previous[1], file_version, lot_snapshots, file_name_for_error_msg)
+                        if df_current is None or (previous is not None and df_previous is None):
+                            return None
+                        df_events = diff_lot_snapshots(df_previous, df_current, _sheet_date(sheet_name),
+                                                       _sheet_date(previous[0]) if previous else None)
+                        save_stored_sheet(self.file_id, pair_key, sheet_name, df_events, SM_LOT_EVENT_STORE_VARIANT)
+                    self._events[sheet_name] = (pair_key, df_events)
+                prepared.append(sheet_name)
+            return prepared
+
+    def _sheet_readable(self, drive_service, sheet, file_version, lot_snapshots, file_name_for_error_msg):
+        """(시트 이름, 지문) 시트의 로트 스냅샷을 만들 수 있으면 True, 필요한 컬럼이 없으면 False, 읽지 못하면 None."""
+        sheet_name, fingerprint = sheet
+        if fingerprint not in self._readable:
+            self._lot_snapshot(drive_service, sheet_name, fingerprint, file_version, lot_snapshots, file_name_for_error_msg)
+        return self._readable.get(fingerprint)
+
+    def _previous_readable_sheet(self, drive_service, earlier_sheets, file_version, lot_snapshots, file_name_for_error_msg):
+        """earlier_sheets(날짜 순) 중 마지막 정상 시트 (이름, 지문)를 반환합니다. 없으면 None, 읽지 못하면 False."""
+        for sheet in reversed(earlier_sheets):
+            readable = self._sheet_readable(drive_service, sheet, file_version, lot_snapshots, file_name_for_error_msg)
+            if readable is None:
+                return False
+            if readable:
+                return sheet
+        return None
+
+    def _lot_snapshot(self, drive_service, sheet_name, fingerprint, file_version, lot_snapshots, file_name_for_error_msg):
+        """
+        시트 하나의 로트 스냅샷을 저장소에서 읽거나, 없으면 시트를 파싱하여 만들고 저장합니다.
+        읽지 못했거나 필요한 컬럼이 없는 시트는 None을 반환하며, 후자는 저장하지 않고 self._readable에만 기록합니다.
+        """
+        if sheet_name in lot_snapshots:
+            return lot_snapshots[sheet_name]
+        if self._readable.get(fingerprint) is False:
+            return None
+        df_lots = load_stored_sheet(self.file_id, fingerprint, sheet_name, SM_LOT_STORE_VARIANT)
+        if df_lots is None:
+            df_sheet = read_excel_sheet(drive_service, self.file_id, sheet_name, file_name_for_error_msg, keep=False, schema=SM_SNAPSHOT_SCHEMA.name, file_version=file_version)
+            if df_sheet is None:
+                return None
+            df_lots = compact_lot_sheet(df_sheet)
+            if df_lots is None:
+                self._readable[fingerprint] = False
+                return None
+            save_stored_sheet(self.file_id, fingerprint, sheet_name, df_lots, SM_LOT_STORE_VARIANT)
+        self._readable[fingerprint] = True
+        lot_snapshots[sheet_name] = df_lots
+        return df_lots
+
+    def last_readable_snapshot(self, drive_service, earlier_sheets, file_version, file_name_for_error_msg):
+        """
+        earlier_sheets(날짜 순 (이름, 지문)) 중 마지막 정상 시트의 (이름, 로트 스냅샷)을 반환합니다.
+        정상 시트가 없으면 (None, None), 읽지 못하면 None.
+        """
+        with self._lock:
+            lot_snapshots = {}
+            previous = self._previous_readable_sheet(drive_service, earlier_sheets, file_version, lot_snapshots, file_name_for_error_msg)
+            if previous is False:
+                return None
+            if previous is None:
+                return None, None
+            df_lots = self._lot_snapshot(drive_service, previous[0], previous[1], file_version, lot_snapshots, file_name_for_error_msg)
+            return (previous[0], df_lots) if df_lots is not None else None
+
+    def events_for_sheets(self, sheet_names):
+        """ensure_sheets로 준비한 시트들의 이벤트를 날짜 순서대로 이어 붙여 반환합니다."""
+        with self._lock:
+            frames = [self._events[name][1] for name in sorted(sheet_names) if name in self._events]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return _empty_event_frame()
+        return pd.concat(frames, ignore_index=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_sm_lot_event_stream(file_id):
+    """파일 ID마다 하나의 SmLotEventStream을 프로세스 전체에서 공유합니다."""
+    return SmLotEventStream(file_id)
+
+
+def load_lot_events(drive_service, file_id, start_date, end_date, file_name_for_error_msg="SM재고현황", file_version=None):
+    """
+    start_date~end_date 기간 날짜 시트들의 로트 이동 이벤트를 반환합니다 (각 시트는 파일 안의 직전 시트와 비교).
+    기간에 날짜 시트가 없으면 빈 표, 실패하면 None을 반환합니다.
+    file_version을 주면 그 버전의 시트를 읽습니다 (버전별 캐시 함수는 캐시 키로 쓴 버전을 넘겨야 합니다).
+    """
+    if drive_service is None:
+        return None
+    if file_version is None:
+        file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+        if file_version is None:
+            return None
+    sheet_index = get_excel_sheet_index(drive_service, file_id, file_name_for_error_msg, file_version)
+    if sheet_index is None:
+        return None
+    wanted_sheets = [name for name, _fingerprint in sheet_index
+                     if _sheet_date(name) is not None and start_date <= _sheet_date(name) <= end_date]
+    stream = get_sm_lot_event_stream(file_id)
+    try:
+        sheet_names = stream.ensure_sheets(drive_service, wanted_sheets, file_name_for_error_msg, file_version)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 로트 이동 이벤트를 만드는 중 오류 발생: {e}")
+        return None
+    if sheet_names is None:
+        return None
+    return stream.events_for_sheets(sheet_names)
+
+
+def load_opening_lots(drive_service, file_id, start_date, file_name_for_error_msg="SM재고현황", file_version=None):
+    """
+    start_date 이전의 마지막 정상 날짜 시트의 로트 스냅샷을 (시트 날짜, 로트 표)로 반환합니다.
+    기간 안에 이벤트가 없던(그대로 보유한) 로트도 수명/회전 표에 넣기 위한 기간 시작 상태입니다.
+    이전 정상 시트가 없으면 (None, None)을 반환하며 (첫 정상 시트의 이벤트가 이미 기초재고를 담음), 실패하면 None을 반환합니다.
+    file_version은 load_lot_events와 같이 시트 목록과 시트 파싱의 버전을 고정합니다.
+    """
+    if drive_service is None:
+        return None
+    if file_version is None:
+        file_version = get_drive_file_version(drive_service, file_id, file_name_for_error_msg)
+        if file_version is None:
+            return None
+    sheet_index = get_excel_sheet_index(drive_service, file_id, file_name_for_error_msg, file_version)
+    if sheet_index is None:
+        return None
+    earlier = sorted((name, fingerprint) for name, fingerprint in sheet_index
+                     if _sheet_date(name) is not None and _sheet_date(name) < start_date)
+    try:
+        opening = get_sm_lot_event_stream(file_id).last_readable_snapshot(drive_service, earlier, file_version, file_name_for_error_msg)
+    except Exception as e:
+        st.error(f"오류: '{file_name_for_error_msg}' 기초 로트 스냅샷을 읽는 중 오류 발생: {e}")
+        return None
+    if opening is None:
+        return None
+    sheet_name, df_lots = opening
+    return (_sheet_date(sheet_name), df_lots) if sheet_name is not None else (None, None)
+
+
+# --- 이벤트 표 기반 조회 ---
+
+def summarize_lot_lifecycles(df_events, as_of_date=None, df_opening_lots=None, opening_date=None):
+    """
+    이벤트 표에서 로트(번호, 상품코드)별 수명을 요약합니다.
+    보유일수: 소진된 로트는 입고일자(없으면 최초 확인일)부터 소진일까지, 남아 있는 로트는 as_of_date(없으면 마지막 이벤트 날짜)까지.
+    df_opening_lots(opening_date 시트의 로트 스냅샷, load_opening_lots 결과)를 주면 그 잔량을 기초재고로 먼저 넣으므로,
+    기간 내내 변동 없이 보유한 로트도 포함되고 최초 잔량은 기간 시작 시점의 잔량이 됩니다.
+    주지 않으면 기간 안에 이벤트가 있던 로트만 요약합니다.
+    """
+    if df_opening_lots is not None and opening_date is not None:
+        df_seed = diff_lot_snapshots(None, df_opening_lots, opening_date)
+        frames = [frame for frame in (df_seed, df_events) if frame is not None and not frame.empty]
+        df_events = pd.concat(frames, ignore_index=True) if frames else None
+    if df_events is None or df_events.empty:
+        return pd.DataFrame()
+    df_sorted = df_events.sort_values(EVENT_DATE_COL, kind='stable')
+    is_emptied = (df_sorted[EVENT_TYPE_COL] == EVENT_EMPTIED).to_numpy()
+    is_corrected = (df_sorted[EVENT_TYPE_COL] == EVENT_CORRECTED).to_numpy()
+    # 최초 잔량은 첫 이벤트 이전 잔량(= 첫 이벤트 후 잔량 − 변동), 입고/기초재고면 첫 이벤트 후 잔량입니다.
+    first_adds_stock = df_sorted[EVENT_TYPE_COL].isin([EVENT_APPEARED, EVENT_OPENING]).to_numpy()
+    start_qty = np.where(first_adds_stock, df_sorted[LOT_QTY_COL], df_sorted[LOT_QTY_COL] - df_sorted[EVENT_QTY_CHANGE_COL])
+    start_wgt = np.where(first_adds_stock, df_sorted[LOT_WGT_COL], df_sorted[LOT_WGT_COL] - df_sorted[EVENT_WGT_CHANGE_COL])
+    df_work = df_sorted.assign(**{
+        LIFECYCLE_EMPTIED_COL: df_sorted[EVENT_DATE_COL].where(is_emptied),
+        LIFECYCLE_CORRECTIONS_COL: is_corrected.astype(np.int64),
+        LIFECYCLE_START_QTY_COL: start_qty, LIFECYCLE_START_WGT_COL: start_wgt,
+    })
+    df_lifecycle = df_work.groupby(LOT_KEYS, sort=True, as_index=False).agg(**{
+        LOT_PROD_NAME_COL: (LOT_PROD_NAME_COL, 'last'),
+        LOT_LOCATION_COL: (LOT_LOCATION_COL, 'last'),
+        LOT_RECEIPT_DATE_COL: (LOT_RECEIPT_DATE_COL, 'min'),
+        LIFECYCLE_FIRST_SEEN_COL: (EVENT_DATE_COL, 'first'),
+        LIFECYCLE_LAST_SEEN_COL: (EVENT_DATE_COL, 'last'),
+        LIFECYCLE_EMPTIED_COL: (LIFECYCLE_EMPTIED_COL, 'last'),
+        LIFECYCLE_START_QTY_COL: (LIFECYCLE_START_QTY_COL, 'first'),
+        LIFECYCLE_START_WGT_COL: (LIFECYCLE_START_WGT_COL, 'first'),
+        LOT_QTY_COL: (LOT_QTY_COL, 'last'),
+        LOT_WGT_COL: (LOT_WGT_COL, 'last'),
+        LIFECYCLE_CORRECTIONS_COL: (LIFECYCLE_CORRECTIONS_COL, 'sum'),
+    })
+    # 소진 후 다시 나타나 잔량이 남아 있는 로트는 아직 보유 중으로 봅니다.
+    reopened = _has_stock(df_lifecycle[LOT_QTY_COL].to_numpy(), df_lifecycle[LOT_WGT_COL].to_numpy())
+    df_lifecycle.loc[reopened, LIFECYCLE_EMPTIED_COL] = pd.NaT
+
+    as_of = pd.Timestamp(as_of_date).normalize() if as_of_date is not None else df_sorted[EVENT_DATE_COL].max()
+    start = df_lifecycle[LOT_RECEIPT_DATE_COL].fillna(df_lifecycle[LIFECYCLE_FIRST_SEEN_COL])
+    end = df_lifecycle[LIFECYCLE_EMPTIED_COL].fillna(as_of)
+    df_lifecycle[LIFECYCLE_DAYS_COL] = (end - start).dt.days
+    return df_lifecycle
+
+
+def summarize_product_turnover(df_lifecycle):
+    """로트 수명 표에서 상품코드별 소진 로트 수/평균 소진일수와 보유 중 로트 수/평균 경과일수를 계산합니다."""
+    if df_lifecycle is None or df_lifecycle.empty:
+        return pd.DataFrame()
+    is_emptied = df_lifecycle[LIFECYCLE_EMPTIED_COL].notna().to_numpy()
+    days = df_lifecycle[LIFECYCLE_DAYS_COL].to_numpy(dtype='float64')
+    df_work = pd.DataFrame({
+        LOT_PROD_CODE_COL: df_lifecycle[LOT_PROD_CODE_COL].to_numpy(),
+        LOT_PROD_NAME_COL: df_lifecycle[LOT_PROD_NAME_COL].to_numpy(),
+        TURNOVER_EMPTIED_LOTS_COL: is_emptied.astype(np.int64),
+        TURNOVER_AVG_DAYS_COL: np.where(is_emptied, days, np.nan),
+        TURNOVER_OPEN_LOTS_COL: (~is_emptied).astype(np.int64),
+        TURNOVER_OPEN_AGE_COL: np.where(is_emptied, np.nan, days),
+    })
+    return df_work.groupby(LOT_PROD_CODE_COL, sort=True, as_index=False).agg(**{
+        LOT_PROD_NAME_COL: (LOT_PROD_NAME_COL, 'last'),
+        TURNOVER_EMPTIED_LOTS_COL: (TURNOVER_EMPTIED_LOTS_COL, 'sum'),
+        TURNOVER_AVG_DAYS_COL: (TURNOVER_AVG_DAYS_COL, 'mean'),
+        TURNOVER_OPEN_LOTS_COL: (TURNOVER_OPEN_LOTS_COL, 'sum'),
+        TURNOVER_OPEN_AGE_COL: (TURNOVER_OPEN_AGE_COL, 'mean'),
+    })